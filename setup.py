@@ -12,6 +12,9 @@ setup(
     install_requires = ['pyserial'],
     entry_points = {'console_scripts': [
         'UBXtool=ubx:UBXtool.ubxtool_main',
+        'UBXdecode=ubx.UBXParallel:ubxdecode_main',
+        'UBXreplay=ubx.UBXReplay:ubxreplay_main',
+        'UBXgenerate=ubx.UBXGenerator:ubxgenerate_main',
         'parse_NMEA_log=ubx:parse_NMEA_log.parse_NMEA_log_main'
     ]}
 )
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Unit tests for the compressed archive format."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from ubx import UBX
+from ubx.UBXMessage import UBXMessage
+from ubx.UBXArchive import UBXArchiveWriter, UBXArchiveReader, \
+    NONE, ZLIB, LZMA, OTHER
+from ubx.UBXGenerator import ackFrame, GGA
+
+NMEA = GGA[:-2]
+
+
+def _pvt(iTOW):
+    return UBXMessage.make(0x01, 0x07, iTOW.to_bytes(4, 'little') + bytes(88))
+
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'log.ubxa')
+        ack = ackFrame()
+        # 100 s of PVT at 1 Hz, ACK and NMEA every 10 s
+        self.frames = []
+        for i in range(100):
+            self.frames.append((1000.0 + i, _pvt(i)))
+            if i % 10 == 0:
+                self.frames.append((1000.0 + i + 0.25, ack))
+                self.frames.append((1000.0 + i + 0.5, NMEA))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _write(self, **kwargs):
+        with UBXArchiveWriter(self.path, blockSize=1000, **kwargs) as writer:
+            for (t, frame) in self.frames:
+                writer.write(frame, t)
+
+    def _check(self, archive):
+        frames = [(t, bytes(f)) for (t, f) in archive.frames()]
+        self.assertEqual(len(frames), len(self.frames))
+        for ((t, f), (t2, f2)) in zip(frames, self.frames):
+            self.assertAlmostEqual(t, t2, places=5)
+            self.assertEqual(f, f2)
+
+    def testRoundTrip(self):
+        for compression in ('zlib', 'lzma', 'none'):
+            self._write(compression=compression)
+            with UBXArchiveReader(self.path) as archive:
+                self.assertGreaterEqual(len(archive.blocks), 10)
+                self.assertEqual(len(archive), len(self.frames))
+                self._check(archive)
+                methods = set(block.method for block in archive.blocks)
+                self.assertEqual(methods, {dict(zlib=ZLIB, lzma=LZMA,
+                                                none=NONE)[compression]})
+
+    def testQuery(self):
+        self._write()
+        with UBXArchiveReader(self.path) as archive:
+            msgs = list(archive.messages(UBX.NAV.PVT, timestamp=(1020, 1029.5)))
+            self.assertEqual([m.iTOW for (_, m) in msgs], list(range(20, 30)))
+            self.assertEqual([round(t) for (t, _) in msgs], list(range(1020, 1030)))
+            blocks = archive.findBlocks(UBX.NAV.PVT, timestamp=(1020, 1029.5))
+            self.assertLess(len(blocks), len(archive.blocks) // 3)
+            acks = list(archive.messages(UBX.ACK.ACK))
+            self.assertEqual(len(acks), 10)
+            self.assertIsInstance(acks[0][1], UBX.ACK.ACK)
+            self.assertEqual(len(archive.findBlocks(UBX.ACK.ACK)), 10)
+            self.assertTrue(all(OTHER in block.types
+                                for block in archive.findBlocks(UBX.ACK.ACK)))
+
+    def testFeed(self):
+        data = b'junk' + b''.join(f for (_, f) in self.frames[:5])
+        bad = bytearray(_pvt(7))
+        bad[10] ^= 1
+        data += bytes(bad)
+        with UBXArchiveWriter(self.path) as writer:
+            for i in range(0, len(data), 7):
+                writer.feed(data[i:i+7], 1000.0 + i)
+        with UBXArchiveReader(self.path) as archive:
+            frames = list(archive.frames())
+            self.assertEqual([bytes(f) for (_, f) in frames],
+                             [f for (_, f) in self.frames[:5]] + [bytes(bad)])
+            # the frame gets the time of the chunk that completes it
+            self.assertEqual(frames[0][0], 1000.0 + 98)
+            # the frame with a bad checksum is not parsed
+            self.assertEqual(len(list(archive.messages(UBX.NAV.PVT))), 3)
+
+    def testNoIndex(self):
+        self._write()
+        with UBXArchiveReader(self.path) as archive:
+            blocks = archive.blocks
+        end = blocks[-1].offset + 40
+        with open(self.path, 'r+b') as f:
+            f.truncate(end)
+        with UBXArchiveReader(self.path) as archive:
+            self.assertEqual(archive.blocks, blocks[:-1])
+
+    def testCorrupt(self):
+        self._write(compression='none')
+        with UBXArchiveReader(self.path) as archive:
+            block = archive.blocks[3]
+        with open(self.path, 'r+b') as f:
+            f.seek(block.offset + block.dataSize)
+            f.write(b'\xff')
+        with UBXArchiveReader(self.path) as archive:
+            with self.assertRaises(Exception):
+                archive.readBlock(archive.blocks[3])
+        with open(self.path, 'wb') as f:
+            f.write(b'UBX')
+        with self.assertRaises(Exception):
+            UBXArchiveReader(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
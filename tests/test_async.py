@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Unit tests for the asyncio manager, with a socketpair and a pty as the
+receiver stand-in."""
+
+import asyncio
+import os
+import socket
+import tty
+import unittest
+from ubx import UBX
+from ubx.UBXAsync import UBXAsyncManager, openSocket, openFd
+from ubx.UBXGenerator import ackFrame
+
+
+def _ack(clsID, msgID):
+    return ackFrame(msgID, clsID)
+
+
+class _QuietManager(UBXAsyncManager):
+    def onNMEA(self, buffer):
+        pass
+    def onNMEAError(self, errMsg):
+        pass
+
+
+class TestAsync(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.sock, self.peer = socket.socketpair()
+        self.peer.setblocking(False)
+        self.manager = await openSocket(self.sock, _QuietManager)
+
+    async def asyncTearDown(self):
+        self.manager.close()
+        self.peer.close()
+
+    async def testIterate(self):
+        loop = asyncio.get_running_loop()
+        await loop.sock_sendall(self.peer, _ack(0x06, 0x01) + _ack(0x06, 0x08))
+        self.peer.shutdown(socket.SHUT_WR)
+        msgs = [msg async for msg in self.manager]
+        self.assertEqual([type(m) for m in msgs], [UBX.ACK.ACK] * 2)
+        self.assertEqual([m.msgID for m in msgs], [0x01, 0x08])
+
+    async def testMaxsize(self):
+        manager = await openSocket(self.peer, _QuietManager, maxsize=1)
+        self.sock.sendall(_ack(0x06, 0x01) + _ack(0x06, 0x02))
+        await asyncio.sleep(0.05)
+        self.assertTrue(manager._readingPaused)
+        self.sock.shutdown(socket.SHUT_WR)
+        msgs = [msg.msgID async for msg in manager]
+        self.assertEqual(msgs, [0x01, 0x02])
+        manager.close()
+
+    async def testSend(self):
+        loop = asyncio.get_running_loop()
+        await self.manager.send(UBX.MON.VER.Get())
+        data = await loop.sock_recv(self.peer, 100)
+        self.assertEqual(data, UBX.MON.VER.Get().serialize())
+
+    async def testRequest(self):
+        loop = asyncio.get_running_loop()
+        async def receiver():
+            await loop.sock_recv(self.peer, 100)
+            # an unrelated ACK, then the expected one
+            await loop.sock_sendall(self.peer, _ack(0x06, 0x01) + _ack(0x06, 0x08))
+        task = asyncio.ensure_future(receiver())
+        ack = await self.manager.request(
+            UBX.MON.VER.Get(), UBX.ACK.ACK, timeout=1,
+            predicate=lambda m: m.msgID == 0x08)
+        await task
+        self.assertEqual(ack.msgID, 0x08)
+        # the unrelated ACK is still queued
+        self.assertEqual((await self.manager.__anext__()).msgID, 0x01)
+
+    async def testTimeout(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.manager.waitFor(UBX.ACK.NAK, timeout=0.05)
+        self.assertEqual(self.manager._waiters, [])
+
+    async def testClosed(self):
+        waiting = asyncio.ensure_future(self.manager.waitFor(UBX.ACK.ACK))
+        await asyncio.sleep(0)
+        self.peer.close()
+        with self.assertRaises(Exception):
+            await asyncio.wait_for(waiting, 1)
+
+
+class TestAsyncPty(unittest.IsolatedAsyncioTestCase):
+
+    @unittest.skipUnless(hasattr(os, 'openpty'), "no pty")
+    async def testPty(self):
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        manager = await openFd(slave, _QuietManager, lazy=True)
+        try:
+            os.write(master, b'$GPTXT,x*00\r\n' + _ack(0x06, 0x01))
+            ack = await manager.waitFor(UBX.ACK.ACK, timeout=1)
+            self.assertEqual(ack.clsID, 0x06)
+            await manager.send(b'\xb5\x62')
+            self.assertEqual(os.read(master, 2), b'\xb5\x62')
+        finally:
+            manager.close()
+            os.close(master)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Unit tests for the benchmark corpora and the JSON results."""
+
+import io
+import os
+import json
+import random
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+from ubx import UBX
+from ubx import bench
+from ubx.UBXMessage import parseUBXPayload
+from ubx.UBXFramer import UBXFramer, UBXFrame
+
+
+class TestBench(unittest.TestCase):
+
+    def testMessagePayload(self):
+        rnd = random.Random(0)
+        for (Msg, N) in bench.CORPORA:
+            payload = bench.messagePayload(Msg, N, rnd)
+            self.assertEqual(len(payload), Msg._codec.size(N))
+            obj = parseUBXPayload(Msg._class, Msg._id, payload)
+            self.assertEqual(obj.serialize()[6:-2], payload)
+        svinfo = parseUBXPayload(UBX.NAV._class, UBX.NAV.SVINFO._id,
+                                 bench.messagePayload(UBX.NAV.SVINFO, 5))
+        self.assertEqual(svinfo.numCh, 5)
+        meas = parseUBXPayload(UBX.ESF._class, UBX.ESF.MEAS._id,
+                               bench.messagePayload(UBX.ESF.MEAS, 3))
+        self.assertEqual(meas.numMeas, 3)
+
+    def testMixedCorpus(self):
+        data = bench._mixedCorpus(200, corruption=0.)
+        frames = UBXFramer().feed(data)
+        self.assertEqual(len(frames), 200)
+        self.assertEqual(data, bench._mixedCorpus(200, corruption=0.))
+        corrupt = UBXFramer().feed(bench._mixedCorpus(200, corruption=0.2))
+        self.assertLess(sum(type(f) is UBXFrame for f in corrupt),
+                        sum(type(f) is UBXFrame for f in frames))
+
+    def testJson(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            out = io.StringIO()
+            with redirect_stdout(out):
+                bench.main(['--only', 'queue', '--json', path])
+                bench.main(['--only', 'queue', '--compare', path])
+            with open(path) as f:
+                results = json.load(f)
+            self.assertEqual(list(results['results']), ['queue'])
+            self.assertGreater(results['results']['queue'][0]['msgs_per_s'], 0)
+            self.assertIn('python', results['meta'])
+            self.assertIn('msgs_per_s', out.getvalue())
+        finally:
+            os.remove(path)
+
+    def testSkip(self):
+        fd, path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            out = io.StringIO()
+            with redirect_stdout(out), \
+                    mock.patch.dict(bench.REQUIRES, queue=lambda: 'no queue'):
+                bench.main(['--only', 'queue', '--json', path])
+            with open(path) as f:
+                results = json.load(f)
+            self.assertEqual(results['results'], {})
+            self.assertIn('queue: skipped, no queue', out.getvalue())
+        finally:
+            os.remove(path)
+        self.assertNotIn('queue', bench.REQUIRES)
+
+
+if __name__ == '__main__':
+    unittest.main()
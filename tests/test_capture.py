@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Unit tests for the raw capture."""
+
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from ubx.UBXManager import UBXManager
+from ubx.UBXArchive import UBXArchiveReader
+from ubx.UBXCapture import UBXCapture, readCapture
+from ubx.UBXGenerator import ackFrame
+
+ACK = ackFrame()
+
+
+class _Quiet(UBXManager):
+
+    def onUBX(self, obj):
+        pass
+
+
+class TestCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'capture.ubx')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testRaw(self):
+        with UBXCapture(self.path) as capture:
+            for i in range(100):
+                self.assertTrue(capture.write(bytes([i]) * 10))
+        self.assertEqual(capture.files, [self.path])
+        self.assertEqual((capture.chunks, capture.bytes, capture.dropped),
+                         (100, 1000, 0))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(),
+                             b''.join(bytes([i]) * 10 for i in range(100)))
+
+    def testFlush(self):
+        capture = UBXCapture(self.path)
+        capture.write(ACK)
+        self.assertTrue(capture.flush(5))
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), ACK)
+        capture.close()
+        capture.close()
+        with self.assertRaises(Exception):
+            capture.write(ACK)
+
+    def testTimestamped(self):
+        with UBXCapture(self.path, format='timestamped') as capture:
+            capture.write(ACK, 100.5)
+            capture.write(b'abc', 101.25)
+            capture.write(b'', 102.)
+        self.assertEqual(list(readCapture(self.path)),
+                         [(100.5, ACK), (101.25, b'abc'), (102., b'')])
+
+    def testArchive(self):
+        with UBXCapture(self.path, format='archive') as capture:
+            capture.write(ACK + ACK[:4], 10.)
+            capture.write(ACK[4:], 11.)
+        with UBXArchiveReader(self.path) as archive:
+            self.assertEqual([(t, bytes(f)) for (t, f) in archive.frames()],
+                             [(10., ACK), (11., ACK)])
+
+    def testRotateBytes(self):
+        with UBXCapture(self.path, rotateBytes=25) as capture:
+            for i in range(10):
+                capture.write(bytes([i]) * 10)
+        names = ["{}.{:05d}".format(self.path, i) for i in range(5)]
+        self.assertEqual(capture.files, names)
+        data = b''
+        for name in names:
+            with open(name, 'rb') as f:
+                chunk = f.read()
+            self.assertEqual(len(chunk), 20)
+            data += chunk
+        self.assertEqual(data, b''.join(bytes([i]) * 10 for i in range(10)))
+
+    def testKeep(self):
+        with UBXCapture(self.path, rotateBytes=10, keep=2) as capture:
+            for i in range(5):
+                capture.write(bytes([i]) * 10)
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['capture.ubx.00003', 'capture.ubx.00004'])
+        self.assertEqual(capture.files, [os.path.join(self.dir, name) for name
+                                         in ('capture.ubx.00003',
+                                             'capture.ubx.00004')])
+
+    def testContinue(self):
+        # a new capture continues the numbering, keep counts the old files
+        with UBXCapture(self.path, rotateBytes=10) as capture:
+            for i in range(3):
+                capture.write(bytes([i]) * 10)
+        with UBXCapture(self.path, rotateBytes=10, keep=4) as capture:
+            for i in range(3, 5):
+                capture.write(bytes([i]) * 10)
+        self.assertEqual(capture.files, [
+            "{}.{:05d}".format(self.path, i) for i in (3, 4)])
+        self.assertEqual(sorted(os.listdir(self.dir)), [
+            "capture.ubx.{:05d}".format(i) for i in range(1, 5)])
+        with open(self.path + '.00001', 'rb') as f:
+            self.assertEqual(f.read(), bytes([1]) * 10)
+
+    def testError(self):
+        capture = UBXCapture(os.path.join(self.dir, 'missing', 'capture.ubx'))
+        capture.write(ACK)
+        with self.assertRaises(Exception):
+            capture.flush(5)
+        with self.assertRaises(Exception):
+            capture.write(ACK)
+        with self.assertRaises(Exception):
+            capture.close()
+
+    def testRotateArchive(self):
+        # a frame split by the rotation goes to the next file
+        with UBXCapture(self.path, format='archive', rotateBytes=15) as capture:
+            capture.write(ACK + ACK[:4], 10.)
+            capture.write(ACK[4:], 11.)
+        frames = []
+        for name in capture.files:
+            with UBXArchiveReader(name) as archive:
+                frames.append([(t, bytes(f)) for (t, f) in archive.frames()])
+        self.assertEqual(frames, [[(10., ACK)], [(11., ACK)]])
+
+    def testRotateSeconds(self):
+        with UBXCapture(self.path, rotateSeconds=0.05) as capture:
+            capture.write(b'a')
+            time.sleep(0.2)     # rotates while idle
+            self.assertEqual(len(capture.files), 1)
+            capture.write(b'b')
+        self.assertEqual(len(capture.files), 2)
+        for (name, data) in zip(capture.files, (b'a', b'b')):
+            with open(name, 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+    def testDropped(self):
+        with UBXCapture(self.path, maxPending=100) as capture:
+            self.assertFalse(capture.write(bytes(101)))
+            self.assertTrue(capture.write(bytes(100)))
+        self.assertEqual((capture.dropped, capture.droppedBytes), (1, 101))
+        self.assertEqual(capture.bytes, 100)
+
+    def testFormat(self):
+        with self.assertRaises(Exception):
+            UBXCapture(self.path, format='text')
+
+    def testManager(self):
+        data = ACK * 1000
+        manager = _Quiet(io.BufferedReader(io.BytesIO(data)), eofTimeout=0,
+                         capture=UBXCapture(self.path, format='timestamped'))
+        manager.start()
+        manager.join()
+        manager.capture.close()
+        self.assertEqual(b''.join(d for (_, d) in readCapture(self.path)),
+                         data)
+
+    def testDebug(self):
+        # debug=filename captures to that file, closed at the end of run
+        manager = _Quiet(io.BufferedReader(io.BytesIO(ACK * 10)), debug=self.path,
+                         eofTimeout=0)
+        sys.stderr, saved = io.StringIO(), sys.stderr
+        try:
+            manager.start()
+            manager.join()
+        finally:
+            sys.stderr = saved
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), ACK * 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
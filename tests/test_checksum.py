@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Unit tests for the bulk UBX checksum: all variants must be bit-identical
+to the per-byte algorithm."""
+
+import os
+import random
+import unittest
+from ubx import Checksum as ck
+from ubx.UBXMessage import UBXMessage
+
+
+def _perByte(msg):
+    """The original byte-at-a-time UBX checksum."""
+    a, b = 0, 0
+    for i in msg:
+        a = (a + i) & 0xff
+        b = (b + a) & 0xff
+    return a * 256 + b
+
+
+_LENGTHS = (0, 1, 2, 7, 255, 256, 257, 1000, 65535, 100000)
+
+
+class TestChecksum(unittest.TestCase):
+
+    def testBulk(self):
+        for n in _LENGTHS:
+            buf = os.urandom(n)
+            expected = _perByte(buf)
+            self.assertEqual(ck.checksum(buf), expected)
+            self.assertEqual(ck.checksum(bytearray(buf)), expected)
+            self.assertEqual(ck.checksum(memoryview(buf)), expected)
+            self.assertEqual(UBXMessage.Checksum(buf).get(), expected)
+
+    def testWorstCase(self):
+        buf = b'\xff' * 200000
+        self.assertEqual(ck.checksum(buf), _perByte(buf))
+
+    def testPython(self):
+        for n in _LENGTHS:
+            buf = os.urandom(n)
+            a, b = ck._sumsPython(buf)
+            self.assertEqual((a & 0xff) << 8 | (b & 0xff), _perByte(buf))
+
+    @unittest.skipIf(ck.np is None, "NumPy is not installed")
+    def testNumpy(self):
+        for n in _LENGTHS:
+            buf = os.urandom(n)
+            self.assertEqual(ck._sumsNumpy(buf), ck._sumsPython(buf))
+
+    def testOffsets(self):
+        buf = bytearray(os.urandom(1000))
+        for (start, stop) in ((0, 10), (2, 998), (500, None), (999, 1000)):
+            self.assertEqual(ck.checksum(buf, start, stop),
+                             _perByte(buf[start:stop]))
+
+    def testIncremental(self):
+        rnd = random.Random(0)
+        for n in _LENGTHS:
+            buf = os.urandom(n)
+            c = ck.Checksum()
+            pos = 0
+            while pos < n:
+                step = rnd.choice((1, 2, 100, 300, 5000))
+                c.update(buf[pos:pos+step])
+                pos += step
+            self.assertEqual(c.get(), _perByte(buf))
+
+    def testSingleBytes(self):
+        buf = os.urandom(300)
+        c = UBXMessage.Checksum()
+        for i in buf:
+            c.update(bytes([i]))
+        self.assertEqual(c.get(), _perByte(buf))
+        c.reset()
+        self.assertEqual(c.get(), 0)
+
+    def testMakeExtract(self):
+        payload = os.urandom(5000)
+        msg = UBXMessage.make(0x01, 0x07, payload)
+        self.assertEqual(msg[-2:], _perByte(msg[2:-2]).to_bytes(2, 'big'))
+        self.assertEqual(UBXMessage.extract(msg), (0x01, 0x07, payload))
+
+
+if __name__ == '__main__':
+    unittest.main()
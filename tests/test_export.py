@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Unit tests for the columnar export."""
+
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+from ubx import UBX
+from ubx.UBXMessage import UBXMessage
+from ubx.UBXLog import UBXLog
+from ubx import UBXExport
+from ubx.UBXExport import UBXExporter, exportLog
+
+np = UBXExport.np
+
+
+def _svinfo(numCh, iTOW):
+    return UBXMessage.make(
+        0x01, 0x30, bytes([iTOW, 0, 0, 0, numCh, 0, 0, 0])
+        + bytes((k * 12 + i) & 0xff for k in range(numCh) for i in range(12)))
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'log.ubx')
+        ver = b'ROM CORE 3.01'.ljust(30, b'\x00') + b'00080000'.ljust(10, b'\x00')
+        with open(self.path, 'wb') as f:
+            for i in range(25):
+                f.write(UBXMessage.make(0x01, 0x07, bytes((i + k) & 0xff
+                                                          for k in range(92))))
+                f.write(_svinfo(i % 4, i))
+                f.write(b'$GPGGA,1,2*00\r\n')
+            f.write(UBXMessage.make(0x0A, 0x04, ver))
+            f.write(UBXMessage.make(0x01, 0x07, bytes(10)))     # wrong length
+        with UBXLog(self.path) as log:
+            self.pvt = list(log.messages(UBX.NAV.PVT))
+            self.svinfo = list(log.messages(UBX.NAV.SVINFO))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _read(self, name):
+        with open(os.path.join(self.dir, 'out', name + '.csv'),
+                  newline='') as f:
+            rows = list(csv.reader(f))
+        return rows[0], rows[1:]
+
+    def testCsv(self):
+        exporter = exportLog(self.path, os.path.join(self.dir, 'out'),
+                             format='csv', chunkRows=7)
+        self.assertEqual(exporter.skipped, 1)
+        self.assertEqual(exporter.tables(), {
+            'NAV-PVT': 25, 'NAV-SVINFO': 25, 'NAV-SVINFO.repeated': 36,
+            'MON-VER': 1, 'MON-VER.repeated': 0})
+        header, rows = self._read('NAV-PVT')
+        self.assertEqual(header, list(UBX.NAV.PVT._codec.onceNames))
+        self.assertEqual([int(r[0]) for r in rows],
+                         [m.iTOW for m in self.pvt])
+        self.assertEqual([int(r[header.index('lat')]) for r in rows],
+                         [m.lat for m in self.pvt])
+        header, rows = self._read('NAV-SVINFO.repeated')
+        self.assertEqual(header[:3], ['row', 'block', 'chn'])
+        expected = [[row, block, rec.svid]
+                    for (row, m) in enumerate(self.svinfo)
+                    for (block, rec) in enumerate(m.repeated)]
+        self.assertEqual([[int(r[0]), int(r[1]), int(r[3])] for r in rows],
+                         expected)
+        header, rows = self._read('MON-VER')
+        self.assertEqual(rows, [['ROM CORE 3.01', '00080000']])
+
+    def testSelected(self):
+        exporter = exportLog(self.path, os.path.join(self.dir, 'out'),
+                             UBX.NAV.SVINFO, format='csv')
+        self.assertEqual(exporter.tables(), {
+            'NAV-SVINFO': 25, 'NAV-SVINFO.repeated': 36})
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def testNpz(self):
+        out = os.path.join(self.dir, 'out')
+        exportLog(self.path, out, format='npz', chunkRows=10)
+        self.assertEqual(sorted(f for f in os.listdir(out)
+                                if f.startswith('NAV-PVT.')),
+                         ['NAV-PVT.00000.npz', 'NAV-PVT.00001.npz',
+                          'NAV-PVT.00002.npz'])
+        lat = np.concatenate([np.load(os.path.join(out, 'NAV-PVT.{:05d}.npz'
+                                                   .format(k)))['lat']
+                              for k in range(3)])
+        self.assertEqual(lat.tolist(), [m.lat for m in self.pvt])
+        # the blocks of a message are kept in one chunk
+        child = [np.load(os.path.join(out, name)) for name in
+                 sorted(os.listdir(out)) if name.startswith('NAV-SVINFO.rep')]
+        self.assertTrue(all(len(c['row']) >= 10 for c in child[:-1]))
+        self.assertEqual(np.concatenate([c['row'] for c in child]).tolist(),
+                         [row for (row, m) in enumerate(self.svinfo)
+                          for _ in range(m.numCh)])
+        self.assertEqual(np.concatenate([c['prRes'] for c in child]).tolist(),
+                         [rec.prRes for m in self.svinfo for rec in m.repeated])
+
+    def testAdd(self):
+        out = os.path.join(self.dir, 'out')
+        with UBXExporter(out, format='csv') as exporter:
+            exporter.add(0x05, 0x01, b'\x06\x01')
+            exporter.add(0x77, 0x01, b'')       # unknown message
+        self.assertEqual(self._read('ACK-ACK'),
+                         (['clsID', 'msgID'], [['6', '1']]))
+
+    def testFormat(self):
+        with self.assertRaises(Exception):
+            UBXExporter(self.dir, format='xls')
+        if UBXExport.pyarrow is None:
+            with self.assertRaises(Exception):
+                UBXExporter(self.dir, format='parquet')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Unit tests for the incremental UBX/NMEA framer."""
+
+import io
+import unittest
+from ubx.UBXMessage import UBXMessage
+from ubx.UBXFramer import UBXFramer, UBXFrame, UBXErrorFrame, NMEAFrame, \
+    NMEAErrorFrame, iterFrames, scanFrames, END
+from ubx.UBXGenerator import ackFrame, GGA as NMEA
+
+
+class TestFramer(unittest.TestCase):
+
+    def setUp(self):
+        self.pvt = UBXMessage.make(0x01, 0x07, bytes(range(92)))
+        self.ack = ackFrame()
+        self.data = b'junk' + self.pvt + NMEA + b'\xb5\x00' + self.ack
+        self.expected = [
+            UBXFrame(0x01, 0x07, bytes(range(92))),
+            NMEAFrame(NMEA[1:-5].decode('ascii')),
+            UBXFrame(0x05, 0x01, b'\x06\x01'),
+        ]
+
+    def testFeedAll(self):
+        framer = UBXFramer()
+        self.assertEqual(framer.feed(self.data), self.expected)
+        self.assertEqual(framer.pending(), 0)
+
+    def testFeedSplit(self):
+        for chunkSize in (1, 2, 3, 7, 50):
+            framer = UBXFramer()
+            frames = []
+            for i in range(0, len(self.data), chunkSize):
+                frames += framer.feed(self.data[i:i+chunkSize])
+            self.assertEqual(frames, self.expected)
+
+    def testPartial(self):
+        framer = UBXFramer()
+        self.assertEqual(framer.feed(self.pvt[:-1]), [])
+        self.assertEqual(framer.pending(), len(self.pvt) - 1)
+        framer.reset()
+        self.assertEqual(framer.pending(), 0)
+        self.assertEqual(framer.feed(self.ack), [self.expected[2]])
+
+    def testErrors(self):
+        bad = bytearray(self.pvt)
+        bad[10] ^= 0xff
+        badNMEA = NMEA.replace(b'*76', b'*77')
+        frames = UBXFramer().feed(bytes(bad) + badNMEA + self.ack)
+        self.assertEqual(type(frames[0]), UBXErrorFrame)
+        self.assertEqual(frames[0][:2], (0x01, 0x07))
+        self.assertEqual(type(frames[1]), NMEAErrorFrame)
+        self.assertEqual(frames[2], self.expected[2])
+
+    def testInvalidHexDropped(self):
+        frames = UBXFramer().feed(b'$GPTXT,x*G1\r\n' + NMEA)
+        self.assertEqual(frames, [self.expected[1]])
+
+    def testScanFramesOffsets(self):
+        scan = list(scanFrames(self.data, 4))
+        self.assertEqual(scan[0][1:], (4, 4 + len(self.pvt)))
+        self.assertEqual(scan[-1], (END, len(self.data), len(self.data)))
+
+    def testIterFrames(self):
+        frames = list(iterFrames(io.BytesIO(self.data * 3), chunkSize=5))
+        self.assertEqual(frames, self.expected * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
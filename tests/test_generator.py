@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Unit tests for the synthetic traffic generator."""
+
+import io
+import time
+import socket
+import threading
+import unittest
+from collections import Counter
+from ubx import UBX
+from ubx.UBXFramer import UBXFramer, UBXFrame, NMEAFrame, UBXErrorFrame
+from ubx.UBXMessage import parseUBXPayload, messageRegistry
+from ubx.UBXGenerator import UBXGenerator, messagePayload, nmeaSentence
+
+
+def _parse(data):
+    return [parseUBXPayload(*f) if type(f) is UBXFrame else f
+            for f in UBXFramer().feed(data)]
+
+
+class TestGenerator(unittest.TestCase):
+
+    def testAllMessages(self):
+        gen = UBXGenerator(seed=1, maxBlocks=4)
+        msgs = _parse(gen.generate(20000))
+        types = set(type(m) for m in msgs)
+        registered = set(Msg for messages in messageRegistry().values()
+                         for Msg in messages.values())
+        self.assertEqual(types, registered)
+        self.assertEqual(gen.counts['frames'], len(msgs))
+
+    def testPayload(self):
+        pvt = parseUBXPayload(UBX.NAV._class, UBX.NAV.PVT._id,
+                              messagePayload(UBX.NAV.PVT, iTOW=1234))
+        self.assertEqual(pvt.iTOW, 1234)
+        self.assertTrue(1 <= pvt.month <= 12)
+        self.assertTrue(-900000000 <= pvt.lat <= 900000000)
+        svinfo = parseUBXPayload(UBX.NAV._class, UBX.NAV.SVINFO._id,
+                                 messagePayload(UBX.NAV.SVINFO, 7))
+        self.assertEqual(svinfo.numCh, 7)
+        self.assertTrue(all(0 <= cno <= 55 for cno in svinfo.repeated.cno))
+
+    def testMix(self):
+        gen = UBXGenerator({UBX.NAV.PVT: 10, UBX.ESF.MEAS: 100}, nmea=1,
+                           seed=2)
+        frames = [next(gen) for _ in range(1110)]
+        # 10 s of simulated time
+        self.assertAlmostEqual(frames[-1][0], 9.99, places=6)
+        msgs = _parse(b''.join(f for (_, f) in frames))
+        self.assertEqual(Counter(type(m) for m in msgs),
+                         {UBX.ESF.MEAS: 1000, UBX.NAV.PVT: 100, NMEAFrame: 10})
+        pvts = [m for m in msgs if type(m) is UBX.NAV.PVT]
+        self.assertEqual(set(b.iTOW - a.iTOW for (a, b) in zip(pvts, pvts[1:])),
+                         {100})
+        self.assertEqual(nmeaSentence('GPTXT,1')[-5:], b'*%02X\r\n' % (
+            ord('G') ^ ord('P') ^ ord('T') ^ ord('X') ^ ord('T') ^ ord(',')
+            ^ ord('1')))
+
+    def testCorruption(self):
+        clean = UBXGenerator({UBX.NAV.PVT: 1}, seed=3).generate(100000)
+        gen = UBXGenerator({UBX.NAV.PVT: 1}, seed=3,
+                           corruption={'flip': 0.1, 'checksum': 0.1,
+                                       'truncate': 0.1, 'garbage': 0.1})
+        data = gen.generate(100000)
+        for kind in ('flip', 'checksum', 'truncate', 'garbage'):
+            self.assertGreater(gen.counts[kind], 50)
+        frames = UBXFramer().feed(data)
+        self.assertTrue(any(type(f) is UBXErrorFrame for f in frames))
+        self.assertLess(sum(type(f) is UBXFrame for f in frames),
+                        len(UBXFramer().feed(clean)) * 0.8)
+        with self.assertRaises(Exception):
+            UBXGenerator(corruption={'bogus': 1})
+
+    def testRun(self):
+        out = io.BytesIO()
+        gen = UBXGenerator({UBX.NAV.PVT: 1}, seed=4)
+        stats = gen.run(out, maxBytes=10000)
+        self.assertEqual(stats['frames'], 100)      # 100 bytes per frame
+        self.assertEqual(len(out.getvalue()), 10000)
+        # byte rate
+        stats = gen.run(lambda data: None, byteRate=200000, duration=0.25)
+        self.assertAlmostEqual(stats['bytes'] / stats['seconds'], 200000,
+                               delta=20000)
+        # simulated time at 100x: 10 frames at 1 Hz take about 0.09 s
+        stats = gen.run(lambda data: None, speed=100, maxFrames=10)
+        self.assertAlmostEqual(stats['seconds'], 0.09, delta=0.04)
+
+    def testSocket(self):
+        a, b = socket.socketpair()
+        gen = UBXGenerator({UBX.NAV.PVT: 1}, seed=5)
+        threading.Timer(0.1, gen.stop).start()
+        received = []
+        reader = threading.Thread(target=lambda: received.extend(
+            iter(lambda: b.recv(65536), b'')))
+        reader.start()
+        with a:
+            stats = gen.run(a, byteRate=100000)
+        reader.join()
+        b.close()
+        self.assertEqual(len(b''.join(received)), stats['bytes'])
+        self.assertLess(stats['seconds'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
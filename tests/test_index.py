@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Unit tests for the persistent frame index."""
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from ubx import UBX
+from ubx.UBXMessage import UBXMessage
+from ubx import UBXIndex as ubxindex
+from ubx.UBXIndex import UBXIndex, NO_ITOW
+
+
+def _pvt(iTOW):
+    return UBXMessage.make(0x01, 0x07, struct.pack('<I', iTOW) + bytes(88))
+
+
+def _hw():
+    return UBXMessage.make(0x0A, 0x09, bytes(60))
+
+
+class TestIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'log.ubx')
+        with open(self.path, 'wb') as f:
+            for i in range(10):
+                f.write(_pvt(1000 * i) + b'$GPTXT,x*00\r\n' + _hw())
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testBuild(self):
+        with UBXIndex(self.path) as index:
+            self.assertEqual(len(index), 20)
+            self.assertTrue(os.path.exists(self.path + '.idx'))
+            self.assertEqual(index[0], (0, 0x01, 0x07, 92, 0))
+            self.assertEqual(index[1].iTOW, NO_ITOW)
+            self.assertEqual(index[1].offset, 100 + 13)
+            pvts = [m.iTOW for m in index.messages(UBX.NAV.PVT,
+                                                   iTOW=(2000, 4000))]
+            self.assertEqual(pvts, [2000, 3000, 4000])
+            self.assertEqual(index.message(UBX.NAV.PVT, 5).iTOW, 5000)
+            self.assertIsInstance(index.message(UBX.MON.HW, 4), UBX.MON.HW)
+            self.assertEqual(len(index.find()), 20)
+            self.assertEqual(len(index.find(UBX.MON.HW, UBX.NAV.PVT)), 20)
+
+    def testPythonFind(self):
+        with UBXIndex(self.path) as index:
+            queries = [((), None), ((UBX.NAV.PVT,), None),
+                       ((UBX.MON.HW,), (0, 10**10)), ((), (3000, 3500))]
+            expected = [index.find(*t, iTOW=r) for (t, r) in queries]
+            np, ubxindex.np = ubxindex.np, None
+            try:
+                self.assertEqual([index.find(*t, iTOW=r) for (t, r) in queries],
+                                 expected)
+            finally:
+                ubxindex.np = np
+
+    def testLoad(self):
+        UBXIndex(self.path).close()
+        with UBXIndex(self.path, update=False) as index:
+            self.assertEqual(len(index), 20)
+            self.assertEqual(index.message(UBX.NAV.PVT, 9).iTOW, 9000)
+
+    def testIncremental(self):
+        UBXIndex(self.path).close()
+        frame = _pvt(10000)
+        with open(self.path, 'ab') as f:
+            f.write(frame[:50])
+        with UBXIndex(self.path) as index:
+            self.assertEqual(len(index), 20)
+        with open(self.path, 'ab') as f:
+            f.write(frame[50:] + _hw())
+        with UBXIndex(self.path, update=False) as index:
+            self.assertEqual(index.update(), 2)
+            self.assertEqual(index.message(UBX.NAV.PVT, 10).iTOW, 10000)
+
+    def testRebuild(self):
+        UBXIndex(self.path).close()
+        with open(self.path, 'wb') as f:
+            f.write(_hw() + _pvt(7))
+        with UBXIndex(self.path) as index:
+            self.assertEqual(len(index), 2)
+            self.assertEqual(index.message(UBX.NAV.PVT, 0).iTOW, 7)
+
+    def testBadSidecar(self):
+        with open(self.path + '.idx', 'wb') as f:
+            f.write(b'garbage')
+        with UBXIndex(self.path) as index:
+            self.assertEqual(len(index), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
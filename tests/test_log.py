@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Unit tests for the memory mapped log reader."""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from ubx import UBX
+from ubx.UBXMessage import UBXMessage
+from ubx.UBXFramer import UBXFramer, UBXFrame, NMEAFrame, UBXErrorFrame
+from ubx.UBXLog import UBXLog
+from ubx.UBXGenerator import ackFrame, GGA as NMEA
+
+
+class TestLog(unittest.TestCase):
+
+    def setUp(self):
+        pvt = UBXMessage.make(0x01, 0x07, bytes(range(92)))
+        bad = bytearray(pvt)
+        bad[20] ^= 1
+        self.data = b'junk' + pvt + NMEA + bytes(bad) \
+            + ackFrame() \
+            + UBXMessage.make(0x77, 0x01, b'') + pvt[:50]
+        fd, self.path = tempfile.mkstemp(suffix='.ubx')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testFrames(self):
+        with UBXLog(self.path) as log:
+            frames = list(log.frames())
+            self.assertEqual(frames, UBXFramer().feed(self.data))
+            self.assertIsInstance(frames[0].payload, memoryview)
+            self.assertEqual([type(f) for f in frames],
+                             [UBXFrame, NMEAFrame, UBXErrorFrame, UBXFrame,
+                              UBXFrame])
+            self.assertEqual(log.end, len(self.data) - 50)
+        # the views stay valid after closing
+        self.assertEqual(bytes(frames[0].payload), bytes(range(92)))
+
+    def testMessages(self):
+        with UBXLog(self.path) as log:
+            msgs = list(log.messages())
+            self.assertEqual([type(m) for m in msgs],
+                             [UBX.NAV.PVT, UBX.ACK.ACK])
+            self.assertEqual(msgs[0].iTOW, 0x03020100)
+            acks = list(log.messages(UBX.ACK.ACK, lazy=True))
+            self.assertEqual([m.msgID for m in acks], [0x01])
+        with self.assertRaises(Exception):
+            list(log.messages())
+
+    def testScanRange(self):
+        with UBXLog(self.path) as log:
+            scan = list(log.scan(4, 200))
+            self.assertEqual(scan[0][1:], (4, 104))
+
+    def testEmpty(self):
+        open(self.path, 'wb').close()
+        with UBXLog(self.path) as log:
+            self.assertEqual(list(log.frames()), [])
+            self.assertEqual(len(log), 0)
+
+    def testRecording(self):
+        path = Path(__file__).parent.joinpath("testdata", "relposned_test.bin")
+        with UBXLog(str(path)) as log:
+            msgs = list(log.messages())
+        self.assertEqual(len(msgs), 8)
+        self.assertEqual(type(msgs[1]), UBX.NAV.RELPOSNED)
+
+
+if __name__ == '__main__':
+    unittest.main()
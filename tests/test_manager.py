@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Unit tests for the waiting of UBXManager."""
+
+import io
+import os
+import time
+import socket
+import unittest
+from ubx.UBXManager import UBXManager
+from ubx.UBXGenerator import ackFrame
+
+ACK = ackFrame()
+
+
+class _Collector(UBXManager):
+
+    def __init__(self, ser, **kwargs):
+        UBXManager.__init__(self, ser, **kwargs)
+        self.msgs = []
+
+    def onUBX(self, obj):
+        self.msgs.append(obj)
+
+    def waitFor(self, n, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.msgs) < n and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return len(self.msgs)
+
+
+class _NoFileno(object):
+    """Non-blocking source without a file descriptor."""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def recv(self, n):
+        try:
+            return self.sock.recv(n, socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return b''
+
+
+class _Serial(object):
+    """pyserial-like port with a read timeout on a socket."""
+
+    def __init__(self, sock, timeout):
+        self.sock = sock
+        self.timeout = timeout
+        sock.settimeout(timeout)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    @property
+    def in_waiting(self):
+        return 0
+
+    def read(self, n):
+        try:
+            return self.sock.recv(n)
+        except socket.timeout:
+            return b''
+
+
+class TestManagerWait(unittest.TestCase):
+
+    def setUp(self):
+        self.a, self.b = socket.socketpair()
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+
+    def testFileno(self):
+        self.assertEqual(_Collector(self.b)._fileno(), self.b.fileno())
+        self.assertIsNone(_Collector(io.BytesIO())._fileno())
+        self.assertIsNone(_Collector(_NoFileno(self.b))._fileno())
+        with open(__file__, 'rb') as f:     # regular files are polled
+            self.assertIsNone(_Collector(f)._fileno())
+
+    def testSocket(self):
+        manager = _Collector(self.b)
+        manager.start()
+        for i in range(3):
+            time.sleep(0.02)
+            self.a.sendall(ACK)
+            self.assertEqual(manager.waitFor(i + 1), i + 1)
+        manager.shutdown()
+        manager.join(1)
+        self.assertFalse(manager.is_alive())
+
+    def testShutdownWakesUp(self):
+        manager = _Collector(self.b)
+        manager.start()
+        time.sleep(0.05)    # blocked in the selector
+        t0 = time.monotonic()
+        manager.shutdown()
+        manager.join(1)
+        self.assertFalse(manager.is_alive())
+        self.assertLess(time.monotonic() - t0, 0.5)
+        self.assertIsNone(manager._wakeup)
+
+    def testShutdownPolling(self):
+        manager = _Collector(_NoFileno(self.b))
+        manager.start()
+        self.a.sendall(ACK)
+        self.assertEqual(manager.waitFor(1), 1)
+        manager.shutdown()
+        manager.join(1)
+        self.assertFalse(manager.is_alive())
+
+    def testEofTimeout(self):
+        # eofTimeout starts at the end of the file, not when idle
+        manager = _Collector(self.b, eofTimeout=0.01)
+        self.a.sendall(ACK)
+        manager.start()
+        self.assertEqual(manager.waitFor(1), 1)
+        time.sleep(0.1)
+        self.assertTrue(manager.is_alive())
+        self.a.sendall(ACK)
+        self.a.close()
+        manager.join(2)
+        self.assertFalse(manager.is_alive())
+        self.assertEqual(len(manager.msgs), 2)
+
+    def testReadTimeout(self):
+        # like pyserial with a timeout: give up after timeout + eofTimeout
+        manager = _Collector(_Serial(self.b, 0.05), eofTimeout=0.01)
+        t0 = time.monotonic()
+        manager.start()
+        manager.join(2)
+        self.assertFalse(manager.is_alive())
+        self.assertGreaterEqual(time.monotonic() - t0, 0.1)
+
+    def testClosed(self):
+        manager = _Collector(self.b, eofTimeout=0)
+        self.a.sendall(ACK * 2)
+        self.a.close()
+        manager.start()
+        manager.join(2)
+        self.assertFalse(manager.is_alive())
+        self.assertEqual(len(manager.msgs), 2)
+
+    def testPipe(self):
+        r, w = os.pipe()
+        with os.fdopen(r, 'rb') as reader:
+            manager = _Collector(reader, eofTimeout=0)
+            manager.start()
+            os.write(w, ACK)
+            self.assertEqual(manager.waitFor(1), 1)
+            os.write(w, ACK)
+            os.close(w)
+            manager.join(2)
+            self.assertFalse(manager.is_alive())
+            self.assertEqual(len(manager.msgs), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Unit tests for the multi-receiver manager."""
+
+import os
+import time
+import socket
+import tempfile
+import unittest
+from ubx import UBX
+from ubx.UBXManager import UBXHandler
+from ubx.UBXMulti import UBXMultiManager, UBXMultiQueue
+from ubx.UBXGenerator import ackFrame as _ack, GGA as NMEA
+
+
+class _Recorder(UBXMultiManager):
+
+    def __init__(self, **kwargs):
+        UBXMultiManager.__init__(self, **kwargs)
+        self.events = []
+
+    def onUBX(self, sourceId, obj):
+        self.events.append((sourceId, obj.msgID))
+
+    def onNMEA(self, sourceId, buffer):
+        self.events.append((sourceId, 'NMEA'))
+
+    def onNMEAError(self, sourceId, errMsg):
+        self.events.append((sourceId, 'NMEA ERR'))
+
+    def onSourceError(self, sourceId, error):
+        self.events.append((sourceId, 'ERR'))
+
+    def onClose(self, sourceId):
+        self.events.append((sourceId, 'closed'))
+
+
+class _Handler(UBXHandler):
+
+    def __init__(self):
+        self.msgs = []
+
+    def onUBX(self, obj):
+        self.msgs.append(obj)
+
+
+def _waitFor(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+
+class TestMulti(unittest.TestCase):
+
+    def setUp(self):
+        self.pairs = [socket.socketpair() for _ in range(3)]
+
+    def tearDown(self):
+        for (a, b) in self.pairs:
+            a.close()
+            b.close()
+
+    def testQueue(self):
+        manager = UBXMultiQueue()
+        for (i, (_, b)) in enumerate(self.pairs):
+            self.assertEqual(manager.add(b), i)
+        manager.start()
+        for n in range(5):
+            for (i, (a, _)) in enumerate(self.pairs):
+                a.sendall(_ack(10 * i + n))
+        msgs = [manager.get(timeout=5) for _ in range(15)]
+        manager.shutdown()
+        manager.join(1)
+        self.assertFalse(manager.is_alive())
+        self.assertTrue(manager.empty())
+        for i in range(3):
+            self.assertEqual([msg.msgID for (source, msg) in msgs
+                              if source == i],
+                             [10 * i + n for n in range(5)])
+        self.assertIsInstance(msgs[0][1], UBX.ACK.ACK)
+
+    def testFramingPerSource(self):
+        (a0, b0), (a1, b1) = self.pairs[:2]
+        manager = _Recorder(stopWhenEmpty=True)
+        manager.add(b0, 'rover')
+        manager.add(b1, 'base')
+        manager.start()
+        frame = _ack(1)
+        a0.sendall(frame[:5])
+        a1.sendall(_ack(2)[:3])
+        time.sleep(0.02)
+        a1.sendall(_ack(2)[3:] + NMEA)
+        a0.sendall(frame[5:])
+        a0.close()
+        a1.close()
+        manager.join(2)
+        self.assertFalse(manager.is_alive())
+        self.assertEqual([e for e in manager.events if e[0] == 'rover'],
+                         [('rover', 1), ('rover', 'closed')])
+        self.assertEqual([e for e in manager.events if e[0] == 'base'],
+                         [('base', 2), ('base', 'NMEA'), ('base', 'closed')])
+        self.assertEqual(manager.sources(), [])
+
+    def testHandler(self):
+        (a0, b0), (a1, b1) = self.pairs[:2]
+        handler = _Handler()
+        manager = _Recorder()
+        manager.add(b0, handler=handler)
+        manager.add(b1)
+        manager.start()
+        a0.sendall(_ack(3))
+        a1.sendall(_ack(4))
+        self.assertTrue(_waitFor(lambda: handler.msgs and manager.events))
+        manager.shutdown()
+        manager.join(1)
+        self.assertEqual([msg.msgID for msg in handler.msgs], [3])
+        self.assertEqual(manager.events, [(1, 4)])
+
+    def testAddWhileRunning(self):
+        manager = _Recorder(stopWhenEmpty=True)
+        manager.start()
+        time.sleep(0.02)
+        self.assertTrue(manager.is_alive())     # waits for the first source
+        (a, b) = self.pairs[0]
+        manager.add(b, 'late')
+        a.sendall(_ack(5))
+        self.assertTrue(_waitFor(lambda: manager.events))
+        manager.remove('late')
+        manager.join(1)
+        self.assertFalse(manager.is_alive())
+        self.assertEqual(manager.events, [('late', 5)])
+
+    def testIds(self):
+        manager = UBXMultiManager()
+        (_, b0), (_, b1), (_, b2) = self.pairs
+        self.assertEqual(manager.add(b0, 1), 1)
+        self.assertEqual(manager.add(b1), 0)
+        self.assertEqual(manager.add(b2), 2)
+        with self.assertRaises(Exception):
+            manager.add(b0, 1)
+        manager.remove(0)
+        self.assertEqual(sorted(manager.sources()), [1, 2])
+        with self.assertRaises(KeyError):
+            manager.remove(0)
+
+    def testPipeAndUdp(self):
+        r, w = os.pipe()
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            udp.bind(('127.0.0.1', 0))
+            manager = _Recorder()
+            manager.add(r, 'pipe')
+            manager.add(udp, 'udp')
+            manager.start()
+            os.write(w, _ack(6))
+            sender.sendto(_ack(7), udp.getsockname())
+            sender.sendto(b'', udp.getsockname())   # not the end of a datagram
+            sender.sendto(_ack(8), udp.getsockname())
+            os.close(w)
+            self.assertTrue(_waitFor(lambda: len(manager.events) == 4))
+            manager.shutdown()
+            manager.join(1)
+            self.assertEqual(sorted(manager.events, key=str),
+                             sorted([('pipe', 6), ('pipe', 'closed'),
+                                     ('udp', 7), ('udp', 8)], key=str))
+        finally:
+            os.close(r)
+            udp.close()
+            sender.close()
+
+    def testUnpollable(self):
+        manager = UBXMultiManager()
+        with tempfile.TemporaryFile() as f:
+            with self.assertRaises(Exception):
+                manager.add(f)
+        with self.assertRaises(Exception):
+            manager.add(object())
+        self.assertEqual(manager.sources(), [])
+
+    def testHandlerError(self):
+        # the failing source is removed, the others are read on
+        (a0, b0), (a1, b1) = self.pairs[:2]
+
+        class Failing(_Handler):
+            def onUBX(self, obj):
+                raise ValueError("handler error")
+
+        manager = _Recorder()
+        manager.add(b0, 'bad', handler=Failing())
+        manager.add(b1, 'good')
+        manager.start()
+        try:
+            a0.sendall(_ack(1))
+            self.assertTrue(_waitFor(lambda: len(manager.events) == 2))
+            a1.sendall(_ack(2))
+            self.assertTrue(_waitFor(lambda: len(manager.events) == 3))
+            self.assertTrue(manager.is_alive())
+        finally:
+            manager.shutdown()
+            manager.join(1)
+        self.assertEqual(manager.events, [('bad', 'ERR'), ('bad', 'closed'),
+                                          ('good', 2)])
+        self.assertEqual(manager.sources(), ['good'])
+
+    def testSend(self):
+        (a, b) = self.pairs[0]
+        manager = UBXMultiManager()
+        manager.add(b, 'rover')
+        manager.send('rover', UBX.MON.VER.Get())
+        self.assertEqual(a.recv(100), UBX.MON.VER.Get().serialize())
+
+    def testShutdown(self):
+        manager = UBXMultiManager()
+        manager.add(self.pairs[0][1])
+        manager.start()
+        time.sleep(0.02)
+        t0 = time.monotonic()
+        manager.shutdown()
+        manager.join(1)
+        self.assertFalse(manager.is_alive())
+        self.assertLess(time.monotonic() - t0, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
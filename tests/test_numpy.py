@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Unit tests for the NumPy dtypes and the batch decoder."""
+
+import os
+import unittest
+from ubx import UBX
+from ubx.UBXMessage import messageRegistry
+from ubx import UBXNumpy
+
+np = UBXNumpy.np
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestNumpy(unittest.TestCase):
+
+    def testDtypes(self):
+        for messages in messageRegistry().values():
+            for Msg in messages.values():
+                codec = Msg._codec
+                self.assertEqual(Msg.dtype.itemsize, codec.sizeOnce)
+                self.assertEqual(Msg.dtype.names[:len(codec.onceNames)],
+                                 codec.onceNames)
+        self.assertEqual(UBX.NAV.PVT.dtype['lat'], np.dtype('<i4'))
+        self.assertEqual(UBX.MON.VER.dtype['swVersion'], np.dtype('S30'))
+        self.assertEqual(UBXNumpy.messageDtype(UBX.NAV.SVINFO, 3).itemsize,
+                         8 + 3 * 12)
+
+    def testDecodeBatch(self):
+        payloads = [os.urandom(92) for _ in range(50)]
+        pvt = UBXNumpy.decodeBatch(UBX.NAV.PVT, payloads)
+        self.assertEqual(len(pvt), 50)
+        for (row, payload) in zip(pvt, payloads):
+            obj = UBX.NAV.PVT(payload)
+            for name in UBX.NAV.PVT._codec.onceNames:
+                self.assertEqual(row[name], getattr(obj, name))
+        pvt2 = UBXNumpy.decodeBatch(UBX.NAV.PVT, b''.join(payloads))
+        self.assertEqual(pvt.tobytes(), pvt2.tobytes())
+
+    def testRepeated(self):
+        payloads = [os.urandom(8 + 3 * 12) for _ in range(5)]
+        svinfo = UBXNumpy.decodeBatch(UBX.NAV.SVINFO, payloads)
+        self.assertEqual(svinfo['repeated'].shape, (5, 3))
+        obj = UBX.NAV.SVINFO(payloads[4])
+        self.assertEqual(list(svinfo['repeated']['cno'][4]),
+                         list(obj.repeated.cno))
+        self.assertEqual(obj.dtype, svinfo.dtype)
+        self.assertEqual(
+            len(UBXNumpy.decodeBatch(UBX.NAV.SVINFO, b''.join(payloads), N=3)),
+            5)
+
+    def testCH(self):
+        payload = b'ROM CORE 3.01'.ljust(30, b'\x00') + b'0008'.ljust(10, b'\x00')
+        ver = UBXNumpy.decodeBatch(UBX.MON.VER, [payload])
+        self.assertEqual(ver['swVersion'][0], b'ROM CORE 3.01')
+
+    def testErrors(self):
+        with self.assertRaises(Exception):
+            UBXNumpy.decodeBatch(UBX.NAV.PVT, [bytes(92), bytes(91)])
+        with self.assertRaises(Exception):
+            UBXNumpy.decodeBatch(UBX.NAV.PVT, bytes(93))
+        with self.assertRaises(Exception):
+            UBXNumpy.decodeBatch(UBX.NAV.SVINFO, bytes(20))
+        self.assertEqual(len(UBXNumpy.decodeBatch(UBX.NAV.PVT, [])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Unit tests for the parallel decoder."""
+
+import os
+import random
+import tempfile
+import unittest
+from ubx import UBX
+from ubx.UBXMessage import UBXMessage
+from ubx.UBXLog import UBXLog
+from ubx import UBXParallel
+from ubx.UBXParallel import parallelMessages, parallelColumns, resync
+
+
+def _corpus(rnd, n):
+    """UBX frames with bad frames, NMEA, junk and frames that contain a
+    valid looking frame in their payload."""
+    parts = []
+    for i in range(n):
+        k = rnd.random()
+        if k < 0.4:
+            parts.append(UBXMessage.make(
+                0x01, 0x07, bytes(rnd.getrandbits(8) for _ in range(92))))
+        elif k < 0.5:
+            frame = bytearray(UBXMessage.make(0x01, 0x07, bytes(92)))
+            frame[rnd.randrange(6, 98)] ^= 4
+            parts.append(bytes(frame))
+        elif k < 0.6:
+            parts.append(b'$GPGGA,1,2*00\r\n')
+        elif k < 0.7:
+            parts.append(bytes(rnd.getrandbits(8)
+                               for _ in range(rnd.randint(1, 40))))
+        elif k < 0.8:
+            # b5 62 00 00 00 00 00 00 is a valid empty frame
+            parts.append(UBXMessage.make(0x01, 0x07, b'\xb5\x62' + bytes(90)))
+        else:
+            parts.append(UBXMessage.make(0x05, 0x01, bytes([i & 0xff, 2])))
+    return b''.join(parts)
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.ubx')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_corpus(random.Random(1), 200))
+        with UBXLog(self.path) as log:
+            self.expected = [m.serialize() for m in log.messages()]
+            self.pvtTimes = [m.iTOW for m in log.messages(UBX.NAV.PVT)]
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testResync(self):
+        buf = b'\xb5\x62junk' + UBXMessage.make(0x05, 0x01, b'\x06\x01')
+        self.assertEqual(resync(buf, 0, len(buf)), 6)
+        self.assertEqual(resync(buf, 7, len(buf)), None)
+        self.assertEqual(resync(buf, 0, len(buf) - 1), None)
+
+    def testMessages(self):
+        for chunkSize in (1, 37, 1000, 1 << 20):
+            msgs = list(parallelMessages(self.path, workers=2,
+                                         chunkSize=chunkSize))
+            self.assertEqual([m.serialize() for m in msgs], self.expected)
+
+    def testRerun(self):
+        # a chunk boundary inside the payload of a frame that contains a
+        # valid looking frame: the next chunk has to be decoded again
+        frame = UBXMessage.make(0x01, 0x07, b'\xb5\x62' + bytes(90))
+        ack = UBXMessage.make(0x05, 0x01, b'\x06\x01')
+        with open(self.path, 'wb') as f:
+            f.write(ack + frame + ack)
+        msgs = list(parallelMessages(self.path, workers=2, chunkSize=12))
+        self.assertEqual([type(m) for m in msgs],
+                         [UBX.ACK.ACK, UBX.NAV.PVT, UBX.ACK.ACK])
+
+    def testSelected(self):
+        msgs = list(parallelMessages(self.path, UBX.ACK.ACK, workers=2,
+                                     chunkSize=500, lazy=True))
+        self.assertTrue(msgs)
+        self.assertTrue(all(isinstance(m, UBX.ACK.ACK) for m in msgs))
+
+    def testRepeated(self):
+        # NAV-SVINFO with 3 blocks, the blocks are sent back from the workers
+        payload = bytes(8) + bytes(range(36))
+        with open(self.path, 'wb') as f:
+            f.write(UBXMessage.make(0x01, 0x30, payload) * 3)
+        msgs = list(parallelMessages(self.path, workers=2, chunkSize=60))
+        self.assertEqual(len(msgs), 3)
+        self.assertEqual(msgs[2].repeated.svid, (1, 13, 25))
+        self.assertEqual(msgs[2].serialize(),
+                         UBXMessage.make(0x01, 0x30, payload))
+
+    @unittest.skipIf(UBXParallel.UBXNumpy.np is None, "NumPy is not installed")
+    def testColumns(self):
+        columns = parallelColumns(self.path, UBX.NAV.PVT, workers=2,
+                                  chunkSize=300)
+        self.assertEqual(list(columns), [UBX.NAV.PVT])
+        self.assertEqual(list(columns[UBX.NAV.PVT]['iTOW']), self.pvtTimes)
+
+    @unittest.skipIf(UBXParallel.UBXNumpy.np is None, "NumPy is not installed")
+    def testColumnsUnknown(self):
+        # all types: frames of unregistered messages are skipped
+        unknown = UBXMessage.make(0x02, 0x15, bytes(20))
+        pvt = UBXMessage.make(0x01, 0x07, bytes(92))
+        with open(self.path, 'wb') as f:
+            f.write((pvt + unknown) * 20)
+        columns = parallelColumns(self.path, workers=2, chunkSize=500)
+        self.assertEqual(list(columns), [UBX.NAV.PVT])
+        self.assertEqual(len(columns[UBX.NAV.PVT]), 20)
+
+    def testEmpty(self):
+        open(self.path, 'wb').close()
+        self.assertEqual(list(parallelMessages(self.path, workers=2)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
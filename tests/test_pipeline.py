@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Unit tests for the pipelined manager."""
+
+import io
+import time
+import socket
+import threading
+import unittest
+from ubx.UBXManager import UBXManager
+from ubx.UBXPipeline import UBXPipeline
+from ubx.UBXGenerator import ackFrame, GGA as NMEA
+
+
+def _stream(n):
+    """ACK-ACK, ACK-NAK and NMEA sentences, numbered in the ACK payloads."""
+    frames = []
+    for i in range(n):
+        if i % 5 == 4:
+            frames.append(NMEA)
+        else:
+            frames.append(ackFrame(i % 256, nak=not i % 2))
+    return b''.join(frames)
+
+
+def _key(obj):
+    return ('NMEA', None) if isinstance(obj, (bytes, str)) else \
+        (type(obj).__name__, obj.msgID)
+
+
+class _Collect(object):
+    """Records what the handlers get."""
+
+    def __init__(self, *args, **kwargs):
+        super(_Collect, self).__init__(*args, **kwargs)
+        self.events = []
+        self.lock = threading.Lock()
+
+    def onUBX(self, obj):
+        with self.lock:
+            self.events.append(_key(obj))
+
+    def onNMEA(self, buffer):
+        with self.lock:
+            self.events.append(_key(buffer))
+
+
+class _Manager(_Collect, UBXManager):
+    pass
+
+
+class _Pipeline(_Collect, UBXPipeline):
+    pass
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        data = _stream(2000)
+        manager = _Manager(io.BufferedReader(io.BytesIO(data)), eofTimeout=0)
+        manager.run()
+        self.data = data
+        self.expected = manager.events
+        self.assertEqual(len(self.expected), 2000)
+
+    def _run(self, ordering, **kwargs):
+        manager = _Pipeline(io.BufferedReader(io.BytesIO(self.data)),
+                            ordering=ordering, eofTimeout=0, **kwargs)
+        manager.start()
+        manager.join()
+        return manager
+
+    def testTotal(self):
+        manager = self._run('total', workers=3, queueSize=16)
+        self.assertEqual(manager.events, self.expected)
+        self.assertEqual(manager.depths(), {'decode': [0], 'dispatch': 0})
+
+    def testType(self):
+        manager = self._run('type', workers=3, queueSize=16)
+        for name in ('ACK', 'NAK', 'NMEA'):
+            self.assertEqual([e for e in manager.events if e[0] == name],
+                             [e for e in self.expected if e[0] == name])
+        self.assertEqual(manager.depths(), {'decode': [0, 0, 0]})
+
+    def testNone(self):
+        manager = self._run('none', workers=3)
+        self.assertEqual(sorted(manager.events, key=str),
+                         sorted(self.expected, key=str))
+
+    def testOrdering(self):
+        with self.assertRaises(Exception):
+            UBXPipeline(io.BytesIO(), ordering='fifo')
+
+    def testSlowHandler(self):
+        # the reader keeps reading while a handler blocks
+        a, b = socket.socketpair()
+        release = threading.Event()
+
+        class Blocking(_Pipeline):
+            def onUBX(self, obj):
+                release.wait(5)
+                _Pipeline.onUBX(self, obj)
+
+        manager = Blocking(b, workers=1, ordering='type', queueSize=1000)
+        manager.start()
+        try:
+            a.sendall(b''.join(ackFrame(i) for i in range(20)))
+            deadline = time.monotonic() + 5
+            while sum(manager.depths()['decode']) < 19 and \
+                    time.monotonic() < deadline:
+                time.sleep(0.001)
+            self.assertEqual(manager.depths(), {'decode': [19]})
+        finally:
+            release.set()
+            a.close()
+            manager.shutdown()
+            manager.join(5)
+            b.close()
+        self.assertFalse(manager.is_alive())
+        self.assertEqual(len(manager.events), 20)
+
+    def testTotalBackpressure(self):
+        # with 'total' a slow handler holds up the reader
+        a, b = socket.socketpair()
+        release = threading.Event()
+
+        class Blocking(_Pipeline):
+            def onUBX(self, obj):
+                release.wait(5)
+                _Pipeline.onUBX(self, obj)
+
+        manager = Blocking(b, workers=2, ordering='total', queueSize=4)
+        manager.start()
+        try:
+            a.sendall(b''.join(ackFrame(i) for i in range(20)))
+            time.sleep(0.1)
+            depths = manager.depths()
+            self.assertLessEqual(sum(depths['decode']) + depths['dispatch'], 4)
+        finally:
+            release.set()
+            a.close()
+            manager.shutdown()
+            manager.join(5)
+            b.close()
+        self.assertFalse(manager.is_alive())
+
+    def testHandlerError(self):
+        class Failing(_Pipeline):
+            def onUBX(self, obj):
+                raise ValueError("handler error")
+
+        excepthook, threading.excepthook = threading.excepthook, \
+            lambda args: None
+        try:
+            for ordering in ('type', 'total'):
+                manager = Failing(io.BufferedReader(io.BytesIO(self.data)),
+                                  workers=2, ordering=ordering, queueSize=4,
+                                  eofTimeout=0)
+                manager.start()
+                manager.join(5)
+                self.assertFalse(manager.is_alive())
+        finally:
+            threading.excepthook = excepthook
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Unit tests for the bounded message queue of UBXQueue."""
+
+import io
+import time
+import queue
+import socket
+import multiprocessing
+import threading
+import unittest
+from ubx import UBX
+from ubx.UBXManager import UBXQueue, MessageQueue
+from ubx.UBXGenerator import ackFrame as _ack
+
+
+class _Quiet(UBXQueue):
+
+    def onNMEA(self, buffer):
+        pass
+
+
+class TestMessageQueue(unittest.TestCase):
+
+    def testBlock(self):
+        q = MessageQueue(2)
+        self.assertTrue(q.put(1))
+        self.assertTrue(q.put(2))
+        with self.assertRaises(queue.Full):
+            q.put(3, timeout=0.01)
+        self.assertEqual((q.dropped, q.highWater), (0, 2))
+
+    def testDropNewest(self):
+        q = MessageQueue(2, 'drop_newest')
+        self.assertEqual([q.put(i) for i in range(4)],
+                         [True, True, False, False])
+        self.assertEqual(q.get_many(10), [0, 1])
+        self.assertEqual((q.dropped, q.highWater), (2, 2))
+
+    def testDropOldest(self):
+        q = MessageQueue(2, 'drop_oldest')
+        for i in range(5):
+            self.assertTrue(q.put(i))
+        self.assertEqual(q.get_many(10), [3, 4])
+        self.assertEqual((q.dropped, q.highWater), (3, 2))
+
+    def testLatest(self):
+        q = MessageQueue(0, 'latest')
+        q.put(1)
+        q.put('a')
+        q.put(2)        # replaces 1 and goes to the end
+        q.put(2.5)
+        self.assertEqual(q.get_many(10), ['a', 2, 2.5])
+        self.assertEqual((q.dropped, q.highWater), (1, 3))
+        q = MessageQueue(2, 'latest')
+        q.put(1)
+        q.put('a')
+        q.put(2.5)      # full: drops 1
+        self.assertEqual(q.get_many(10), ['a', 2.5])
+        self.assertEqual(q.dropped, 1)
+
+    def testGetMany(self):
+        q = MessageQueue()
+        self.assertEqual(q.get_many(3, timeout=0.01), [])
+        for i in range(5):
+            q.put(i)
+        self.assertEqual(q.get_many(3), [0, 1, 2])
+        self.assertEqual(q.get_many(3), [3, 4])
+        threading.Timer(0.02, q.put, (5,)).start()
+        self.assertEqual(q.get_many(3, timeout=5), [5])
+
+    def testJoin(self):
+        q = MessageQueue(2, 'drop_oldest')
+        for i in range(3):
+            q.put(i)
+        for _ in q.get_many(10):
+            q.task_done()
+        q.join()        # the dropped message counts as done
+        q.put(3)
+        q.put(4)
+        self.assertEqual(q.get_many(10, taskDone=True), [3, 4])
+        self.assertEqual(q.unfinished_tasks, 0)
+        q.join()
+
+    def testPolicy(self):
+        with self.assertRaises(Exception):
+            MessageQueue(1, 'random')
+
+
+class TestUBXQueue(unittest.TestCase):
+
+    def testCompatible(self):
+        data = b''.join(_ack(i) for i in range(10))
+        ubxq = _Quiet(io.BytesIO(data), start=True, eofTimeout=0)
+        msgs = [ubxq.get(timeout=5) for _ in range(10)]
+        self.assertEqual([m.msgID for m in msgs], list(range(10)))
+        ubxq.join()
+        self.assertEqual(ubxq.dropped, 0)
+        self.assertGreaterEqual(ubxq.highWater, 1)
+
+    def testDropOldest(self):
+        data = b''.join(_ack(i) for i in range(100))
+        ubxq = _Quiet(io.BytesIO(data), eofTimeout=0, maxsize=10,
+                      policy='drop_oldest', start=True)
+        threading.Thread.join(ubxq)     # the reader only
+        self.assertEqual([m.msgID for m in ubxq.get_many(100)],
+                         list(range(90, 100)))
+        self.assertEqual((ubxq.dropped, ubxq.highWater), (90, 10))
+        ubxq.join()
+
+    def testLatest(self):
+        data = b''.join(_ack(i) for i in range(10)) + \
+            _ack(1, nak=True)
+        ubxq = _Quiet(io.BytesIO(data), eofTimeout=0, policy='latest')
+        ubxq.run()
+        msgs = ubxq.get_many(10)
+        self.assertEqual([(type(m), m.msgID) for m in msgs],
+                         [(UBX.ACK.ACK, 9), (UBX.ACK.NAK, 1)])
+
+    def testTaskDone(self):
+        data = b''.join(_ack(i) for i in range(3))
+        ubxq = _Quiet(io.BytesIO(data), eofTimeout=0, autoTaskDone=False,
+                      start=True)
+        threading.Thread.join(ubxq)
+        self.assertEqual(len(ubxq.get_many(10)), 3)
+        t0 = time.monotonic()
+        ubxq.join(0.05)     # not done yet
+        self.assertGreaterEqual(time.monotonic() - t0, 0.04)
+        for _ in range(3):
+            ubxq.task_done()
+        ubxq.join()
+
+    def testForeignQueue(self):
+        q = multiprocessing.JoinableQueue()
+        data = b''.join(_ack(i) for i in range(3))
+        ubxq = _Quiet(io.BytesIO(data), eofTimeout=0, queue=q, start=True)
+        self.assertEqual([ubxq.get(timeout=5).msgID for _ in range(3)],
+                         [0, 1, 2])
+        ubxq.join()
+        self.assertEqual((ubxq.dropped, ubxq.highWater), (0, None))
+
+    def testBlockShutdown(self):
+        # a reader blocked on a full queue stops on shutdown
+        a, b = socket.socketpair()
+        try:
+            ubxq = _Quiet(b, maxsize=2, start=True)
+            a.sendall(b''.join(_ack(i) for i in range(5)))
+            deadline = time.monotonic() + 5
+            while ubxq.qsize() < 2 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            time.sleep(0.05)
+            self.assertEqual((ubxq.qsize(), ubxq.dropped), (2, 0))
+            ubxq.shutdown()
+            threading.Thread.join(ubxq, 2)
+            self.assertFalse(ubxq.is_alive())
+        finally:
+            a.close()
+            b.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Unit tests for the timed replay engine."""
+
+import os
+import time
+import socket
+import shutil
+import tempfile
+import threading
+import unittest
+from ubx import UBX
+from ubx.UBXMessage import UBXMessage
+from ubx.UBXManager import UBXHandler
+from ubx.UBXFramer import UBXFramer
+from ubx.UBXArchive import UBXArchiveWriter
+from ubx.UBXReplay import UBXReplay, logFrames, openPty
+from ubx.UBXGenerator import ackFrame
+
+ACK = ackFrame()
+NMEA = b'$GPGGA,1,2*00\r\n'
+
+
+def _pvt(iTOW):
+    return UBXMessage.make(0x01, 0x07, iTOW.to_bytes(4, 'little') + bytes(88))
+
+
+class _Collector(object):
+    """Sink that records the monotonic time of each write."""
+
+    def __init__(self):
+        self.writes = []
+
+    def __call__(self, data):
+        self.writes.append((time.monotonic(), bytes(data)))
+
+    def data(self):
+        return b''.join(d for (_, d) in self.writes)
+
+
+class _Handler(UBXHandler):
+
+    def __init__(self):
+        self.lazy = False
+        self._framer = UBXFramer()
+        self.msgs = []
+
+    def onUBX(self, obj):
+        self.msgs.append(obj)
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        # 10 frames 50 ms apart
+        self.frames = [(100 + 0.05 * i, _pvt(i)) for i in range(10)]
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testTiming(self):
+        sink = _Collector()
+        start = time.monotonic()
+        stats = UBXReplay(self.frames, sink).run()
+        self.assertEqual(sink.data(), b''.join(f for (_, f) in self.frames))
+        self.assertEqual(len(sink.writes), 10)
+        for (i, (t, _)) in enumerate(sink.writes):
+            self.assertGreaterEqual(t - start, 0.05 * i - 0.001)
+            self.assertLess(t - start, 0.05 * i + 0.04)
+        self.assertEqual((stats.frames, stats.bytes), (10, 1000))
+        self.assertAlmostEqual(stats.seconds, 0.45, delta=0.05)
+        self.assertGreaterEqual(stats.latenessP50, 0)
+        self.assertLess(stats.latenessP50, 0.02)
+        self.assertLessEqual(stats.latenessP99, stats.latenessMax)
+
+    def testRate(self):
+        stats = UBXReplay(self.frames, _Collector(), rate=5).run()
+        self.assertAlmostEqual(stats.seconds, 0.09, delta=0.04)
+        sink = _Collector()
+        stats = UBXReplay(self.frames, sink, rate=None).run()
+        self.assertLess(stats.seconds, 0.05)
+        self.assertEqual(len(sink.writes), 1)     # one batch
+        self.assertEqual(stats.latenessMax, 0)
+
+    def testLateness(self):
+        # lateness includes the write, overdue frames are written together
+        sink = _Collector()
+
+        def slowWrite(data):
+            time.sleep(0.02)
+            sink(data)
+
+        frames = [(0, ACK), (0, ACK), (0.2, ACK)]
+        stats = UBXReplay(frames, slowWrite).run()
+        self.assertEqual([d for (_, d) in sink.writes], [ACK + ACK, ACK])
+        self.assertGreaterEqual(stats.latenessP50, 0.02)
+        self.assertLess(stats.latenessMax, 0.1)
+
+    def testLoop(self):
+        sink = _Collector()
+        stats = UBXReplay(self.frames, sink, rate=None, loop=True).run(
+            maxFrames=25)
+        self.assertEqual(stats.frames, 25)
+        frames = [f for (_, f) in self.frames]
+        self.assertEqual(sink.data(), b''.join((frames * 3)[:25]))
+        # loop over a generator: the function is called for each pass
+        sink = _Collector()
+        # the passes are 0.5 s apart, 0.01 s at rate 50
+        UBXReplay(lambda: iter(self.frames), sink, rate=50, loop=True).run(
+            duration=0.0325)
+        self.assertEqual(sink.data(), b''.join(frames * 3 + frames[:3]))
+
+    def testFilter(self):
+        frames = [(0, ACK), (0, NMEA), (0.01, _pvt(1)), (0.02, ACK)]
+        sink = _Collector()
+        stats = UBXReplay(frames, sink, msgTypes=(UBX.ACK.ACK,)).run()
+        self.assertEqual(sink.data(), ACK + ACK)
+        self.assertEqual(stats.frames, 2)
+
+    def testStop(self):
+        replay = UBXReplay([(0, ACK), (10, ACK)], _Collector())
+        threading.Timer(0.05, replay.stop).start()
+        stats = replay.run()
+        self.assertEqual(stats.frames, 1)
+        self.assertLess(stats.seconds, 1)
+
+    def testFiles(self):
+        archivePath = os.path.join(self.dir, 'log.ubxa')
+        with UBXArchiveWriter(archivePath) as writer:
+            for (t, frame) in self.frames:
+                writer.write(frame, t)
+        handler = _Handler()
+        stats = UBXReplay.fromFile(archivePath, handler, rate=10).run()
+        self.assertEqual([m.iTOW for m in handler.msgs], list(range(10)))
+        self.assertAlmostEqual(stats.seconds, 0.045, delta=0.03)
+        # raw log: the time is the iTOW, here 1 s apart
+        logPath = os.path.join(self.dir, 'log.ubx')
+        with open(logPath, 'wb') as f:
+            f.write(NMEA + b''.join(_pvt(1000 * i) + ACK for i in range(5)))
+        self.assertEqual([t for (t, _) in logFrames(logPath)],
+                         [0, 0, 0, 1, 1, 2, 2, 3, 3, 4, 4])
+        sink = _Collector()
+        stats = UBXReplay.fromFile(logPath, sink, rate=100).run()
+        self.assertEqual(stats.frames, 11)
+        self.assertAlmostEqual(stats.seconds, 0.04, delta=0.03)
+
+    def testPtyAndSocket(self):
+        master, name = openPty()
+        slave = os.open(name, os.O_RDWR | os.O_NOCTTY)
+        try:
+            UBXReplay(self.frames, master, rate=None).run()
+            data = b''
+            while len(data) < 1000:
+                data += os.read(slave, 1000)
+            self.assertEqual(data, b''.join(f for (_, f) in self.frames))
+        finally:
+            os.close(slave)
+            os.close(master)
+        a, b = socket.socketpair()
+        with a, b:
+            UBXReplay(self.frames, a, rate=None).run()
+            a.close()
+            data = b''
+            while True:
+                chunk = b.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+            self.assertEqual(len(data), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
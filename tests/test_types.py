@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Unit tests for the offset based decoding of Types."""
+
+import os
+import unittest
+from ubx import UBX
+from ubx.Types import U1, I1, X1, U2, I2, X2, U4, I4, X4, R4, R8, CH, U
+
+
+class TestParseFrom(unittest.TestCase):
+
+    def testGenericTypes(self):
+        buf = os.urandom(64)
+        for Typ in (U1, I1, X1, U2, I2, X2, U4, I4, X4, R8):
+            typ = Typ(1)
+            for offset in (0, 3, 64 - typ._size):
+                val, rest = typ.parse(buf[offset:])
+                val2, end = typ.parseFrom(memoryview(buf), offset)
+                self.assertEqual(val, val2)
+                self.assertEqual(end, offset + typ._size)
+                self.assertEqual(rest, buf[end:])
+
+    def testR4(self):
+        buf = b'\x00\x00\x80\x3f\x00\x00\x00\xc0'
+        self.assertEqual(R4(1).parseFrom(buf, 0), (1.0, 4))
+        self.assertEqual(R4(1).parseFrom(buf, 4), (-2.0, 8))
+
+    def testCHandU(self):
+        buf = b'xxABC\x00\x00yy'
+        self.assertEqual(CH(1, 5, nullTerminatedString=True).parseFrom(buf, 2),
+                         ("ABC", 7))
+        self.assertEqual(CH(1, 5).parseFrom(memoryview(buf), 2),
+                         (b'ABC\x00\x00', 7))
+        self.assertEqual(U(1, 3).parseFrom(buf, 6), (b'\x00yy', 9))
+
+    def testTooShort(self):
+        with self.assertRaises(Exception):
+            U4(1).parseFrom(b'\x00\x00\x00\x00', 1)
+        with self.assertRaises(Exception):
+            CH(1, 4).parseFrom(b'abc', 0)
+
+    def testCodecMatchesParse(self):
+        payload = os.urandom(8 + 12 * 40)
+        svinfo = UBX.NAV.SVINFO(memoryview(payload))
+        N, names, types = UBX.NAV.SVINFO._codec.layout(len(payload))
+        rest = payload
+        for name, typ in zip(names, types):
+            val, rest = typ.parse(rest)
+            self.assertEqual(getattr(svinfo, name), val)
+        self.assertEqual(rest, b'')
+
+    def testCodecOffset(self):
+        payload = os.urandom(92)
+        codec = UBX.NAV.PVT._codec
+        self.assertEqual(codec.decode(b'\xb5\x62' + payload, 0, offset=2),
+                         codec.decode(payload, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
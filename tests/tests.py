@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
 """Unit tests."""
 
+import pickle
 import unittest
 from ubx import UBX
-from ubx import parseUBXPayload, parseUBXMessage
+from ubx import UBXMessage, parseUBXPayload, parseUBXMessage
+from ubx import lookupMessage, messageRegistry, registerMessage, lookupMessageName
+from ubx import slotsMessage
+from ubx.UBXMessage import _messageRegistry
+from ubx.Types import U1, U2
+from ubx import Codec
 
 
 class TestStringMethods(unittest.TestCase):
@@ -47,6 +53,161 @@ class TestStringMethods(unittest.TestCase):
         self.assertEqual(gnss.flags_4, 0x01010000)
         self.assertEqual(gnss.maxTrkCh_7, 0x0E)
 
+    def testMON_VER_serialize(self):
+        payload = b'ROM CORE 3.01 (107888)'.ljust(30, b'\x00') \
+            + b'00080000'.ljust(10, b'\x00') \
+            + b'FWVER=SPG 3.01'.ljust(30, b'\x00')
+        ver = parseUBXPayload(UBX.MON._class, UBX.MON.VER._id, payload)
+        ver2 = parseUBXMessage(ver.serialize())
+        self.assertEqual(ver2.swVersion, "ROM CORE 3.01 (107888)")
+        self.assertEqual(ver2.extension_1, "FWVER=SPG 3.01")
+        self.assertEqual(ver2.serialize(), ver.serialize())
+
+    def testSerializeInto(self):
+        payload = bytes(range(4)) + bytes(range(100, 116))
+        gnss = parseUBXPayload(UBX.CFG._class, UBX.CFG.GNSS._id, payload)
+        pvt = parseUBXPayload(UBX.NAV._class, UBX.NAV.PVT._id, bytes(92))
+        get = UBX.MON.VER.Get()
+        msgs = [gnss, pvt, get]
+        buf = bytearray(3 + sum(m.serializedSize() for m in msgs))
+        offset = 3
+        for m in msgs:
+            offset = m.serializeInto(buf, offset)
+        self.assertEqual(offset, len(buf))
+        self.assertEqual(bytes(buf[3:]), b''.join(m.serialize() for m in msgs))
+        self.assertEqual(gnss.serialize(),
+                         UBXMessage.make(UBX.CFG._class, UBX.CFG.GNSS._id, payload))
+        with self.assertRaises(Exception):
+            pvt.serializeInto(bytearray(50))
+        short = bytearray(len(payload))
+        with self.assertRaises(Exception):
+            UBXMessage.makeInto(short, 2, UBX.CFG._class, UBX.CFG.GNSS._id,
+                                payload)
+        self.assertEqual(len(short), len(payload))    # not grown
+
+    def testCodec(self):
+        codec = UBX.CFG.GNSS._codec
+        self.assertEqual(codec.sizeOnce, 4)
+        self.assertEqual(codec.sizeRepeat, 8)
+        N, names, types = codec.layout(20)
+        self.assertEqual(N, 2)
+        self.assertEqual(names[4:7], ('gnssId_1', 'resTrkCh_1', 'maxTrkCh_1'))
+        self.assertIs(codec.layout(20)[1], names)   # cached
+        with self.assertRaises(Exception):
+            codec.layout(21)
+
+    def testRegistry(self):
+        self.assertIs(lookupMessage(0x01, 0x07), UBX.NAV.PVT)
+        self.assertIs(lookupMessage(UBX.ACK._class, UBX.ACK.NAK._id), UBX.ACK.NAK)
+        self.assertIsNone(lookupMessage(0x01, 0xEE))
+        self.assertIsNone(lookupMessage(0x77, 0x01))
+        self.assertIs(messageRegistry()[0x0A][0x04], UBX.MON.VER)
+        with self.assertRaises(Exception):
+            parseUBXPayload(0x77, 0x01, b'')
+
+    def testRegisterMessage(self):
+        class EXTRA:
+            _id = 0xFE
+            class Fields:
+                a = U1(1)
+                b = U2(2)
+        registerMessage(UBX.TEST, EXTRA)
+        self.addCleanup(delattr, UBX.TEST, 'EXTRA')
+        self.addCleanup(UBX.TEST._lookup.pop, 0xFE)
+        self.addCleanup(_messageRegistry[UBX.TEST._class].pop, 0xFE)
+        self.assertIs(lookupMessage(UBX.TEST._class, 0xFE), EXTRA)
+        self.assertIs(UBX.TEST.EXTRA, EXTRA)
+        extra = parseUBXPayload(UBX.TEST._class, 0xFE, b'\x01\x02\x03')
+        self.assertEqual(extra.a, 1)
+        self.assertEqual(extra.b, 0x0302)
+        self.assertEqual(parseUBXMessage(extra.serialize()).b, 0x0302)
+
+    def testSlots(self):
+        payload = bytes(range(92))
+        # the registered messages keep their __dict__
+        pvt = parseUBXPayload(UBX.NAV._class, UBX.NAV.PVT._id, payload)
+        pvt.source = 'rover'
+        self.assertIs(lookupMessageName('NAV-PVT'), UBX.NAV.PVT)
+        pvt = parseUBXPayload(UBX.NAV._class, UBX.NAV.PVT._id, payload,
+                              slots=True)
+        self.assertIs(type(pvt), slotsMessage(UBX.NAV.PVT))
+        self.assertIsInstance(pvt, UBX.NAV.PVT)
+        self.assertIn('lat', type(pvt).__slots__)
+        self.assertEqual(pvt.month, 6)
+        pvt.month = 7
+        pvt2 = parseUBXMessage(pvt.serialize())
+        self.assertEqual(pvt2.month, 7)
+        self.assertEqual(pvt2.lat, pvt.lat)
+        self.assertEqual(str(pvt2), str(pvt))
+        # pickled by the field values
+        pvt.source = 'rover'
+        pvt3 = pickle.loads(pickle.dumps(pvt))
+        self.assertIs(type(pvt3), type(pvt))
+        self.assertEqual(pvt3.serialize(), pvt.serialize())
+        self.assertEqual(pvt3.source, 'rover')
+        # messages with a repeated block keep their __dict__
+        self.assertIs(slotsMessage(UBX.NAV.SVINFO), UBX.NAV.SVINFO)
+
+    def testLazy(self):
+        payload = bytes(range(32))   # 2 repeated blocks
+        svinfo = parseUBXPayload(UBX.NAV._class, UBX.NAV.SVINFO._id, payload,
+                                 lazy=True)
+        self.assertIsInstance(svinfo, UBX.NAV.SVINFO)
+        self.assertNotIn('numCh', svinfo.__dict__)
+        self.assertEqual(svinfo.numCh, 4)
+        self.assertIn('numCh', svinfo.__dict__)    # cached
+        self.assertEqual(svinfo.svid_2, 21)
+        with self.assertRaises(AttributeError):
+            svinfo.svid_3
+        eager = parseUBXPayload(UBX.NAV._class, UBX.NAV.SVINFO._id, payload)
+        self.assertEqual(str(svinfo), str(eager))
+        self.assertEqual(svinfo.serialize(), eager.serialize())
+        pvt = parseUBXPayload(UBX.NAV._class, UBX.NAV.PVT._id, bytes(92),
+                              lazy=True)
+        pvt.lat = 12345
+        self.assertEqual(parseUBXMessage(pvt.serialize()).lat, 12345)
+        with self.assertRaises(Exception):
+            parseUBXPayload(UBX.NAV._class, UBX.NAV.PVT._id, bytes(93),
+                            lazy=True)
+
+    def testRepeated(self):
+        payload = bytes(range(32))   # 2 repeated blocks
+        for lazy in (False, True):
+            svinfo = parseUBXPayload(UBX.NAV._class, UBX.NAV.SVINFO._id,
+                                     payload, lazy=lazy)
+            blocks = svinfo.repeated
+            self.assertEqual(len(blocks), 2)
+            self.assertEqual(blocks[1].svid, 21)
+            self.assertEqual(blocks[1], svinfo.repeated[-1])
+            self.assertEqual(blocks.cno, (12, 24))
+            self.assertEqual([b.chn for b in blocks], [8, 20])
+            self.assertEqual(svinfo.cno_2, 24)      # compatibility view
+            svinfo.cno_2 = 99       # writes through to the blocks
+            self.assertEqual(svinfo.repeated.cno, (12, 99))
+            self.assertEqual(svinfo.cno_2, 99)
+            self.assertNotIn('cno_2', svinfo.__dict__)
+            self.assertEqual(parseUBXMessage(svinfo.serialize()).cno_2, 99)
+            with self.assertRaises(AttributeError):
+                blocks.foo
+        ver = parseUBXPayload(UBX.MON._class, UBX.MON.VER._id,
+                              b'SW'.ljust(40, b'\x00') + b'EXT'.ljust(30, b'\x00'))
+        self.assertEqual(ver.repeated.extension, ('EXT',))
+        meas = UBX.ESF.MEAS(b'\x00\x00\x00\x00\x00\x10\x00\x00'
+                            + b'\x01\x00\x00\x0b\x02\x00\x00\x0c')
+        self.assertEqual([m.type for m in meas.measurements], [11, 12])
+        meas.data_2 = 0x0d000002
+        self.assertEqual([m.type for m in meas.measurements], [11, 13])
+        self.assertEqual(UBX.ESF.MEAS(meas.serialize()[6:-2]).data_2,
+                         0x0d000002)
+
+    @unittest.skipIf(Codec.np is None, "NumPy is not installed")
+    def testRepeatedArray(self):
+        payload = bytes(range(32))
+        svinfo = parseUBXPayload(UBX.NAV._class, UBX.NAV.SVINFO._id, payload)
+        array = svinfo.repeated.array
+        self.assertEqual(list(array['cno']), [12, 24])
+        self.assertEqual(int(array[1]['prRes']), svinfo.prRes_2)
+
 
 if __name__ == '__main__':
     unittest.main()
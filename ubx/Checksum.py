@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Bulk computation of the UBX checksum (8-bit Fletcher).
+
+For the bytes x_1..x_n of a buffer the per-byte algorithm computes
+
+    ck_a = x_1 + ... + x_n                   (mod 256)
+    ck_b = n*x_1 + (n-1)*x_2 + ... + 1*x_n   (mod 256)
+
+ck_b is the sum of the running sums of ck_a. Both sums are evaluated over
+the whole buffer at once: with NumPy for large buffers, otherwise with the
+C-level sum and itertools.accumulate. When a chunk of length m is appended
+to data with sums (a, b) the new sums are a + sum(chunk) and
+b + m*a + weighted(chunk), which is what Checksum.update does.
+"""
+
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:     # NumPy is optional
+    np = None
+
+_NUMPY_MIN = 256        # NumPy pays off from about this many bytes
+
+
+def _sumsPython(buf):
+    return sum(buf), sum(accumulate(buf))
+
+
+def _sumsNumpy(buf):
+    x = np.frombuffer(buf, np.uint8)
+    weights = np.arange(len(x), 0, -1, dtype=np.uint64)
+    return int(x.sum(dtype=np.uint64)), int(np.dot(weights, x))
+
+
+def sums(buf):
+    """Return (sum, weighted sum) of the bytes of buf, not reduced mod 256.
+
+    buf is any bytes-like object (bytes, bytearray, memoryview).
+    """
+    if np is not None and len(buf) >= _NUMPY_MIN:
+        return _sumsNumpy(buf)
+    return _sumsPython(buf)
+
+
+def checksum(buf, start=0, stop=None):
+    """Return the UBX checksum of buf[start:stop] (ck_a is the MSB)."""
+    n = len(buf)
+    if stop is None or stop > n:
+        stop = n
+    if np is not None and stop - start >= _NUMPY_MIN:
+        a, b = _sumsNumpy(memoryview(buf)[start:stop])
+    else:   # small, copying is cheaper than a memoryview
+        a, b = _sumsPython(buf[start:stop] if start or stop < n else buf)
+    return (a & 0xff) << 8 | (b & 0xff)
+
+
+class Checksum:
+    """Incrementally calculate UBX message checksums."""
+
+    def __init__(self, msg=None):
+        """Instantiate object.
+
+        If msg is not None calculate the checksum of the message, otherwise
+        instantiate the checksums to zero.
+        """
+        self.reset()
+        if msg is not None:
+            self.update(msg)
+
+    def reset(self):
+        """Reset the checksums to zero."""
+        self.a, self.b = 0x00, 0x00
+
+    def update(self, data):
+        """Update checksums with the bytes of data (one or more)."""
+        a, b = sums(data)
+        self.b = (self.b + len(data) * self.a + b) & 0xff
+        self.a = (self.a + a) & 0xff
+
+    def get(self):
+        """Return the checksum (a 16-bit integer, ck_a is the MSB)."""
+        return self.a * 256 + self.b
@@ -0,0 +1,310 @@
+"""Compiled message layouts.
+
+A Codec is built once per message class by initMessageClass. It holds the
+struct.Struct objects and the field names of the fixed block and of the
+repeated block, so that parsing, printing and serializing a message does not
+have to inspect the Fields class again.
+
+The repeated blocks of a message are decoded with struct.iter_unpack into a
+RepeatedBlocks record collection.
+"""
+
+from struct import Struct
+from operator import attrgetter
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:     # NumPy is optional
+    np = None
+
+
+class Codec(object):
+    """Compiled layout of the Fields of a UBX message."""
+
+    def __init__(self, fieldInfo):
+        """Compile the fieldInfo as returned by UBXMessage._mkFieldInfo."""
+        onceTypes, onceNames = fieldInfo['once']
+        repeat = fieldInfo['repeat']
+        repeatTypes, repeatNames = repeat['once'] if repeat else ([], [])
+        self.onceTypes = tuple(onceTypes)
+        self.onceNames = tuple(onceNames)
+        self.repeatTypes = tuple(repeatTypes)
+        self.repeatNames = tuple(repeatNames)
+        self.onceStruct = Struct('<' + ''.join(t.fmt for t in onceTypes))
+        self.repeatStruct = Struct('<' + ''.join(t.fmt for t in repeatTypes))\
+            if repeatTypes else None
+        self.sizeOnce = self.onceStruct.size
+        self.sizeRepeat = self.repeatStruct.size if repeatTypes else 0
+        # (index, converter) pairs for fields that are not plain numbers
+        self._onceFromRaw = _converters(onceTypes, 'fromRaw')
+        self._onceToRaw = _converters(onceTypes, 'toRaw')
+        self._repeatFromRaw = _converters(repeatTypes, 'fromRaw')
+        self._repeatToRaw = _converters(repeatTypes, 'toRaw')
+        self._layouts = {}  # msgLength -> (N, names, types)
+        self._packers = {}  # N -> (Struct, converters, attribute getter)
+        # name -> (offset, Struct, fromRaw or None) for decoding single fields,
+        # the offsets of the repeated fields are relative to their block
+        self.fieldOffsets = _fieldOffsets(onceTypes, onceNames)
+        self.repeatFieldOffsets = _fieldOffsets(repeatTypes, repeatNames)
+        # the records of the repeated block
+        self.Record = namedtuple('Record', repeatNames) if repeatNames else None
+        self.repeatIndex = dict((name, i) for (i, name) in enumerate(repeatNames))
+        # NumPy dtype descriptions (lists of (name, dtype string))
+        self.onceDtype = [(name, t.dtype)
+                          for (name, t) in zip(onceNames, onceTypes)]
+        self.repeatDtype = [(name, t.dtype)
+                            for (name, t) in zip(repeatNames, repeatTypes)]
+        self.Message = None     # the message class, set by initMessageClass
+
+    def __reduce__(self):
+        # pickled as a reference to the message class, e.g. for RepeatedBlocks
+        if self.Message is None:
+            raise TypeError("Codec without message class cannot be pickled")
+        return (_messageCodec, (self.Message,))
+
+    def count(self, msgLength):
+        """Return the number of repeated blocks in a message of msgLength.
+
+        Raises an exception if the length is inconsistent with the Fields.
+        """
+        if not self.sizeRepeat:
+            if msgLength < self.sizeOnce:
+                raise Exception(
+                    "Message length {} is shorter than required {}"
+                    .format(msgLength, self.sizeOnce))
+            return 0
+        N = (msgLength - self.sizeOnce) // self.sizeRepeat
+        sizeTotal = self.sizeOnce + N * self.sizeRepeat
+        if sizeTotal != msgLength:
+            raise Exception("message length {} does not match {}"
+                            .format(msgLength, sizeTotal))
+        return N
+
+    def layout(self, msgLength):
+        """Return (N, names, types) for a message of length msgLength.
+
+        The variables of the n-th repeated block are named like the fields in
+        Repeated with '_n' appended. The result is cached per length.
+        """
+        layout = self._layouts.get(msgLength)
+        if layout is None:
+            N = self.count(msgLength)
+            names = self.onceNames + tuple(
+                "{}_{}".format(name, i)
+                for i in range(1, N+1) for name in self.repeatNames
+            )
+            types = self.onceTypes + N * self.repeatTypes
+            layout = (N, names, types)
+            self._layouts[msgLength] = layout
+        return layout
+
+    def splitName(self, name):
+        """Return (field, k) for a repeated field name with '_n' appended.
+
+        k = n - 1 is the index of the block. Returns None if name is not
+        of this form.
+        """
+        if name in self.fieldOffsets:
+            return None
+        base, _, n = name.rpartition('_')
+        if base not in self.repeatIndex or not n.isdigit() or int(n) < 1:
+            return None
+        return base, int(n) - 1
+
+    def decodeField(self, msg, name):
+        """Decode the single field name from the payload msg.
+
+        name is a field of the fixed block or a repeated field with '_n'
+        appended. Raises AttributeError if there is no such field in msg.
+        """
+        info = self.fieldOffsets.get(name)
+        offset = 0
+        if info is None:
+            pos = self.splitName(name)
+            if pos is None or \
+                    self.sizeOnce + (pos[1] + 1) * self.sizeRepeat > len(msg):
+                raise AttributeError(name)
+            info = self.repeatFieldOffsets[pos[0]]
+            offset = self.sizeOnce + pos[1] * self.sizeRepeat
+        (fieldOffset, struct, fromRaw) = info
+        val = struct.unpack_from(msg, offset + fieldOffset)[0]
+        return val if fromRaw is None else fromRaw(val)
+
+    def decodeOnce(self, msg, offset=0):
+        """Return the list of the values of the fixed block of msg."""
+        vals = list(self.onceStruct.unpack_from(msg, offset))
+        for (i, fromRaw) in self._onceFromRaw:
+            vals[i] = fromRaw(vals[i])
+        return vals
+
+    def decodeRepeated(self, msg, N, offset=0):
+        """Return the N repeated blocks of msg as a list of tuples."""
+        if not N:
+            return []
+        start = offset + self.sizeOnce
+        with memoryview(msg) as view:
+            rows = list(self.repeatStruct.iter_unpack(
+                view[start:start + N * self.sizeRepeat]))
+        if self._repeatFromRaw:
+            rows = [self._convertRow(row) for row in rows]
+        return rows
+
+    def _convertRow(self, row):
+        row = list(row)
+        for (i, fromRaw) in self._repeatFromRaw:
+            row[i] = fromRaw(row[i])
+        return tuple(row)
+
+    def decode(self, msg, N, offset=0):
+        """Return the list of field values of msg, which has N repeated blocks.
+
+        msg can be any buffer, e.g. bytes or a memoryview, and the payload
+        may start at offset. Nothing is copied apart from the values.
+        """
+        vals = list(self.onceStruct.unpack_from(msg, offset))
+        for (i, fromRaw) in self._onceFromRaw:
+            vals[i] = fromRaw(vals[i])
+        if N:
+            unpack_from = self.repeatStruct.unpack_from
+            sizeRepeat = self.sizeRepeat
+            offset += self.sizeOnce
+            for _ in range(N):
+                start = len(vals)
+                vals.extend(unpack_from(msg, offset))
+                for (i, fromRaw) in self._repeatFromRaw:
+                    vals[start+i] = fromRaw(vals[start+i])
+                offset += sizeRepeat
+        return vals
+
+    def size(self, N):
+        """Return the payload length for N repeated blocks."""
+        return self.sizeOnce + N * self.sizeRepeat
+
+    def encode(self, vals, N):
+        """Return the payload for the field values vals with N repeated blocks."""
+        buf = bytearray(self.size(N))
+        self.encodeInto(buf, 0, vals, N)
+        return bytes(buf)
+
+    def encodeInto(self, buf, offset, vals, N):
+        """Pack the field values vals with N repeated blocks into buf.
+
+        buf is a writable buffer (e.g. a bytearray) with room for
+        size(N) bytes at offset. Returns the offset after the payload.
+        """
+        struct, toRaws, _ = self.packer(N)
+        if toRaws:
+            vals = list(vals)
+            for (i, toRaw) in toRaws:
+                vals[i] = toRaw(vals[i])
+        struct.pack_into(buf, offset, *vals)
+        return offset + struct.size
+
+    def packer(self, N):
+        """Return (struct, converters, getter) for messages with N blocks.
+
+        struct packs the complete payload, converters are the
+        (index, toRaw) pairs of fields that are not plain numbers, and
+        getter(obj) returns the tuple of the field values of obj.
+        The result is cached per N.
+        """
+        packer = self._packers.get(N)
+        if packer is None:
+            fmt = ''.join(t.fmt for t in self.onceTypes + N * self.repeatTypes)
+            nOnce, nRepeat = len(self.onceTypes), len(self.repeatTypes)
+            toRaws = self._onceToRaw + tuple(
+                (nOnce + k * nRepeat + i, toRaw)
+                for k in range(N) for (i, toRaw) in self._repeatToRaw)
+            if self.repeatNames:
+                getter = _blocksGetter(self.onceNames)
+            else:
+                getter = _tupleGetter(self.onceNames)
+            packer = (Struct('<' + fmt), toRaws, getter)
+            self._packers[N] = packer
+        return packer
+
+
+def _fieldOffsets(types, names):
+    offsets = {}
+    offset = 0
+    for (t, name) in zip(types, names):
+        struct = Struct('<' + t.fmt)
+        offsets[name] = (offset, struct, getattr(t, 'fromRaw', None))
+        offset += struct.size
+    return offsets
+
+
+def _tupleGetter(names):
+    """Return a function that returns the tuple of the attributes names."""
+    if len(names) > 1:
+        return attrgetter(*names)
+    return lambda obj: tuple(getattr(obj, name) for name in names)
+
+
+def _blocksGetter(onceNames):
+    """Return a function that returns the list of the field values of a
+    message with a RepeatedBlocks attribute repeated."""
+    onceGetter = _tupleGetter(onceNames)
+    def getter(obj):
+        vals = list(onceGetter(obj))
+        for row in obj.repeated._rows:
+            vals.extend(row)
+        return vals
+    return getter
+
+
+def _converters(types, method):
+    return tuple((i, getattr(t, method))
+                 for (i, t) in enumerate(types) if hasattr(t, method))
+
+
+def _messageCodec(Message):
+    return Message._codec
+
+
+class RepeatedBlocks(object):
+    """The repeated blocks of a message as a sequence of records.
+
+    blocks[k] is the k-th block (counting from 0) as a namedtuple,
+    blocks.cno is the tuple of the cno fields of all blocks, and
+    blocks.array is a NumPy structured array of all blocks.
+    """
+
+    __slots__ = ('_codec', '_rows')
+
+    def __init__(self, codec, rows):
+        self._codec = codec
+        self._rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __iter__(self):
+        return map(self._codec.Record._make, self._rows)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self._codec.Record._make(row) for row in self._rows[k]]
+        return self._codec.Record._make(self._rows[k])
+
+    def __getattr__(self, name):
+        i = None if name.startswith('_') else self._codec.repeatIndex.get(name)
+        if i is None:
+            raise AttributeError(name)
+        return tuple(row[i] for row in self._rows)
+
+    def __repr__(self):
+        return "RepeatedBlocks({})".format(list(self))
+
+    @property
+    def array(self):
+        """Return the blocks as a NumPy structured array (a copy)."""
+        if np is None:
+            raise Exception("NumPy is required for RepeatedBlocks.array")
+        return np.array(self._rows, dtype=self._codec.repeatDtype)
+
+    def _set(self, k, name, val):
+        i = self._codec.repeatIndex[name]
+        row = self._rows[k]
+        self._rows[k] = row[:i] + (val,) + row[i+1:]
@@ -3,12 +3,17 @@
 Each type must have a variable typ and ord.
 - typ: Contains the python struct packing letter
 - ord: Contains a sequential ordering number
+- dtype: The equivalent NumPy dtype string
+
+Values are decoded with parseFrom(buf, offset), which reads directly from
+any buffer (bytes, bytearray, memoryview) and returns the value and the new
+offset. parse(msg) is the older interface that returns the rest of msg.
 """
 
-from struct import Struct, unpack, pack
+from struct import Struct, pack
 
-# Note: All classes listed here must be also listed in UBXMessages.py,
-# function classFromMessageClass !!
+_dtypes = {'B': 'u1', 'b': 'i1', 'H': '<u2', 'h': '<i2', 'I': '<u4',
+           'i': '<i4', 'f': '<f4', 'd': '<f8'}
 
 
 def _InitGenericType(cls):
@@ -18,27 +23,35 @@ def _InitGenericType(cls):
         def __init__(self, _ord, allowed=[]):
             self.ord = _ord
         setattr(cls, '__init__', __init__)
-    # 2. add parse function to cls
-    if cls.__dict__.get('parse') is None:
-        def parse(self, msg):
-            if len(msg) < self._size:
+    # 2. add parseFrom and parse functions to cls
+    if cls.__dict__.get('parseFrom') is None:
+        _struct = Struct('<' + cls.fmt)
+        def parseFrom(self, buf, offset=0):
+            if len(buf) - offset < self._size:
                 err = "Message length {} is shorter than required {}"\
-                      .format(len(msg), self._size)
+                      .format(len(buf) - offset, self._size)
                 raise Exception(err)
-            val = unpack(self.fmt, msg[0:self._size])[0]
+            return _struct.unpack_from(buf, offset)[0], offset + self._size
+        setattr(cls, "parseFrom", parseFrom)
+    if cls.__dict__.get('parse') is None:
+        def parse(self, msg):
+            val, _ = self.parseFrom(msg)
             return val, msg[self._size:]
         setattr(cls, "parse", parse)
     # 3. add _size variable to cls
     if cls.__dict__.get('_size') is None:
         setattr(cls, '_size', Struct(cls.fmt).size)
-    # 4. add toString static method
+    # 4. add the NumPy dtype
+    if cls.__dict__.get('dtype') is None:
+        setattr(cls, 'dtype', _dtypes[cls.fmt])
+    # 5. add toString static method
     if cls.__dict__.get('toString') is None:
         @staticmethod
         def toString(val):
             return ("0x{:0" + str(cls._size*2) + "X}")\
                    .format(val)
         setattr(cls, 'toString', toString)
-    # 5. add serialize method
+    # 6. add serialize method
     if cls.__dict__.get('serialize') is None:
         def serialize(self, val):
             return pack(self.fmt, val)
@@ -119,44 +132,65 @@ class R8:
 
 class CH:
     """ASCII / ISO 8859.1 Encoding."""
-    fmt = None  # Not needed
     def __init__(self, _ord, N, allowed=[], nullTerminatedString=False):
         self.N = N
         self.ord = _ord
         self._size = N
+        self.fmt = "{}s".format(N)
+        self.dtype = "S{}".format(N)
         self._nullTerminatedString = nullTerminatedString
         self.ctype = "char[{}]".format(self.N)
-    def parse(self, msg):
-        if len(msg) < self.N:
+    def parseFrom(self, buf, offset=0):
+        if len(buf) - offset < self.N:
             err = "Message length {} is shorter than required {}"\
-                  .format(len(msg), self._size)
+                  .format(len(buf) - offset, self._size)
             raise Exception(err)
-        val = msg[0:self._size]
-        if self._nullTerminatedString:
-            val = stringFromByteString(val)
+        val = self.fromRaw(bytes(buf[offset:offset+self._size]))
+        return val, offset + self._size
+    def parse(self, msg):
+        val, _ = self.parseFrom(msg)
         return val, msg[self._size:]
+    def fromRaw(self, raw):
+        """Convert the raw bytes unpacked by struct to the field value."""
+        if self._nullTerminatedString:
+            return stringFromByteString(raw)
+        return raw
+    def toRaw(self, val):
+        """Convert the field value to bytes for packing by struct."""
+        if isinstance(val, str):
+            val = val.encode('ascii')
+        if len(val) > self.N:
+            err = "Value length {} exceeds the allowed {}"\
+                  .format(len(val), self._size)
+            raise Exception(err)
+        return val
     @staticmethod
     def toString(val):
         return '"{}"'.format(val)
     def serialize(self, val):
-        if len(val) != self.N:
+        if not self._nullTerminatedString and len(val) != self.N:
             err = "Value length {} not equal to the required {}"\
                   .format(len(val), self._size)
             raise Exception(err)
+        return pack(self.fmt, self.toRaw(val))
 
 class U:
     """Variable-length array of unsigned chars."""
-    fmt = None  # Not needed
     def __init__(self, _ord, N, allowed=[]):
         self.ord = _ord
         self.N = N
+        self._size = N
+        self.fmt = "{}s".format(N)
+        self.dtype = "V{}".format(N)
         self.ctype = "uint8_t[{}]".format(self.N)
-    def parse(self, msg):
-        if len(msg) < self.N:
+    def parseFrom(self, buf, offset=0):
+        if len(buf) - offset < self.N:
             err = "Message length {} is shorter than required {}"\
-                  .format(len(msg), self._size)
+                  .format(len(buf) - offset, self._size)
             raise Exception(err)
-        val = msg[0:self._size]
+        return bytes(buf[offset:offset+self._size]), offset + self._size
+    def parse(self, msg):
+        val, _ = self.parseFrom(msg)
         return val, msg[self._size:]
     @staticmethod
     def toString(val):
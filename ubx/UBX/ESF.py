@@ -34,7 +34,7 @@ class ESF:
 
         @property
         def measurements(self):
-            datas = (self.__getattribute__(f'data_{idx}') for idx in range(1, self.numMeas+1))
+            datas = self.repeated.data[:self.numMeas]
             return [UBXESFSensor.SensorMeasurement.from_integer(d) for d in datas]
 
         @staticmethod
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""Compressed UBX archives with receive timestamps.
+
+An archive stores frames (UBX frames and NMEA sentences as received) with
+the time they were received, in blocks that are compressed with zlib or
+lzma:
+
+    with UBXArchiveWriter("recording.ubxa") as writer:
+        writer.feed(data)                   # bytes from the receiver
+        writer.write(frame, timestamp)      # or one complete frame
+
+    with UBXArchiveReader("recording.ubxa") as archive:
+        for (t, msg) in archive.messages(UBX.NAV.PVT, timestamp=(t0, t1)):
+            ...
+
+Every block header records the time range and the UBX message types of its
+frames, and the headers are repeated in an index at the end of the file, so
+a query only decompresses the blocks it needs. The index is rebuilt from the
+block headers if the writer was not closed.
+
+File layout (little endian):
+    header      b'UBXARCH\\0', version U4
+    blocks      block header, message types (class, id pairs), data
+    index       (offset U8, block header, message types) per block
+    trailer     offset of the index U8, number of blocks U8, b'UBXAIDX\\0'
+
+The uncompressed data of a block is the receive time of each frame in
+microseconds after the start of the block (U4 each), the length of each
+frame (U4 each) and the frames.
+"""
+
+import os
+import sys
+import time
+import zlib
+import lzma
+from array import array
+from collections import namedtuple
+from struct import Struct
+from ubx.UBXFramer import scanFrames, ubxChecksum, END
+from ubx.UBXMessage import lookupMessage, _parseLazy
+
+_MAGIC = b'UBXARCH\x00'
+_VERSION = 1
+_INDEX_MAGIC = b'UBXAIDX\x00'
+_fileHeader = Struct('<8sI')
+# magic, method, number of types, frames, raw size, data size, t0, t1, CRC
+_blockHeader = Struct('<4sBxHIIIddI')
+_BLOCK_MAGIC = b'UBXB'
+_offset = Struct('<Q')
+_trailer = Struct('<QQ8s')
+
+# compression methods
+NONE, ZLIB, LZMA = range(3)
+_methods = {'none': NONE, 'zlib': ZLIB, 'lzma': LZMA}
+
+OTHER = (0, 0)      # message type of frames that are not UBX frames
+
+BlockInfo = namedtuple('BlockInfo',
+                       'offset method frames rawSize dataSize t0 t1 crc '
+                       'types')
+
+
+def _compress(method, data, level):
+    if method == ZLIB:
+        return zlib.compress(data, 6 if level is None else level)
+    if method == LZMA:
+        return lzma.compress(data, preset=0 if level is None else level)
+    return data
+
+
+def _decompress(method, data):
+    if method == ZLIB:
+        return zlib.decompress(data)
+    if method == LZMA:
+        return lzma.decompress(data)
+    return data
+
+
+def _frameType(frame):
+    if frame[:2] == b'\xb5\x62' and len(frame) >= 8:
+        return (frame[2], frame[3])
+    return OTHER
+
+
+def _littleEndian(a):
+    if sys.byteorder == 'big':
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a
+
+
+class UBXArchiveWriter(object):
+    """Writes frames to a new archive file."""
+
+    def __init__(self, path, compression='zlib', level=None,
+                 blockSize=1 << 18):
+        """
+        :param path: the archive file, overwritten if it exists
+        :param compression: 'zlib', 'lzma' or 'none', can be changed
+            between blocks
+        :param level: zlib level or lzma preset (default 6 and 0)
+        :param blockSize: uncompressed bytes of frames per block
+        """
+        self.compression = compression
+        self.level = level
+        self.blockSize = blockSize
+        self._file = open(path, 'wb')
+        self._file.write(_fileHeader.pack(_MAGIC, _VERSION))
+        self._index = []        # (offset, header) of the written blocks
+        self._buffer = bytearray()      # for feed
+        self._clear()
+
+    def _clear(self):
+        self._t0 = None
+        self._t1 = None
+        self._times = array('I')
+        self._lengths = array('I')
+        self._frames = bytearray()
+        self._types = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, frame, timestamp=None):
+        """Add one frame received at timestamp (seconds, default now)."""
+        if timestamp is None:
+            timestamp = time.time()
+        if self._t0 is None:
+            self._t0 = timestamp
+        delta = round((timestamp - self._t0) * 1e6)
+        if not 0 <= delta < 1 << 32:    # out of the range of the block
+            self.flush()
+            self._t0, delta = timestamp, 0
+        self._t1 = timestamp if self._t1 is None else max(self._t1, timestamp)
+        self._times.append(delta)
+        self._lengths.append(len(frame))
+        self._frames += frame
+        self._types.add(_frameType(frame))
+        if len(self._frames) >= self.blockSize:
+            self.flush()
+
+    def feed(self, data, timestamp=None):
+        """Add the frames completed by the received bytes data.
+
+        Partial frames are kept until the next call, bytes between frames
+        are dropped. The frames get the timestamp of the data that
+        completes them.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        buf = self._buffer
+        buf += data
+        for (kind, start, stop) in scanFrames(buf):
+            if kind == END:
+                del buf[:start]
+            else:
+                self.write(buf[start:stop], timestamp)
+
+    def flush(self):
+        """Write the buffered frames as a block."""
+        if not self._times:
+            return
+        raw = bytes(_littleEndian(self._times)) + \
+            bytes(_littleEndian(self._lengths)) + bytes(self._frames)
+        method = _methods[self.compression]
+        data = _compress(method, raw, self.level)
+        if len(data) >= len(raw):
+            method, data = NONE, raw
+        types = sorted(self._types)
+        header = _blockHeader.pack(
+            _BLOCK_MAGIC, method, len(types), len(self._times), len(raw),
+            len(data), self._t0, self._t1, zlib.crc32(raw)) + \
+            bytes(b for key in types for b in key)
+        self._index.append((self._file.tell(), header))
+        self._file.write(header)
+        self._file.write(data)
+        self._clear()
+
+    def close(self):
+        """Write the remaining frames and the index and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        f = self._file
+        indexOffset = f.tell()
+        for (offset, header) in self._index:
+            f.write(_offset.pack(offset))
+            f.write(header)
+        f.write(_trailer.pack(indexOffset, len(self._index), _INDEX_MAGIC))
+        f.close()
+
+
+class UBXArchiveReader(object):
+    """Reads an archive written by UBXArchiveWriter."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            (magic, version) = \
+                _fileHeader.unpack(self._read(0, _fileHeader.size))
+        except EOFError:
+            magic = version = None
+        if magic != _MAGIC or version != _VERSION:
+            self._file.close()
+            raise Exception("{} is not a UBX archive".format(path))
+        self.blocks = self._readIndex()
+        if self.blocks is None:
+            self.blocks = self._scanBlocks()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def __len__(self):
+        """Return the number of frames."""
+        return sum(block.frames for block in self.blocks)
+
+    def _read(self, offset, n):
+        self._file.seek(offset)
+        data = self._file.read(n)
+        if len(data) < n:
+            raise EOFError
+        return data
+
+    @staticmethod
+    def _parseHeader(offset, header, types):
+        (_, method, _, frames, rawSize, dataSize, t0, t1, crc) = header
+        return BlockInfo(offset, method, frames, rawSize, dataSize, t0, t1, crc,
+                         frozenset(zip(types[0::2], types[1::2])))
+
+    def _readIndex(self):
+        """Return the blocks from the index, None if there is none."""
+        size = self._file.seek(0, os.SEEK_END)
+        if size < _fileHeader.size + _trailer.size:
+            return None
+        (indexOffset, count, magic) = \
+            _trailer.unpack(self._read(size - _trailer.size, _trailer.size))
+        if magic != _INDEX_MAGIC:
+            return None
+        index = self._read(indexOffset, size - _trailer.size - indexOffset)
+        blocks = []
+        pos = 0
+        for _ in range(count):
+            (offset,) = _offset.unpack_from(index, pos)
+            header = _blockHeader.unpack_from(index, pos + _offset.size)
+            pos += _offset.size + _blockHeader.size
+            types = index[pos:pos + 2 * header[2]]
+            pos += 2 * header[2]
+            blocks.append(self._parseHeader(offset, header, types))
+        return blocks
+
+    def _scanBlocks(self):
+        """Return the blocks found by following the block headers."""
+        blocks = []
+        offset = _fileHeader.size
+        while True:
+            try:
+                header = _blockHeader.unpack(
+                    self._read(offset, _blockHeader.size))
+                if header[0] != _BLOCK_MAGIC:
+                    break
+                types = self._read(offset + _blockHeader.size, 2 * header[2])
+                block = self._parseHeader(offset, header, types)
+                end = offset + _blockHeader.size + len(types) + block.dataSize
+                self._read(end - 1, 1)      # the block is complete
+            except EOFError:
+                break
+            blocks.append(block)
+            offset = end
+        return blocks
+
+    def findBlocks(self, *msgTypes, timestamp=None):
+        """Return the blocks that may contain the matching frames.
+
+        msgTypes are message classes like UBX.NAV.PVT (all frames if none
+        is given), timestamp is an inclusive range (first, last) of receive
+        times.
+        """
+        keys = set((Msg._class, Msg._id) for Msg in msgTypes)
+        return [block for block in self.blocks
+                if (not keys or keys & block.types) and (timestamp is None or
+                    block.t1 >= timestamp[0] and block.t0 <= timestamp[1])]
+
+    def readBlock(self, block):
+        """Return the list of (timestamp, frame) of block."""
+        data = self._read(block.offset + _blockHeader.size + 2 * len(block.types),
+                          block.dataSize)
+        raw = _decompress(block.method, data)
+        if len(raw) != block.rawSize or zlib.crc32(raw) != block.crc:
+            raise Exception("Corrupt block at offset {}".format(block.offset))
+        n = block.frames
+        times = array('I', raw[:4*n])
+        lengths = array('I', raw[4*n:8*n])
+        if sys.byteorder == 'big':
+            times.byteswap()
+            lengths.byteswap()
+        frames = []
+        pos = 8 * n
+        t0 = block.t0
+        view = memoryview(raw)
+        for (delta, length) in zip(times, lengths):
+            frames.append((t0 + delta * 1e-6, view[pos:pos + length]))
+            pos += length
+        return frames
+
+    def frames(self, *msgTypes, timestamp=None):
+        """Yield (timestamp, frame) of the matching frames in file order.
+
+        Arguments as for findBlocks; frames are memoryviews.
+        """
+        keys = set((Msg._class, Msg._id) for Msg in msgTypes)
+        for block in self.findBlocks(*msgTypes, timestamp=timestamp):
+            for (t, frame) in self.readBlock(block):
+                if keys and _frameType(frame) not in keys:
+                    continue
+                if timestamp is not None and \
+                        not timestamp[0] <= t <= timestamp[1]:
+                    continue
+                yield (t, frame)
+
+    def messages(self, *msgTypes, timestamp=None, lazy=False):
+        """Yield (timestamp, message) of the matching UBX messages.
+
+        Frames with a wrong checksum, of unknown messages and frames that
+        cannot be parsed are skipped.
+        """
+        for (t, frame) in self.frames(*msgTypes, timestamp=timestamp):
+            key = _frameType(frame)
+            if key == OTHER or frame[-2] << 8 | frame[-1] != \
+                    ubxChecksum(frame, 2, len(frame) - 2):
+                continue
+            Subcls = lookupMessage(*key)
+            if Subcls is None:
+                continue
+            try:
+                payload = frame[6:-2]
+                msg = _parseLazy(Subcls, payload) if lazy else Subcls(payload)
+            except Exception:
+                continue
+            yield (t, msg)
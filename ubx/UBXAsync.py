@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""asyncio counterpart of UBXManager.
+
+UBXAsyncManager is an asyncio.Protocol that frames and parses the received
+bytes like UBXManager, without a thread:
+
+    manager = await openSocket(sock)        # or openFd(fd), or any transport
+    await manager.send(UBX.MON.VER.Get().serialize())
+    async for msg in manager:
+        print(msg)
+
+Because it is a protocol it can also be used with loop.create_connection,
+loop.connect_read_pipe or serial_asyncio.create_serial_connection.
+"""
+
+import asyncio
+import os
+from ubx.UBXFramer import UBXFramer
+from ubx.UBXManager import UBXHandler
+
+
+class UBXAsyncManager(UBXHandler, asyncio.Protocol):
+    """asyncio UBX/NMEA manager.
+
+    Good UBX messages are queued for `async for msg in manager`, unless they
+    are taken by a pending waitFor or request. Iteration ends when the
+    connection is closed. NMEA sentences and errors go to the onNMEA,
+    onNMEAError and onUBXError handlers as for UBXManager.
+    """
+
+    def __init__(self, lazy=False, maxsize=0):
+        """
+        :param lazy: pass lazily decoded messages, see parseUBXPayload
+        :param maxsize: pause reading from the transport while this many
+            messages are queued, 0 for no limit
+        """
+        self.lazy = lazy
+        self.maxsize = maxsize
+        self.transport = None
+        self.writeTransport = None
+        self._framer = UBXFramer()
+        self._queue = asyncio.Queue()
+        self._waiters = []
+        self._readingPaused = False
+        self._writingPaused = None     # future while the transport is full
+        self._closed = False
+
+    # asyncio.Protocol
+
+    def connection_made(self, transport):
+        self.transport = transport
+        if self.writeTransport is None:
+            self.writeTransport = transport
+
+    def data_received(self, data):
+        self._parse(data)
+
+    def connection_lost(self, exc):
+        self._closed = True
+        self._queue.put_nowait(None)
+        for (_, _, fut) in self._waiters:
+            if not fut.done():
+                fut.set_exception(Exception("Connection closed"))
+        self.resume_writing()
+
+    def pause_writing(self):
+        if self._writingPaused is None:
+            self._writingPaused = asyncio.get_running_loop().create_future()
+
+    def resume_writing(self):
+        fut, self._writingPaused = self._writingPaused, None
+        if fut is not None and not fut.done():
+            fut.set_result(None)
+
+    # messages
+
+    def onUBX(self, obj):
+        """Handle a good UBX message: wake up a waiter, or queue it."""
+        for (i, (msgType, predicate, fut)) in enumerate(self._waiters):
+            if not fut.done() and isinstance(obj, msgType) \
+                    and (predicate is None or predicate(obj)):
+                del self._waiters[i]
+                fut.set_result(obj)
+                return
+        self._queue.put_nowait(obj)
+        if self.maxsize and not self._readingPaused \
+                and self._queue.qsize() >= self.maxsize:
+            self._readingPaused = True
+            self.transport.pause_reading()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        obj = await self._queue.get()
+        if self._readingPaused and self._queue.qsize() < self.maxsize:
+            self._readingPaused = False
+            self.transport.resume_reading()
+        if obj is None:
+            raise StopAsyncIteration
+        return obj
+
+    async def waitFor(self, msgType, timeout=None, predicate=None):
+        """Wait for the next message of class msgType, e.g. UBX.ACK.ACK.
+
+        If given, predicate(msg) must be true as well. Raises
+        asyncio.TimeoutError after timeout seconds.
+        """
+        return await self._wait(self._addWaiter(msgType, predicate), timeout)
+
+    def _addWaiter(self, msgType, predicate):
+        if self._closed:
+            raise Exception("Connection closed")
+        waiter = (msgType, predicate, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        return waiter
+
+    async def _wait(self, waiter, timeout):
+        try:
+            return await asyncio.wait_for(waiter[2], timeout)
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    async def send(self, msg):
+        """Send msg (bytes or a message object with serialize)."""
+        if self._closed or self.writeTransport is None:
+            raise Exception("Connection closed")
+        if hasattr(msg, 'serialize'):
+            msg = msg.serialize()
+        self.writeTransport.write(msg)
+        if self._writingPaused is not None:
+            await self._writingPaused
+
+    async def request(self, msg, msgType, timeout=None, predicate=None):
+        """Send msg and wait for the response of class msgType.
+
+        The response is caught even if it arrives before send returns.
+        """
+        waiter = self._addWaiter(msgType, predicate)
+        try:
+            await self.send(msg)
+        except BaseException:
+            self._waiters.remove(waiter)
+            raise
+        return await self._wait(waiter, timeout)
+
+    def close(self):
+        """Close the transport(s)."""
+        if self.writeTransport is not None \
+                and self.writeTransport is not self.transport:
+            self.writeTransport.close()
+        if self.transport is not None:
+            self.transport.close()
+
+
+class _WriteProtocol(asyncio.BaseProtocol):
+    """Forwards the flow control of a write pipe to the manager."""
+
+    def __init__(self, manager):
+        self.manager = manager
+
+    def pause_writing(self):
+        self.manager.pause_writing()
+
+    def resume_writing(self):
+        self.manager.resume_writing()
+
+
+async def openSocket(sock, managerClass=UBXAsyncManager, **kwargs):
+    """Return a UBXAsyncManager reading from the connected socket sock.
+
+    managerClass can be a subclass of UBXAsyncManager, kwargs are passed
+    to it.
+    """
+    loop = asyncio.get_running_loop()
+    manager = managerClass(**kwargs)
+    await loop.create_connection(lambda: manager, sock=sock)
+    return manager
+
+
+async def openFd(fd, managerClass=UBXAsyncManager, **kwargs):
+    """Return a UBXAsyncManager for the file descriptor fd (pty or tty).
+
+    The manager reads from fd and writes to a duplicate of it. A tty
+    should be in raw mode. managerClass and kwargs as for openSocket.
+    """
+    loop = asyncio.get_running_loop()
+    manager = managerClass(**kwargs)
+    await loop.connect_read_pipe(lambda: manager, os.fdopen(fd, 'rb', 0))
+    manager.writeTransport, _ = await loop.connect_write_pipe(
+        lambda: _WriteProtocol(manager), os.fdopen(os.dup(fd), 'wb', 0))
+    return manager
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Raw capture of the received bytes on a background thread.
+
+write() only queues the data, a thread writes it to a buffered file, so
+capture can stay on at full link rate:
+
+    capture = UBXCapture("capture.ubx", rotateBytes=100 << 20,
+                         rotateSeconds=3600, keep=48)
+    manager = UBXManager(ser, capture=capture)
+    ...
+    capture.close()
+
+The queue holds at most maxPending bytes, data that does not fit is
+dropped and counted (dropped, droppedBytes), so a slow disk never blocks
+the reader. If writing a file fails the thread stops, and write(), flush()
+and close() raise an exception.
+
+With rotation the files are named <path>.00000, <path>.00001, ...; a new
+capture continues after the highest number found, and keep is the number
+of files that are kept, including the ones of earlier captures. Without
+rotation the file path is overwritten. Formats:
+    raw         the bytes as received
+    timestamped records of receive time (float64), length (U4) and the
+                bytes, see readCapture
+    archive     a UBXArchive per file, with a timestamp per frame
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from struct import Struct
+from ubx.UBXArchive import UBXArchiveWriter
+
+FORMATS = ('raw', 'timestamped', 'archive')
+
+_record = Struct('<dI')     # receive time, length
+
+
+def readCapture(path):
+    """Yield (receive time, data) of a capture file in timestamped format."""
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(_record.size)
+            if len(header) < _record.size:
+                return
+            (t, n) = _record.unpack(header)
+            data = f.read(n)
+            if len(data) < n:
+                return
+            yield (t, data)
+
+
+def _rotatedFiles(path):
+    """Return the names of the existing rotated files of path, oldest first."""
+    (directory, prefix) = os.path.split(path)
+    prefix += '.'
+    files = []
+    for name in os.listdir(directory or os.curdir):
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and suffix.isdigit():
+            files.append((int(suffix), os.path.join(directory, name)))
+    files.sort()
+    return [name for (_, name) in files]
+
+
+class UBXCapture(object):
+    """Captures chunks of received bytes to (rotating) files."""
+
+    def __init__(self, path, format='raw', rotateBytes=None,
+                 rotateSeconds=None, keep=None, maxPending=16 << 20,
+                 bufferSize=1 << 20):
+        """
+        :param path: file name, or prefix of the file names with rotation
+        :param format: 'raw', 'timestamped' or 'archive'
+        :param rotateBytes: start a new file after this many bytes
+        :param rotateSeconds: start a new file after this many seconds
+        :param keep: number of rotated files to keep, None for all
+        :param maxPending: max. number of queued bytes
+        :param bufferSize: buffer size of the file
+        """
+        if format not in FORMATS:
+            raise Exception("Unknown format {}".format(format))
+        self.path = path
+        self.format = format
+        self.rotateBytes = rotateBytes
+        self.rotateSeconds = rotateSeconds
+        self.keep = keep
+        self.maxPending = maxPending
+        self.bufferSize = bufferSize
+        self.chunks = 0         # chunks written
+        self.bytes = 0          # bytes written
+        self.dropped = 0        # chunks dropped because the queue was full
+        self.droppedBytes = 0
+        self.files = []         # names of the files written, oldest first
+        self._queue = deque()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._closing = False
+        self._file = None
+        self._fileBytes = 0
+        self._fileStart = None
+        self._error = None
+        self._carry = b''       # partial frame of the previous archive file
+        self._rotated = []      # the rotated files that exist, oldest first
+        self._sequence = 0
+        if rotateBytes or rotateSeconds:
+            self._rotated = _rotatedFiles(path)
+            if self._rotated:
+                self._sequence = int(self._rotated[-1].rpartition('.')[2]) + 1
+        self._thread = threading.Thread(target=self._run, name='UBXCapture',
+                                        daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, data, timestamp=None):
+        """Queue data for writing, return False if it was dropped."""
+        n = len(data)
+        with self._cond:
+            self._checkError()
+            if self._closing:
+                raise Exception("Capture is closed")
+            if self._pending + n > self.maxPending:
+                self.dropped += 1
+                self.droppedBytes += n
+                return False
+            self._queue.append(
+                (time.time() if timestamp is None else timestamp, bytes(data)))
+            self._pending += n
+            self._cond.notify()
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until the queued data is written to the file (not synced)."""
+        with self._cond:
+            self._cond.notify()
+            done = self._cond.wait_for(
+                lambda: not self._queue and not self._busy or self._error,
+                timeout)
+            self._checkError()
+            return done
+
+    def close(self):
+        """Write the queued data and close the file."""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify()
+        self._thread.join()
+        self._checkError()
+
+    def _checkError(self):
+        if self._error is not None:
+            raise Exception("Capture failed: {}".format(self._error)) \
+                from self._error
+
+    # writer thread
+
+    _busy = False
+
+    def _run(self):
+        try:
+            self._writeLoop()
+        except Exception as e:
+            with self._cond:
+                self._error = e
+                self._queue.clear()
+                self._pending = 0
+        finally:
+            try:
+                self._closeFile()
+            except Exception as e:
+                self._file = None
+                with self._cond:
+                    if self._error is None:
+                        self._error = e
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _writeLoop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closing:
+                    if self._file is not None and self.rotateSeconds:
+                        # wake up in time for rotation
+                        timeout = self._fileStart + self.rotateSeconds \
+                            - time.monotonic()
+                        if timeout <= 0 or not self._cond.wait(timeout):
+                            break
+                    else:
+                        self._cond.wait()
+                if not self._queue and self._closing:
+                    break
+                items = list(self._queue)
+                self._queue.clear()
+                self._pending = 0
+                self._busy = True
+            for (t, data) in items:
+                self._write(t, data)
+            if self._file is not None:
+                if items:
+                    self._file.flush()
+                self._rotateIfDue(0)
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _rotateIfDue(self, n):
+        """Close the file if writing n more bytes is due for rotation."""
+        if self._file is None:
+            return
+        if (self.rotateBytes and self._fileBytes and
+                self._fileBytes + n > self.rotateBytes) or \
+                (self.rotateSeconds and
+                 time.monotonic() - self._fileStart >= self.rotateSeconds):
+            self._closeFile()
+
+    def _write(self, t, data):
+        self._rotateIfDue(len(data))
+        if self._file is None:
+            self._openFile()
+        if self.format == 'raw':
+            self._file.write(data)
+        elif self.format == 'timestamped':
+            self._file.write(_record.pack(t, len(data)))
+            self._file.write(data)
+        else:
+            self._file.feed(data, t)
+        self._fileBytes += len(data)
+        self.chunks += 1
+        self.bytes += len(data)
+
+    def _openFile(self):
+        if not (self.rotateBytes or self.rotateSeconds):
+            name = self.path
+            if self.format == 'archive':
+                self._file = UBXArchiveWriter(name)
+            else:
+                self._file = open(name, 'wb', buffering=self.bufferSize)
+        else:
+            name = "{}.{:05d}".format(self.path, self._sequence)
+            self._sequence += 1
+            # a rotated file is new, it must not replace one of an earlier
+            # capture
+            if self.format == 'archive':
+                open(name, 'xb').close()
+                self._file = UBXArchiveWriter(name)
+                self._file._buffer += self._carry
+                self._carry = b''
+            else:
+                self._file = open(name, 'xb', buffering=self.bufferSize)
+            self._rotated.append(name)
+        self._fileBytes = 0
+        self._fileStart = time.monotonic()
+        self.files.append(name)
+        if self.keep is not None:
+            while len(self._rotated) > self.keep:
+                old = self._rotated.pop(0)
+                if old in self.files:
+                    self.files.remove(old)
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+    def _closeFile(self):
+        if self._file is not None:
+            if self.format == 'archive':
+                # a frame split by the rotation is completed in the next file
+                self._carry = bytes(self._file._buffer)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""Columnar export of UBX logs.
+
+Every message type becomes a table whose columns are the fields of its
+fixed block. The repeated blocks go into a child table with the columns
+row (the row of the message in the parent table), block (counting from
+0) and the Repeated fields:
+
+    exportLog("recording.ubx", "tables/", UBX.NAV.PVT, UBX.NAV.SVINFO)
+
+writes NAV-PVT.csv, NAV-SVINFO.csv and NAV-SVINFO.repeated.csv (or the
+.npz / .parquet equivalents). Rows are buffered per table and written in
+chunks of chunkRows, so memory use does not depend on the size of the log.
+
+Formats:
+    csv     - one file per table, CH fields as text, U fields as hex
+    npz     - one file per table and chunk (NAV-PVT.00000.npz, ...) with
+              one array per column, requires NumPy
+    parquet - one file per table with a row group per chunk, requires
+              pyarrow
+The default is parquet if pyarrow is installed, npz if NumPy is installed
+and csv otherwise.
+"""
+
+import os
+import csv
+from array import array
+from struct import Struct
+from ubx.Types import CH
+from ubx.UBXFramer import UBX
+from ubx.UBXLog import UBXLog
+from ubx.UBXMessage import lookupMessage
+
+try:
+    import numpy as np
+except ImportError:     # NumPy is optional
+    np = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:     # pyarrow is optional
+    pyarrow = None
+
+FORMATS = ('csv', 'npz', 'parquet')
+
+
+def defaultFormat():
+    """Return the best format that can be written with the installed packages."""
+    if pyarrow is not None and np is not None:
+        return 'parquet'
+    if np is not None:
+        return 'npz'
+    return 'csv'
+
+
+def tableName(Msg):
+    """Return the table name of message class Msg, e.g. 'NAV-PVT'."""
+    return Msg.__qualname__.replace('.', '-')
+
+
+class _Table(object):
+    """Buffered rows of one table, as packed little-endian records."""
+
+    def __init__(self, name, names, types, keys=()):
+        self.name = name
+        self.keys = keys        # names of the leading uint64 key columns
+        self.names = tuple(names)
+        self.types = tuple(types)
+        self.struct = Struct('<' + ''.join(t.fmt for t in types))
+        self.dtype = [(n, t.dtype) for (n, t) in zip(names, types)]
+        self.clear()
+        self.chunks = 0         # number of chunks written
+        self.rows = 0           # number of rows written
+
+    def clear(self):
+        self.buf = bytearray()
+        self.keyColumns = [array('Q') for _ in self.keys]
+        self.pending = 0        # number of buffered rows
+
+    def append(self, data, n=1):
+        """Buffer n rows packed in data."""
+        self.buf += data
+        self.pending += n
+
+
+class UBXExporter(object):
+    """Streaming writer of the columnar tables of UBX messages.
+
+    add() the payloads (e.g. from UBXLog.frames or UBXManager.onUBX) and
+    close() the exporter to write the remaining rows.
+    """
+
+    def __init__(self, outDir, *msgTypes, format=None, chunkRows=65536):
+        """
+        :param outDir: directory of the table files, created if necessary
+        :param msgTypes: message classes to export, e.g. UBX.NAV.PVT
+            (default: all known messages)
+        :param format: 'csv', 'npz' or 'parquet', see defaultFormat
+        :param chunkRows: number of rows per table written at once
+        """
+        format = defaultFormat() if format is None else format
+        if format not in FORMATS:
+            raise Exception("Unknown format {}".format(format))
+        if format == 'npz' and np is None:
+            raise Exception("NumPy is required for the npz format")
+        if format == 'parquet' and (pyarrow is None or np is None):
+            raise Exception("pyarrow is required for the parquet format")
+        os.makedirs(outDir, exist_ok=True)
+        self.outDir = outDir
+        self.format = format
+        self.chunkRows = chunkRows
+        self.keys = frozenset((Msg._class, Msg._id) for Msg in msgTypes)
+        self.skipped = 0        # payloads with a length that does not fit
+        self._tables = {}       # (msgClass, msgId) -> (table, child table)
+        self._writers = {}      # table name -> open csv or parquet writer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _getTables(self, key):
+        tables = self._tables.get(key)
+        if tables is None:
+            Msg = lookupMessage(*key)
+            if Msg is None:
+                tables = (None, None)
+            else:
+                codec = Msg._codec
+                name = tableName(Msg)
+                child = _Table(name + '.repeated', codec.repeatNames,
+                               codec.repeatTypes, ('row', 'block')) \
+                    if codec.repeatNames else None
+                tables = (_Table(name, codec.onceNames, codec.onceTypes), child)
+            self._tables[key] = tables
+        return tables
+
+    def add(self, msgClass, msgId, payload):
+        """Add the row(s) of one UBX payload (a bytes-like object)."""
+        key = (msgClass, msgId)
+        if self.keys and key not in self.keys:
+            return
+        (table, child) = self._getTables(key)
+        if table is None:
+            return
+        size = table.struct.size
+        if child is None:
+            if len(payload) != size:
+                self.skipped += 1
+                return
+        else:
+            N, rest = divmod(len(payload) - size, child.struct.size)
+            if N < 0 or rest:
+                self.skipped += 1
+                return
+            child.keyColumns[0].extend([table.rows + table.pending] * N)
+            child.keyColumns[1].extend(range(N))
+            child.append(payload[size:], N)
+            if child.pending >= self.chunkRows:
+                self._flush(child)
+        table.append(payload[:size])
+        if table.pending >= self.chunkRows:
+            self._flush(table)
+
+    def tables(self):
+        """Return {table name: number of rows written}."""
+        return dict((table.name, table.rows)
+                    for tables in self._tables.values()
+                    for table in tables if table is not None)
+
+    def _flush(self, table):
+        n = table.pending
+        if not n and table.chunks:
+            return
+        getattr(self, '_write' + self.format.capitalize())(table)
+        table.chunks += 1
+        table.rows += n
+        table.clear()
+
+    def close(self):
+        """Write the buffered rows and close the files."""
+        for tables in self._tables.values():
+            for table in tables:
+                if table is not None:
+                    self._flush(table)
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def _path(self, name, ext):
+        return os.path.join(self.outDir, name + ext)
+
+    def _columns(self, table):
+        """Return [(name, array)] of the buffered rows (NumPy)."""
+        records = np.frombuffer(bytes(table.buf), table.dtype) \
+            if table.struct.size else np.zeros(table.pending, table.dtype)
+        return [(name, np.frombuffer(column, np.uint64))
+                for (name, column) in zip(table.keys, table.keyColumns)] + \
+            [(name, records[name]) for name in table.names]
+
+    def _writeCsv(self, table):
+        f = self._writers.get(table.name)
+        if f is None:
+            f = open(self._path(table.name, '.csv'), 'w', newline='')
+            self._writers[table.name] = f
+            csv.writer(f).writerow(table.keys + table.names)
+        text = [(i, _csvText(t)) for (i, t) in enumerate(table.types)
+                if t.fmt.endswith('s')]
+        rows = table.struct.iter_unpack(table.buf) if table.struct.size \
+            else [()] * table.pending
+        keys = zip(*table.keyColumns) if table.keys else [()] * table.pending
+        writer = csv.writer(f)
+        for (key, row) in zip(keys, rows):
+            row = list(row)
+            for (i, toText) in text:
+                row[i] = toText(row[i])
+            writer.writerow(list(key) + row)
+
+    def _writeNpz(self, table):
+        np.savez(self._path(table.name, '.{:05d}.npz'.format(table.chunks)),
+                 **dict(self._columns(table)))
+
+    def _writeParquet(self, table):
+        columns = []
+        for (name, column) in self._columns(table):
+            if column.dtype.kind in 'SV':   # fixed size bytes
+                column = pyarrow.array([bytes(v) for v in column.tolist()],
+                                       pyarrow.binary())
+            columns.append((name, column))
+        arrowTable = pyarrow.table(dict(columns))
+        writer = self._writers.get(table.name)
+        if writer is None:
+            writer = pyarrow.parquet.ParquetWriter(
+                self._path(table.name, '.parquet'), arrowTable.schema)
+            self._writers[table.name] = writer
+        writer.write_table(arrowTable)
+
+
+def _csvText(t):
+    """Return the function that converts the bytes of field type t to text."""
+    if not isinstance(t, CH):
+        return lambda raw: raw.hex()
+    def toText(raw):
+        val = t.fromRaw(raw)
+        if isinstance(val, bytes):
+            val = val.rstrip(b'\x00').decode('latin-1')
+        return val
+    return toText
+
+
+def exportLog(logPath, outDir, *msgTypes, format=None, chunkRows=65536):
+    """Export the UBX messages of the log at logPath to tables in outDir.
+
+    See UBXExporter for the arguments. Returns the exporter, which has the
+    number of rows written per table in tables().
+    """
+    with UBXLog(logPath) as log:
+        mm = log._mm
+        with UBXExporter(outDir, *msgTypes, format=format,
+                         chunkRows=chunkRows) as exporter:
+            view = memoryview(mm)
+            for (kind, start, stop) in log.scan():
+                if kind == UBX:
+                    exporter.add(mm[start+2], mm[start+3],
+                                 view[start+6:stop-2])
+            del view
+    return exporter
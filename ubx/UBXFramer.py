@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""Incremental framing of a byte stream into UBX frames and NMEA sentences.
+
+The framer does no I/O. Bytes are fed to it as they arrive and it returns the
+complete frames found so far, keeping partial frames until the next feed:
+
+    framer = UBXFramer()
+    for frame in framer.feed(data):
+        if type(frame) is UBXFrame:
+            ...
+
+It is used by UBXManager and can be used in the same way by event loops or
+offline tools. scanFrames is the underlying scanner that works on any buffer
+without copying.
+"""
+
+from collections import namedtuple
+from functools import reduce
+from operator import xor
+from ubx.Checksum import checksum
+
+
+UBXFrame = namedtuple('UBXFrame', 'msgClass msgId payload')
+UBXErrorFrame = namedtuple('UBXErrorFrame', 'msgClass msgId errMsg')
+NMEAFrame = namedtuple('NMEAFrame', 'sentence')
+NMEAErrorFrame = namedtuple('NMEAErrorFrame', 'errMsg')
+
+# Kinds of the tuples yielded by scanFrames
+UBX, UBX_BAD_CHECKSUM, NMEA, NMEA_BAD_CHECKSUM, END = range(5)
+
+_UBX_SYNC = b'\xb5\x62'
+_HEX = dict((ord(c), int(c, 16)) for c in '0123456789abcdefABCDEF')
+
+
+def ubxChecksum(buf, start, stop):
+    """Return the checksum of buf[start:stop] (ck_a is the MSB)."""
+    return checksum(buf, start, stop)
+
+
+def nmeaChecksum(buf, start, stop):
+    """Return the NMEA checksum (XOR) of buf[start:stop]."""
+    return reduce(xor, buf[start:stop], 0)
+
+
+def scanFrames(buf, pos=0, end=None):
+    """Yield (kind, start, stop) for the frames in buf[pos:end].
+
+    kind is UBX or NMEA for good frames, UBX_BAD_CHECKSUM or
+    NMEA_BAD_CHECKSUM for frames with a wrong checksum. buf[start:stop] is
+    the complete frame, from the sync chars or '$' to the checksum.
+    Scanning stops at the first incomplete frame. The last tuple is always
+    (END, resume, end), where resume is the position where scanning has to
+    continue once more data is available.
+
+    The semantics are those of the original byte-wise UBXManager: an NMEA
+    sentence runs from '$' to '*' and two hex digits, sentences with
+    invalid hex digits are dropped silently, and a UBX frame with a wrong
+    checksum is skipped as a whole. Unlike the byte-wise manager, a dropped
+    sentence does not leak its bytes into the next frame.
+    """
+    n = len(buf) if end is None else end
+    find = buf.find
+    nextUBX = nextNMEA = -1
+    while True:
+        # positions of the next frame starts, n if there is none
+        if nextUBX < pos:
+            nextUBX = find(_UBX_SYNC, pos, n)
+            if nextUBX < 0:
+                nextUBX = n
+        if nextNMEA < pos:
+            nextNMEA = find(b'$', pos, n)
+            if nextNMEA < 0:
+                nextNMEA = n
+        start = nextUBX if nextUBX < nextNMEA else nextNMEA
+        if start == n:
+            # keep a trailing first sync char
+            pos = n - 1 if n > pos and buf[n-1] == 0xb5 else n
+            break
+        if start == nextUBX:
+            if start + 6 > n:
+                break
+            stop = start + 8 + (buf[start+4] | buf[start+5] << 8)
+            if stop > n:
+                break
+            chksum = buf[stop-2] << 8 | buf[stop-1]     # 256 * CK_A + CK_B
+            if chksum == ubxChecksum(buf, start+2, stop-2):
+                yield (UBX, start, stop)
+            else:
+                yield (UBX_BAD_CHECKSUM, start, stop)
+            pos = stop
+        else:
+            star = find(b'*', start+1, n)
+            if star < 0 or star + 1 >= n:
+                break
+            hi = _HEX.get(buf[star+1])
+            if hi is None:
+                pos = star + 2
+                continue
+            if star + 2 >= n:
+                break
+            lo = _HEX.get(buf[star+2])
+            pos = star + 3
+            if lo is None:
+                continue
+            if hi * 16 + lo == nmeaChecksum(buf, start+1, star):
+                yield (NMEA, start, pos)
+            else:
+                yield (NMEA_BAD_CHECKSUM, start, pos)
+    yield (END, start if start < n else pos, n)
+
+
+def frameFromScan(buf, kind, start, stop):
+    """Return the frame tuple for a (kind, start, stop) of scanFrames.
+
+    Payloads and sentences are copied out of buf.
+    """
+    if kind == UBX:
+        return UBXFrame(buf[start+2], buf[start+3], bytes(buf[start+6:stop-2]))
+    if kind == NMEA:
+        try:
+            return NMEAFrame(bytes(buf[start+1:stop-3]).decode('ascii'))
+        except UnicodeDecodeError as e:
+            return NMEAErrorFrame("Not ASCII: {}".format(e))
+    if kind == UBX_BAD_CHECKSUM:
+        return UBXErrorFrame(
+            buf[start+2], buf[start+3],
+            "Incorrect Checksum: {:04X} should be {:04X}"
+            .format(ubxChecksum(buf, start+2, stop-2),
+                    buf[stop-2] << 8 | buf[stop-1]))
+    if kind == NMEA_BAD_CHECKSUM:
+        return NMEAErrorFrame(
+            "Incorrect Checksum: {:02X} should be {:02X}"
+            .format(nmeaChecksum(buf, start+1, stop-3),
+                    int(bytes(buf[stop-2:stop]), 16)))
+    raise Exception("No frame for kind {}".format(kind))
+
+
+class UBXFramer(object):
+    """Incremental UBX/NMEA framer.
+
+    feed() returns the list of UBXFrame, UBXErrorFrame, NMEAFrame and
+    NMEAErrorFrame tuples completed by the fed data. Partial frames are kept
+    until the next call.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """Add data and return the frames that are complete now."""
+        buf = self._buffer
+        buf += data
+        frames = []
+        for (kind, start, stop) in scanFrames(buf):
+            if kind == END:
+                del buf[:start]
+            else:
+                frames.append(frameFromScan(buf, kind, start, stop))
+        return frames
+
+    def pending(self):
+        """Return the number of buffered bytes of incomplete frames."""
+        return len(self._buffer)
+
+    def reset(self):
+        """Discard the buffered bytes."""
+        del self._buffer[:]
+
+
+def iterFrames(stream, chunkSize=1 << 20):
+    """Yield the frames read from the binary stream (e.g. a file) until EOF."""
+    framer = UBXFramer()
+    while True:
+        data = stream.read(chunkSize)
+        if not data:
+            break
+        for frame in framer.feed(data):
+            yield frame
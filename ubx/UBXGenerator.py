@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""Synthetic UBX/NMEA traffic for load and stress tests.
+
+UBXGenerator produces the frames of all messages registered with
+initMessageClass (or of a given mix) at configurable rates in simulated
+time, with plausible field values, interleaved NMEA sentences and
+controlled corruption:
+
+    gen = UBXGenerator({UBX.NAV.PVT: 10, UBX.ESF.MEAS: 100}, nmea=1,
+                       corruption={'flip': 0.01, 'garbage': 0.01}, seed=1)
+    data = gen.generate(1 << 20)                # about 1 MB of frames
+    stats = gen.run(sock, byteRate=1e6, duration=10)
+
+run() writes to the same sinks as UBXReplay (socket, file descriptor,
+file object, UBXManager, function) at a target byte rate, at a multiple of
+the simulated time (speed) or as fast as possible.
+"""
+
+import sys
+import time
+import heapq
+import random
+import string
+import struct
+import socket
+import argparse
+import threading
+from functools import reduce
+from operator import xor
+from ubx.Types import CH
+from ubx.UBXMessage import UBXMessage, messageRegistry, lookupMessageName
+from ubx.UBXReplay import _writer
+
+WEEK_MS = 7 * 24 * 3600 * 1000
+
+# plausible ranges (in the units of the fields) by field name
+RANGES = {
+    'year': (2015, 2035), 'month': (1, 12), 'day': (1, 28),
+    'hour': (0, 23), 'min': (0, 59), 'sec': (0, 59),
+    'nano': (-500000000, 500000000),
+    'lat': (-900000000, 900000000), 'lon': (-1800000000, 1800000000),
+    'height': (-100000, 5000000), 'hMSL': (-100000, 5000000),
+    'hAcc': (0, 50000), 'vAcc': (0, 50000), 'sAcc': (0, 5000),
+    'tAcc': (0, 1000), 'headAcc': (0, 10000000),
+    'velN': (-50000, 50000), 'velE': (-50000, 50000),
+    'velD': (-10000, 10000), 'gSpeed': (0, 50000),
+    'headMot': (0, 36000000), 'headVeh': (0, 36000000),
+    'pDOP': (50, 2000), 'numSV': (0, 32), 'fixType': (0, 5),
+    'chn': (0, 31), 'svid': (1, 200), 'cno': (0, 55), 'elev': (-90, 90),
+    'azim': (0, 359), 'axim': (0, 359), 'prRes': (-100000, 100000),
+    'relPosN': (-100000, 100000), 'relPosE': (-100000, 100000),
+    'relPosD': (-10000, 10000),
+}
+
+CORRUPTIONS = ('flip', 'truncate', 'checksum', 'garbage')
+
+# a fixed NMEA sentence, for tests and benchmarks
+GGA = b'$GPGGA,092750.000,5321.6802,N,00630.3372,W,1,8,1.03,61.7,M,55.2,M,,*76\r\n'
+
+
+def fieldValue(t, rnd, name=None):
+    """Return a random value of field type t, in RANGES[name] if known."""
+    fmt = t.fmt
+    if fmt.endswith('s'):
+        if isinstance(t, CH):
+            n = rnd.randint(0, t.N - 1) if t._nullTerminatedString else t.N
+            return ''.join(rnd.choice(string.ascii_letters) for _ in range(n))
+        return bytes(rnd.getrandbits(8) for _ in range(t.N))
+    if fmt in 'fd':
+        return rnd.uniform(-1e3, 1e3)
+    bits = 8 * struct.calcsize(fmt)
+    lo, hi = (-(1 << bits - 1), (1 << bits - 1) - 1) if fmt.islower() \
+        else (0, (1 << bits) - 1)
+    if name in RANGES:
+        lo, hi = max(lo, RANGES[name][0]), min(hi, RANGES[name][1])
+    return rnd.randint(lo, hi)
+
+
+def messagePayload(Msg, N=0, rnd=random, iTOW=None):
+    """Return a payload of message Msg with N repeated blocks and random
+    field values. A fixed field named num... holds N, the iTOW field holds
+    iTOW if given."""
+    codec = Msg._codec
+    names = codec.onceNames + N * codec.repeatNames
+    vals = [fieldValue(t, rnd, name) for (t, name) in
+            zip(codec.onceTypes + N * codec.repeatTypes, names)]
+    if codec.repeatNames:
+        for (i, name) in enumerate(codec.onceNames):
+            if name.startswith('num'):
+                vals[i] = N
+        if (Msg._class, Msg._id) == (0x10, 0x02):   # ESF-MEAS: numMeas in flags
+            i = codec.onceNames.index('flags')
+            vals[i] = vals[i] & 0x7ff | (N & 0x1f) << 11
+    if iTOW is not None and 'iTOW' in codec.onceNames:
+        vals[codec.onceNames.index('iTOW')] = iTOW
+    return codec.encode(vals, N)
+
+
+def nmeaSentence(sentence):
+    """Return the NMEA frame of sentence (without '$' and checksum)."""
+    body = sentence.encode('ascii')
+    return b'$' + body + b'*%02X\r\n' % reduce(xor, body, 0)
+
+
+def ackFrame(msgID=0x01, clsID=0x06, nak=False):
+    """Return the ACK-ACK (or ACK-NAK) frame for message clsID/msgID."""
+    return UBXMessage.make(0x05, 0x00 if nak else 0x01, bytes([clsID, msgID]))
+
+
+def _nmeaGGA(t, rnd):
+    ms = int(t * 1000) % (24 * 3600 * 1000)
+    hms = "{:02d}{:02d}{:02d}.{:02d}".format(
+        ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms // 10 % 100)
+    return nmeaSentence(
+        "GPGGA,{},{:02d}{:07.4f},{},{:03d}{:07.4f},{},1,{:02d},{:.2f},{:.1f},M,"
+        "46.9,M,,".format(hms, rnd.randint(0, 89), rnd.uniform(0, 60),
+                          rnd.choice('NS'), rnd.randint(0, 179),
+                          rnd.uniform(0, 60), rnd.choice('EW'),
+                          rnd.randint(4, 24), rnd.uniform(0.5, 3),
+                          rnd.uniform(0, 2000)))
+
+
+class UBXGenerator(object):
+    """Generator of timed synthetic UBX/NMEA frames."""
+
+    def __init__(self, mix=None, nmea=0., corruption=None, maxBlocks=16,
+                 seed=None):
+        """
+        :param mix: {message class: messages per second of simulated time},
+            default all registered messages at 1 Hz
+        :param nmea: NMEA sentences per second
+        :param corruption: {kind: probability per frame} for the kinds
+            'flip' (one bit), 'truncate', 'checksum' (wrong checksum) and
+            'garbage' (random bytes before the frame)
+        :param maxBlocks: max. number of repeated blocks per message
+        :param seed: seed of the random generator
+        """
+        if mix is None:
+            mix = dict((Msg, 1.) for messages in messageRegistry().values()
+                       for Msg in messages.values())
+        self.corruption = dict(corruption or {})
+        unknown = set(self.corruption) - set(CORRUPTIONS)
+        if unknown:
+            raise Exception("Unknown corruption {}".format(', '.join(unknown)))
+        self.maxBlocks = maxBlocks
+        self.rnd = random.Random(seed)
+        self.t0 = self.rnd.randrange(WEEK_MS)   # time of week of t=0 in ms
+        self.t = 0.         # simulated time in seconds
+        self.counts = dict.fromkeys(('frames', 'bytes', 'nmea') + CORRUPTIONS, 0)
+        self._stop = threading.Event()
+        # (due time, sequence number, period, message class or None for NMEA)
+        self._schedule = []
+        sources = [(Msg, rate) for (Msg, rate) in mix.items() if rate > 0]
+        if nmea > 0:
+            sources.append((None, nmea))
+        if not sources:
+            raise Exception("Nothing to generate")
+        for (seq, (Msg, rate)) in enumerate(sources):
+            self._schedule.append((0., seq, 1. / rate, Msg))
+        heapq.heapify(self._schedule)
+
+    def _payload(self, Msg):
+        N = self.rnd.randint(0, self.maxBlocks) if Msg._codec.repeatNames else 0
+        iTOW = (self.t0 + round(self.t * 1000)) % WEEK_MS
+        return messagePayload(Msg, N, self.rnd, iTOW)
+
+    def _corrupt(self, frame):
+        rnd = self.rnd
+        p = self.corruption
+        if rnd.random() < p.get('flip', 0):
+            frame = bytearray(frame)
+            frame[rnd.randrange(len(frame))] ^= 1 << rnd.randrange(8)
+            self.counts['flip'] += 1
+        if frame[:1] == b'\xb5' and rnd.random() < p.get('checksum', 0):
+            frame = bytearray(frame)
+            frame[-1] ^= rnd.randint(1, 255)
+            self.counts['checksum'] += 1
+        if rnd.random() < p.get('truncate', 0):
+            frame = frame[:rnd.randrange(1, len(frame))]
+            self.counts['truncate'] += 1
+        if rnd.random() < p.get('garbage', 0):
+            frame = bytes(rnd.getrandbits(8)
+                          for _ in range(rnd.randint(1, 64))) + frame
+            self.counts['garbage'] += 1
+        return bytes(frame)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Return (simulated time, frame) of the next frame."""
+        (t, seq, period, Msg) = heapq.heappop(self._schedule)
+        heapq.heappush(self._schedule, (t + period, seq, period, Msg))
+        self.t = t
+        if Msg is None:
+            frame = _nmeaGGA(self.t0 / 1000. + t, self.rnd)
+            self.counts['nmea'] += 1
+        else:
+            frame = UBXMessage.make(Msg._class, Msg._id, self._payload(Msg))
+        if self.corruption:
+            frame = self._corrupt(frame)
+        self.counts['frames'] += 1
+        self.counts['bytes'] += len(frame)
+        return (t, frame)
+
+    def generate(self, nbytes):
+        """Return whole frames of at least nbytes bytes."""
+        out = bytearray()
+        while len(out) < nbytes:
+            out += next(self)[1]
+        return bytes(out)
+
+    def stop(self):
+        """Stop run() (from another thread or a signal handler)."""
+        self._stop.set()
+
+    def _waitUntil(self, deadline):
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            self._stop.wait(delay)
+
+    def run(self, sink, byteRate=None, speed=None, duration=None,
+            maxBytes=None, maxFrames=None):
+        """Write frames to sink and return {'frames', 'bytes', 'seconds'}.
+
+        :param byteRate: target bytes per second
+        :param speed: follow the simulated time, 1.0 is real time
+        :param duration: stop after this many seconds
+        :param maxBytes: stop before exceeding this many bytes
+        :param maxFrames: stop after this many frames
+        Without byteRate and speed the frames are written as fast as
+        possible.
+        """
+        self._stop.clear()
+        write = _writer(sink)
+        chunkSize = max(1, int(byteRate / 100)) if byteRate else 65536
+        start = time.monotonic()
+        end = None if duration is None else start + duration
+        tStart = None
+        frames = sent = 0
+        chunk = bytearray()
+        while not self._stop.is_set() and frames != maxFrames:
+            if end is not None and time.monotonic() >= end:
+                break
+            (t, frame) = next(self)
+            if maxBytes is not None and sent + len(chunk) + len(frame) > maxBytes:
+                break
+            if speed:
+                tStart = t if tStart is None else tStart
+                deadline = start + (t - tStart) / speed
+                if deadline > time.monotonic():
+                    if chunk:
+                        write(chunk)
+                        sent += len(chunk)
+                        chunk = bytearray()
+                    self._waitUntil(deadline if end is None
+                                    else min(deadline, end))
+            chunk += frame
+            frames += 1
+            if len(chunk) >= chunkSize:
+                write(chunk)
+                sent += len(chunk)
+                chunk = bytearray()
+                if byteRate:
+                    self._waitUntil(start + sent / byteRate)
+        if chunk:
+            write(chunk)
+            sent += len(chunk)
+        return {'frames': frames, 'bytes': sent,
+                'seconds': time.monotonic() - start}
+
+
+def _parseMix(text):
+    """Parse 'NAV-PVT=10,ESF-MEAS=100' into {message class: rate}."""
+    mix = {}
+    for item in text.split(','):
+        name, _, rate = item.partition('=')
+        Msg = lookupMessageName(name.strip())
+        if Msg is None:
+            raise Exception("Unknown message {}".format(name))
+        mix[Msg] = float(rate) if rate else 1.
+    return mix
+
+
+def ubxgenerate_main():
+    parser = argparse.ArgumentParser(
+        description='Generate synthetic UBX/NMEA traffic.'
+        )
+    parser.add_argument(
+        'output', nargs='?', default='-',
+        help='Output file, - for stdout (default)'
+        )
+    parser.add_argument(
+        '--connect', dest='connect', default=None, metavar='HOST:PORT',
+        help='Write to a TCP connection instead'
+        )
+    parser.add_argument(
+        '-m', '--mix', dest='mix', default=None,
+        help='Messages and rates in Hz, e.g. NAV-PVT=10,ESF-MEAS=100 '
+             '(default all messages at 1 Hz)'
+        )
+    parser.add_argument('--nmea', type=float, default=0.,
+                        help='NMEA sentences per second')
+    for kind in CORRUPTIONS:
+        parser.add_argument('--' + kind, type=float, default=0.,
+                            help='Probability of {} corruption per frame'
+                                 .format(kind))
+    parser.add_argument('-r', '--rate', dest='byteRate', type=float,
+                        default=None, help='Bytes per second')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='Follow the simulated time, 1 is real time')
+    parser.add_argument('-d', '--duration', type=float, default=None,
+                        help='Seconds to run')
+    parser.add_argument('-b', '--bytes', dest='maxBytes', type=int,
+                        default=None, help='Number of bytes to write')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    try:
+        mix = _parseMix(args.mix) if args.mix else None
+    except Exception as e:
+        parser.error(str(e))
+    corruption = dict((kind, getattr(args, kind)) for kind in CORRUPTIONS
+                      if getattr(args, kind))
+    gen = UBXGenerator(mix, nmea=args.nmea, corruption=corruption,
+                       seed=args.seed)
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        sink = socket.create_connection((host, int(port)))
+    elif args.output == '-':
+        sink = sys.stdout.buffer
+    else:
+        sink = open(args.output, 'wb')
+    try:
+        stats = gen.run(sink, byteRate=args.byteRate, speed=args.speed,
+                        duration=args.duration, maxBytes=args.maxBytes)
+    except (KeyboardInterrupt, BrokenPipeError):
+        return
+    finally:
+        if sink is not sys.stdout.buffer:
+            sink.close()
+    sys.stderr.write("{frames} frames, {bytes} bytes in {seconds:.2f} s\n"
+                     .format(**stats))
+
+
+if __name__ == '__main__':
+    ubxgenerate_main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Persistent index of the UBX frames of a recorded log.
+
+The index holds the offset, class, id, payload length and iTOW (if the
+message has one) of every good UBX frame, in arrays that are stored in a
+sidecar file next to the log (recording.ubx.idx):
+
+    index = UBXIndex("recording.ubx")     # loads, updates and saves
+    for msg in index.messages(UBX.NAV.PVT, iTOW=(t0, t1)):
+        ...
+    hw = index.message(UBX.MON.HW, 4)     # the 5th MON-HW
+
+When the log has grown, only the new part is scanned.
+"""
+
+import os
+import sys
+import zlib
+from array import array
+from collections import namedtuple
+from struct import Struct
+from ubx.UBXFramer import UBX
+from ubx.UBXLog import UBXLog
+from ubx.UBXMessage import lookupMessage, messageRegistry, _parseLazy
+
+try:
+    import numpy as np
+except ImportError:     # NumPy is optional
+    np = None
+
+IndexEntry = namedtuple('IndexEntry', 'offset msgClass msgId length iTOW')
+
+NO_ITOW = 0xffffffff    # iTOW of messages without one
+
+# magic, version, number of frames, resume offset, log size, CRC of the start
+_header = Struct('<8sIQQQI')
+_MAGIC = b'UBXINDEX'
+_VERSION = 1
+_CRC_BYTES = 4096
+# the columns: name, array typecode
+_columns = (('offset', 'Q'), ('msgClass', 'B'), ('msgId', 'B'),
+            ('length', 'H'), ('iTOW', 'I'))
+_U4 = Struct('<I')
+
+
+def _iTOWOffsets():
+    """Return {(msgClass, msgId): offset of iTOW in the payload}."""
+    offsets = {}
+    for (msgClass, messages) in messageRegistry().items():
+        for (msgId, Msg) in messages.items():
+            info = Msg._codec.fieldOffsets.get('iTOW')
+            if info is not None and info[1].size == 4:
+                offsets[(msgClass, msgId)] = info[0]
+    return offsets
+
+
+class UBXIndex(object):
+    """Index of the UBX frames of the log file at logPath."""
+
+    def __init__(self, logPath, indexPath=None, update=True):
+        """Load the index from indexPath (default logPath + '.idx').
+
+        If update is True, the part of the log that is not indexed yet is
+        scanned and the index is saved.
+        """
+        self.logPath = logPath
+        self.indexPath = logPath + '.idx' if indexPath is None else indexPath
+        self._log = None
+        self._clear()
+        if os.path.exists(self.indexPath):
+            self.load()
+        if update:
+            if self.update():
+                self.save()
+
+    def _clear(self):
+        for (name, typecode) in _columns:
+            setattr(self, name, array(typecode))
+        self.resume = 0     # offset where the next update starts scanning
+        self.logSize = 0
+        self.crc = 0
+
+    def __len__(self):
+        return len(self.offset)
+
+    def __getitem__(self, i):
+        return IndexEntry(self.offset[i], self.msgClass[i], self.msgId[i],
+                          self.length[i], self.iTOW[i])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the log file."""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _openLog(self):
+        if self._log is None or self._log.size != os.path.getsize(self.logPath):
+            self.close()
+            self._log = UBXLog(self.logPath)
+        return self._log
+
+    def update(self):
+        """Index the frames added to the log since the last update.
+
+        The index is rebuilt if the log is shorter than before or its
+        start has changed. Returns the number of new frames.
+        """
+        log = self._openLog()
+        if log.size < self.logSize or \
+                zlib.crc32(log._mm[:min(self.logSize, _CRC_BYTES)]) != self.crc:
+            self._clear()
+        n = len(self)
+        mm = log._mm
+        iTOWOffsets = _iTOWOffsets()
+        offset, msgClass, msgId, length, iTOW = \
+            self.offset, self.msgClass, self.msgId, self.length, self.iTOW
+        for (kind, start, stop) in log.scan(self.resume):
+            if kind != UBX:
+                continue
+            key = (mm[start+2], mm[start+3])
+            offset.append(start)
+            msgClass.append(key[0])
+            msgId.append(key[1])
+            length.append(stop - start - 8)
+            pos = iTOWOffsets.get(key)
+            if pos is not None and pos + 4 <= stop - start - 8:
+                iTOW.append(_U4.unpack_from(mm, start + 6 + pos)[0])
+            else:
+                iTOW.append(NO_ITOW)
+        self.resume = log.end
+        self.logSize = log.size
+        self.crc = zlib.crc32(mm[:min(log.size, _CRC_BYTES)])
+        return len(self) - n
+
+    def save(self):
+        """Write the index to indexPath."""
+        tmpPath = self.indexPath + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            f.write(_header.pack(_MAGIC, _VERSION, len(self), self.resume,
+                                 self.logSize, self.crc))
+            for (name, _) in _columns:
+                column = getattr(self, name)
+                if sys.byteorder == 'big':
+                    column = array(column.typecode, column)
+                    column.byteswap()
+                column.tofile(f)
+        os.replace(tmpPath, self.indexPath)
+
+    def load(self):
+        """Read the index from indexPath. An invalid file is ignored."""
+        self._clear()
+        with open(self.indexPath, 'rb') as f:
+            header = f.read(_header.size)
+            if len(header) < _header.size:
+                return
+            (magic, version, count, resume, logSize, crc) = \
+                _header.unpack(header)
+            if magic != _MAGIC or version != _VERSION:
+                return
+            try:
+                for (name, typecode) in _columns:
+                    column = array(typecode)
+                    column.fromfile(f, count)
+                    if sys.byteorder == 'big':
+                        column.byteswap()
+                    setattr(self, name, column)
+            except EOFError:
+                self._clear()
+                return
+        self.resume, self.logSize, self.crc = resume, logSize, crc
+
+    def find(self, *msgTypes, iTOW=None):
+        """Return the positions in the index of the matching frames.
+
+        msgTypes are message classes like UBX.NAV.PVT (all frames if none
+        is given), iTOW is an inclusive range (first, last) of iTOW values,
+        which excludes messages without iTOW.
+        """
+        keys = set((Msg._class, Msg._id) for Msg in msgTypes)
+        lo, hi = (0, NO_ITOW) if iTOW is None \
+            else (iTOW[0], min(iTOW[1], NO_ITOW - 1))
+        if np is not None:
+            return self._findNumpy(keys, lo, hi)
+        return [i for (i, (c, m, t)) in
+                enumerate(zip(self.msgClass, self.msgId, self.iTOW))
+                if (not keys or (c, m) in keys) and lo <= t <= hi]
+
+    def _findNumpy(self, keys, lo, hi):
+        mask = np.ones(len(self), dtype=bool)
+        if keys:
+            key = np.frombuffer(self.msgClass, np.uint8).astype(np.uint16) << 8 \
+                | np.frombuffer(self.msgId, np.uint8)
+            mask &= np.isin(key, [c << 8 | m for (c, m) in keys])
+        if (lo, hi) != (0, NO_ITOW):
+            t = np.frombuffer(self.iTOW, np.uint32)
+            mask &= (t >= lo) & (t <= hi)
+        return np.flatnonzero(mask).tolist()
+
+    def payload(self, i):
+        """Return the payload of frame i as a memoryview into the log."""
+        log = self._openLog()
+        start = self.offset[i] + 6
+        return memoryview(log._mm)[start:start + self.length[i]]
+
+    def parse(self, i, lazy=False):
+        """Return the parsed message of frame i."""
+        Subcls = lookupMessage(self.msgClass[i], self.msgId[i])
+        if Subcls is None:
+            raise Exception("Unknown message {:02X}:{:02X}"
+                            .format(self.msgClass[i], self.msgId[i]))
+        payload = self.payload(i)
+        return _parseLazy(Subcls, payload) if lazy else Subcls(payload)
+
+    def messages(self, *msgTypes, iTOW=None, lazy=False):
+        """Yield the parsed messages of find(*msgTypes, iTOW=iTOW)."""
+        for i in self.find(*msgTypes, iTOW=iTOW):
+            yield self.parse(i, lazy=lazy)
+
+    def message(self, msgType, n, lazy=False):
+        """Return the n-th (counting from 0) message of class msgType."""
+        return self.parse(self.find(msgType)[n], lazy=lazy)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Offline reading of recorded UBX/NMEA logs.
+
+The file is memory mapped and scanned with scanFrames, so memory use does
+not depend on the size of the file, and the end of the file is simply the
+end of the scan:
+
+    with UBXLog("recording.ubx") as log:
+        for msg in log.messages(UBX.NAV.PVT):
+            print(msg.lat, msg.lon)
+
+frames() yields the UBX payloads as memoryviews into the map. They are valid
+as long as they are referenced, even after the log is closed.
+"""
+
+import mmap
+from ubx.UBXFramer import scanFrames, frameFromScan, UBXFrame, \
+    UBX, UBX_BAD_CHECKSUM, NMEA, NMEA_BAD_CHECKSUM, END
+from ubx.UBXMessage import lookupMessage, _parseLazy
+
+
+class UBXLog(object):
+    """A memory mapped UBX/NMEA log file."""
+
+    def __init__(self, path):
+        """Open and map the file at path."""
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:      # empty file
+            self._mm = b''
+        if hasattr(self._mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            self._mm.madvise(mmap.MADV_SEQUENTIAL)
+        self.size = len(self._mm)
+        # offset of a truncated frame at the end of the file, once scanned
+        self.end = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        """Close the file.
+
+        If memoryviews of frames are still referenced, the map stays valid
+        until they are released.
+        """
+        mm, self._mm = self._mm, None
+        if mm is not None and not isinstance(mm, bytes):
+            try:
+                mm.close()
+            except BufferError:
+                pass
+        self._file.close()
+
+    def scan(self, start=0, stop=None):
+        """Yield (kind, start, stop) for the frames between start and stop.
+
+        kind is one of UBXFramer.UBX, UBX_BAD_CHECKSUM, NMEA and
+        NMEA_BAD_CHECKSUM. A frame that is cut off at stop is not
+        yielded, after a complete scan its start is in self.end (or the
+        end of the scanned range if there is none).
+        """
+        if self._mm is None:
+            raise Exception("UBXLog is closed")
+        for (kind, a, b) in scanFrames(self._mm, start,
+                                       self.size if stop is None else stop):
+            if kind == END:
+                self.end = a
+            else:
+                yield (kind, a, b)
+
+    def frames(self, start=0, stop=None):
+        """Yield the frames as in UBXFramer, the UBX payloads as memoryviews."""
+        mm = self._mm
+        view = memoryview(mm)
+        for (kind, a, b) in self.scan(start, stop):
+            if kind == UBX:
+                yield UBXFrame(mm[a+2], mm[a+3], view[a+6:b-2])
+            else:
+                yield frameFromScan(mm, kind, a, b)
+
+    def messages(self, *msgTypes, lazy=False):
+        """Yield the parsed UBX messages.
+
+        If message classes are given (e.g. UBX.NAV.PVT) only those messages
+        are parsed. Frames with a bad checksum, unknown messages and
+        messages that cannot be parsed are skipped.
+        """
+        wanted = set((Msg._class, Msg._id) for Msg in msgTypes)
+        mm = self._mm
+        view = memoryview(mm)
+        for (kind, a, b) in self.scan():
+            if kind != UBX:
+                continue
+            key = (mm[a+2], mm[a+3])
+            if wanted and key not in wanted:
+                continue
+            Subcls = lookupMessage(*key)
+            if Subcls is None:
+                continue
+            try:
+                payload = view[a+6:b-2]
+                yield _parseLazy(Subcls, payload) if lazy else Subcls(payload)
+            except Exception:
+                continue
@@ -2,189 +2,47 @@
 """TODO."""
 
 import threading
-from enum import Enum
+import selectors
+import stat
 import sys
-from queue import Queue
-from ubx import UBXMessage
+import os
 import time
+from queue import Queue, Empty, Full
+from collections import deque, OrderedDict
+from ubx.UBXFramer import UBXFramer, UBXFrame, UBXErrorFrame, NMEAFrame
 
 
-class UBXManager(threading.Thread):
-    """The NMEA/UBX reader/writer thread."""
-
-    class STATE(Enum):
-        START = 0
-        NMEA_BODY = 1
-        NMEA_CHKSUM_1 = 2
-        NMEA_CHKSUM_2 = 3
-        UBX_SYNC_CHAR_2 = 4
-        UBX_CLASS = 5
-        UBX_ID = 6
-        UBX_LENGTH_1 = 7
-        UBX_LENGTH_2 = 8
-        UBX_PAYLOAD = 9
-        UBX_CHKSUM_1 = 10
-        UBX_CHKSUM_2 = 11
-
-    def __init__(self, ser, debug=False, eofTimeout=None):
-        """Instantiate with serial.
-
-        :param ser: serial port, file, or other object that supports ser.read(1)
-        :param debug: write to log.   (filename, or if True, default to ./UBX.log)
-        :param eofTimeout:  seconds to wait for more bytes on read.  Default None->keep trying
-        """
-        threading.Thread.__init__(self)
-        self.ser = ser
-        self.debug = debug
-        self.eofTimeout = eofTimeout
-        self._shutDown = False
-        self.ubx_chksum = UBXMessage.Checksum()
-
-    def run(self):
-        """Run the parser."""
-        transitionFrom = [
-            self._fromSTART,
-            self._fromNMEA_BODY,
-            self._fromNMEA_CHKSUM_1,
-            self._fromNMEA_CHKSUM_2,
-            self._fromUBX_SYNC_CHAR_2,
-            self._fromUBX_CLASS,
-            self._fromUBX_ID,
-            self._fromUBX_LENGTH_1,
-            self._fromUBX_LENGTH_2,
-            self._fromUBX_PAYLOAD,
-            self._fromUBX_CHKSUM_1,
-            self._fromUBX_CHKSUM_2,
-        ]
-        if self.debug:
-            debugfile = "UBX.log" if self.debug is True else self.debug
-            logfile = open(debugfile, "wb")
-            sys.stderr.write("Writing log to {}\n".format(debugfile))
-        self._reset()
-        while not self._shutDown:
-            if hasattr(self.ser, 'read'):
-                byte = self.ser.read(1)
-                if len(byte) == 0:
-                    if self.eofTimeout is None:
-                        time.sleep(0.01)    # Sleep 10 ms so at least it is not just busy-waiting
-                        continue
-                    else:
-                        time.sleep(self.eofTimeout)
-                        byte = self.ser.read(1)
-                        if len(byte) == 0:
-                            break   # Still nothing.  Done
-            else:
-                byte = self.ser.recv(1)
-            if self.debug:
-                logfile.write(byte)
-                logfile.flush()
-            self.state = transitionFrom[self.state.value](byte)
-
-    def _reset(self):
-        self.buffer = b''
-        self.chksum = 0
-        self.chksum_calc = 0
-        self.ubx_class = 0
-        self.ubx_id = 0
-        self.ubx_length = 0
-        self.state = UBXManager.STATE.START
-        self.ubx_chksum.reset()
-
-    def _fromSTART(self, byte):
-        if byte == b'$':
-            return UBXManager.STATE.NMEA_BODY
-        elif byte == b'\xb5':
-            return UBXManager.STATE.UBX_SYNC_CHAR_2
-        else:
-            return UBXManager.STATE.START
+def _readAvailable(ser, n):
+    """Read the available bytes of ser, at most n (at least one, unless at
+    EOF)."""
+    if not hasattr(ser, 'read'):
+        return ser.recv(n)
+    if hasattr(ser, 'in_waiting'):          # pyserial
+        return ser.read(min(ser.in_waiting, n) or 1)
+    if hasattr(ser, 'read1'):               # buffered files and pipes
+        return ser.read1(n)
+    return ser.read(n)
 
-    def _fromNMEA_BODY(self, byte):
-        if byte == b'*':
-            return UBXManager.STATE.NMEA_CHKSUM_1
-        else:
-            self.buffer += byte
-            self.chksum_calc ^= ord(byte)
-            return UBXManager.STATE.NMEA_BODY
 
-    def _fromNMEA_CHKSUM_1(self, byte):
-        try:
-            self.chksum = int(byte, 16) * 16
-        except ValueError:
-            return UBXManager.STATE.START
-        return UBXManager.STATE.NMEA_CHKSUM_2
+class UBXHandler(object):
+    """Dispatch of framed data to the onUBX, onUBXError, onNMEA and
+    onNMEAError handlers.
 
-    def _fromNMEA_CHKSUM_2(self, byte):
-        try:
-            self.chksum += int(byte, 16)
-        except ValueError:
-            return UBXManager.STATE.START
-        if self.chksum == self.chksum_calc:
-            self._onNMEA(self.buffer.decode('ascii'))
-        else:
-            self._onNMEAError(
-                "Incorrect Checksum: {:02X} should be {:02X}"
-                .format(self.chksum_calc, self.chksum)
-            )
-        self._reset()
-        return UBXManager.STATE.START
-
-    def _fromUBX_SYNC_CHAR_2(self, byte):
-        if byte == b'\x62':
-            return UBXManager.STATE.UBX_CLASS
-        else:
-            return UBXManager.STATE.START
-
-    def _fromUBX_CLASS(self, byte):
-        self.ubx_class = ord(byte)
-        self.ubx_chksum.update(byte)
-        return UBXManager.STATE.UBX_ID
-
-    def _fromUBX_ID(self, byte):
-        self.ubx_id = ord(byte)
-        self.ubx_chksum.update(byte)
-        return UBXManager.STATE.UBX_LENGTH_1
-
-    def _fromUBX_LENGTH_1(self, byte):
-        self.ubx_length = ord(byte)
-        self.ubx_chksum.update(byte)
-        return UBXManager.STATE.UBX_LENGTH_2
-
-    def _fromUBX_LENGTH_2(self, byte):
-        self.ubx_length = self.ubx_length + 256 * ord(byte)
-        self.ubx_chksum.update(byte)
-        return UBXManager.STATE.UBX_PAYLOAD
-
-    def _fromUBX_PAYLOAD(self, byte):
-        if self.ubx_length > 0:
-            self.buffer += byte
-            self.ubx_length -= 1
-            self.ubx_chksum.update(byte)
-            return UBXManager.STATE.UBX_PAYLOAD
-        else:
-            self.chksum = 256 * ord(byte)   # CK_A shifted left
-            return UBXManager.STATE.UBX_CHKSUM_1
-
-    def _fromUBX_CHKSUM_1(self, byte):
-        self.chksum += ord(byte)  # 256 * CK_A + CK_B
-        return UBXManager.STATE.UBX_CHKSUM_2
+    Base class of the managers. Subclasses set self.lazy and self._framer
+    and pass the bytes read to _parse.
+    """
 
-    def _fromUBX_CHKSUM_2(self, byte):
-        if self.chksum == self.ubx_chksum.get():
-            self._onUBX(self.ubx_class, self.ubx_id, self.buffer)
-        else:
-            self._onUBXError(
-                self.ubx_class,
-                self.ubx_id,
-                "Incorrect Checksum: {:04X} should be {:04X}"
-                    .format(self.ubx_chksum.get(), self.chksum)
-            )
-        self._reset()
-        if byte == b'$':
-            return UBXManager.STATE.NMEA_BODY
-        elif byte == b'\xb5':
-            return UBXManager.STATE.UBX_SYNC_CHAR_2
-        else:
-            return UBXManager.STATE.START
+    def _parse(self, data):
+        """Feed data to the framer and dispatch the complete frames."""
+        for frame in self._framer.feed(data):
+            if type(frame) is UBXFrame:
+                self._onUBX(*frame)
+            elif type(frame) is NMEAFrame:
+                self._onNMEA(frame.sentence)
+            elif type(frame) is UBXErrorFrame:
+                self._onUBXError(*frame)
+            else:
+                self._onNMEAError(frame.errMsg)
 
     def _onNMEA(self, buffer):
         self.onNMEA(buffer)
@@ -201,15 +59,34 @@ class UBXManager(threading.Thread):
         print("NMEA ERR: {}".format(errMsg))
 
     def _onUBX(self, msgClass, msgId, buffer):
-        from ubx.UBXMessage import parseUBXPayload, formatByteString
+        (handler, args) = self._decodeUBX(msgClass, msgId, buffer)
+        handler(*args)
+
+    def _decodeUBX(self, msgClass, msgId, buffer):
+        """Parse a UBX payload, return (onUBX, (obj,)) or (onUBXError, args)."""
+        from ubx.UBXMessage import lookupMessage, formatByteString
+        from ubx.UBXMessage import _unknownMessageError, _parseLazy
+        Subcls = lookupMessage(msgClass, msgId)
         try:
-            obj = parseUBXPayload(msgClass, msgId, buffer)
+            if Subcls is None:
+                raise Exception(_unknownMessageError(msgClass, msgId))
+            obj = _parseLazy(Subcls, buffer) if self.lazy else Subcls(buffer)
         except Exception as e:
             errMsg = "No parse, \"{}\", payload={}".format(
                      e, formatByteString(buffer))
-            self.onUBXError(msgClass, msgId, errMsg)
+            return (self.onUBXError, (msgClass, msgId, errMsg))
+        return (self.onUBX, (obj,))
+
+    def _decode(self, frame):
+        """Return (handler, args) of the call that _parse makes for frame."""
+        if type(frame) is UBXFrame:
+            return self._decodeUBX(*frame)
+        elif type(frame) is NMEAFrame:
+            return (self._onNMEA, (frame.sentence,))
+        elif type(frame) is UBXErrorFrame:
+            return (self._onUBXError, tuple(frame))
         else:
-            self.onUBX(obj)
+            return (self._onNMEAError, (frame.errMsg,))
 
     def onUBX(self, obj):
         """Default handler for good UBX message."""
@@ -223,6 +100,138 @@ class UBXManager(threading.Thread):
         print("UBX ERR {:02X}:{:02X} {}"
               .format(msgClass, msgId, errMsg))
 
+
+class UBXManager(threading.Thread, UBXHandler):
+    """The NMEA/UBX reader/writer thread."""
+
+    readSize = 65536    # max. number of bytes per read
+
+    def __init__(self, ser, debug=False, eofTimeout=None, lazy=False,
+                 capture=None):
+        """Instantiate with serial.
+
+        :param ser: serial port, file, or other object that supports ser.read(n)
+        :param debug: write to log.   (filename, or if True, default to ./UBX.log)
+        :param eofTimeout:  seconds to wait for more bytes on read.  Default None->keep trying
+        :param lazy: pass lazily decoded messages to onUBX, see parseUBXPayload
+        :param capture: UBXCapture that gets the bytes read, instead of the debug log
+        """
+        threading.Thread.__init__(self)
+        self.ser = ser
+        self.debug = debug
+        self.capture = capture
+        self.eofTimeout = eofTimeout
+        self.lazy = lazy
+        self._shutDown = False
+        self._shutDownEvent = threading.Event()
+        self._wakeup = None             # write end of the wake-up pipe
+        self._wakeupLock = threading.Lock()
+        self._framer = UBXFramer()
+
+    def run(self):
+        """Run the parser."""
+        capture = self.capture
+        if capture is None and self.debug:
+            from ubx.UBXCapture import UBXCapture
+            debugfile = "UBX.log" if self.debug is True else self.debug
+            capture = UBXCapture(debugfile)
+            sys.stderr.write("Writing log to {}\n".format(debugfile))
+        try:
+            self._readLoop(capture)
+        finally:
+            if capture is not None and capture is not self.capture:
+                capture.close()
+
+    def _readLoop(self, capture):
+        fd = self._fileno()
+        if fd is None:
+            self._pollLoop(capture)
+        else:
+            self._selectLoop(capture, fd)
+
+    def _fileno(self):
+        """Return the file descriptor of ser to wait on, or None.
+
+        Regular files are always readable, so they are polled like objects
+        without a file descriptor.
+        """
+        try:
+            fd = self.ser.fileno()
+            if stat.S_ISREG(os.fstat(fd).st_mode):
+                return None
+        except (AttributeError, OSError, ValueError):
+            return None
+        return fd
+
+    def _pollLoop(self, capture):
+        """Read loop for sources without a file descriptor."""
+        while not self._shutDown:
+            data = self._read()
+            if len(data) == 0:
+                data = self._waitEOF()
+                if data is None:
+                    break
+                if len(data) == 0:
+                    continue
+            self._process(data, capture)
+
+    def _selectLoop(self, capture, fd):
+        """Read loop that blocks in a selector until fd or the wake-up pipe
+        is readable.
+
+        As for a blocking read, the wait ends after ser.timeout (pyserial)
+        if ser has one.
+        """
+        timeout = getattr(self.ser, 'timeout', None)
+        if not isinstance(timeout, (int, float)):
+            timeout = None
+        wakeup, self._wakeup = os.pipe()
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(fd, selectors.EVENT_READ)
+                selector.register(wakeup, selectors.EVENT_READ)
+                while not self._shutDown:
+                    ready = selector.select(timeout)
+                    if self._shutDown:
+                        break
+                    data = self._read() if ready else b''
+                    if len(data) == 0:      # end of file or read timeout
+                        data = self._waitEOF()
+                        if data is None:
+                            break
+                        if len(data) == 0:
+                            continue
+                    self._process(data, capture)
+        finally:
+            with self._wakeupLock:
+                os.close(self._wakeup)
+                self._wakeup = None
+            os.close(wakeup)
+
+    def _waitEOF(self):
+        """Wait after an empty read.
+
+        Returns None if the reader is done, else the bytes read after
+        waiting (b'' to keep trying).
+        """
+        if self.eofTimeout is None:
+            # Wait 10 ms so at least it is not just busy-waiting
+            self._shutDownEvent.wait(0.01)
+            return b''
+        if self._shutDownEvent.wait(self.eofTimeout):
+            return None
+        data = self._read()
+        return data if len(data) else None   # Still nothing.  Done
+
+    def _process(self, data, capture):
+        if capture is not None:
+            capture.write(data)
+        self._parse(data)
+
+    def _read(self):
+        """Read all available bytes (at least one, unless at EOF)."""
+        return _readAvailable(self.ser, self.readSize)
+
     def send(self, msg):
         """Send message to ser."""
         from ubx.UBXMessage import formatByteString
@@ -234,8 +243,102 @@ class UBXManager(threading.Thread):
             self.ser.send(msg)
 
     def shutdown(self):
-        """Stop the manger."""
+        """Stop the manger, also while it waits for data."""
         self._shutDown = True
+        self._shutDownEvent.set()
+        with self._wakeupLock:
+            if self._wakeup is not None:
+                os.write(self._wakeup, b'\0')
+
+
+POLICIES = ('block', 'drop_newest', 'drop_oldest', 'latest')
+
+
+class MessageQueue(Queue):
+    """queue.Queue of messages with a policy for a full queue.
+
+    Policies (with maxsize > 0):
+        'block'         put waits for free space (as queue.Queue)
+        'drop_newest'   the new message is dropped
+        'drop_oldest'   the oldest queued message is dropped
+        'latest'        only the latest message of each type is kept: a new
+                        message replaces a queued one of its type (and goes
+                        to the end), and the oldest message is dropped if
+                        the queue is full
+    'latest' also conflates messages when maxsize is 0. Dropped and
+    replaced messages are counted in dropped, count as done for join, and
+    highWater is the max. number of queued messages.
+    """
+
+    def __init__(self, maxsize=0, policy='block'):
+        if policy not in POLICIES:
+            raise Exception("Unknown policy {}".format(policy))
+        self.policy = policy
+        self.dropped = 0
+        self.highWater = 0
+        Queue.__init__(self, maxsize)
+
+    def _init(self, maxsize):
+        self.queue = OrderedDict() if self.policy == 'latest' else deque()
+
+    def _put(self, item):
+        if self.policy == 'latest':
+            self.queue[type(item)] = item
+        else:
+            self.queue.append(item)
+        if len(self.queue) > self.highWater:
+            self.highWater = len(self.queue)
+
+    def _get(self):
+        if self.policy == 'latest':
+            return self.queue.popitem(last=False)[1]
+        return self.queue.popleft()
+
+    def put(self, item, block=True, timeout=None):
+        """Put item on the queue, return False if it was dropped."""
+        if self.policy == 'block':
+            Queue.put(self, item, block, timeout)
+            return True
+        with self.not_full:
+            if self.policy == 'latest':
+                key = type(item)
+                if key in self.queue:
+                    del self.queue[key]
+                    self._dropped()
+            if 0 < self.maxsize <= self._qsize():
+                if self.policy == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                self._get()
+                self._dropped()
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+        return True
+
+    def _dropped(self):
+        self.dropped += 1
+        self.unfinished_tasks -= 1
+        if not self.unfinished_tasks:
+            self.all_tasks_done.notify_all()
+
+    def get_many(self, max_n, timeout=None, taskDone=False):
+        """Remove and return up to max_n items, at least one.
+
+        Waits up to timeout seconds (forever if None) for the first item
+        and returns [] if there is none. With taskDone the items are also
+        marked as done, as by task_done for each of them.
+        """
+        with self.not_empty:
+            if not self.not_empty.wait_for(self._qsize, timeout):
+                return []
+            items = [self._get() for _ in range(min(max_n, self._qsize()))]
+            self.not_full.notify(len(items))
+            if taskDone:
+                self.unfinished_tasks -= len(items)
+                if not self.unfinished_tasks:
+                    self.all_tasks_done.notify_all()
+        return items
 
 
 class UBXQueue(UBXManager):
@@ -244,28 +347,104 @@ class UBXQueue(UBXManager):
     Use .empty() and .get() as for a queue.Queue
     """
 
-    def __init__(self, ser, debug=False, start=False, eofTimeout=None, queue=None):
+    def __init__(self, ser, debug=False, start=False, eofTimeout=None, queue=None,
+                 lazy=False, capture=None, maxsize=0, policy='block',
+                 autoTaskDone=True):
         """
         :param ser: Passed to UBXManager
         :param eofTimeout: Passed to UBXManager
+        :param lazy: Passed to UBXManager
+        :param capture: Passed to UBXManager
         :param start: start thread immediately on init
-        :param queue: Optional queue to use, otherwise uses own
+        :param queue: Optional queue to use, otherwise uses own; any queue
+            with put, get, empty, qsize, task_done and join, e.g. a
+            multiprocessing.JoinableQueue
+        :param maxsize: max. number of queued messages of the own queue,
+            0 for no limit
+        :param policy: what happens when the own queue is full, see
+            MessageQueue
+        :param autoTaskDone: get marks the message as done, so join only
+            waits until all messages are taken; if False the consumer calls
+            task_done after processing each message
         """
-        self._queue = queue if queue else Queue()
+        self._queue = queue if queue else MessageQueue(maxsize, policy)
         # Reflects the has-a queue's get() and empty() methods
         self.empty = self._queue.empty
-        super(UBXQueue, self).__init__(ser=ser, debug=debug, eofTimeout=eofTimeout)
+        self.qsize = self._queue.qsize
+        self.autoTaskDone = autoTaskDone
+        super(UBXQueue, self).__init__(ser=ser, debug=debug, eofTimeout=eofTimeout,
+                                       lazy=lazy, capture=capture)
         if start:
             self.start()
 
+    @property
+    def dropped(self):
+        """Number of messages dropped by the policy."""
+        return getattr(self._queue, 'dropped', 0)
+
+    @property
+    def highWater(self):
+        """Max. number of queued messages."""
+        return getattr(self._queue, 'highWater', None)
+
     def get(self, *args, **kwargs):
         m = self._queue.get(*args, **kwargs)
-        self._queue.task_done()
+        if self.autoTaskDone:
+            self._queue.task_done()
         return m
 
-    def onUBX(self, obj):  # handle good UBX message
-        self._queue.put(obj)
+    def task_done(self):
+        """Mark a message as processed, with autoTaskDone=False."""
+        self._queue.task_done()
 
-    def join(self):
-        super(UBXQueue, self).join()
-        self._queue.join()
+    def get_many(self, max_n, timeout=None):
+        """Return up to max_n messages, waiting up to timeout seconds for
+        the first one ([] if there is none)."""
+        q = self._queue
+        if isinstance(q, MessageQueue):
+            return q.get_many(max_n, timeout, taskDone=self.autoTaskDone)
+        try:
+            msgs = [q.get(timeout=timeout)]
+        except Empty:
+            return []
+        try:
+            while len(msgs) < max_n:
+                msgs.append(q.get_nowait())
+        except Empty:
+            pass
+        if self.autoTaskDone:
+            for _ in msgs:
+                q.task_done()
+        return msgs
+
+    def onUBX(self, obj):  # handle good UBX message
+        q = self._queue
+        if not isinstance(q, MessageQueue) or not q.maxsize or \
+                q.policy != 'block':
+            q.put(obj)
+            return
+        while not self._shutDown:      # wait for space until shut down
+            try:
+                q.put(obj, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def join(self, timeout=None):
+        """Wait until the reader has ended and all messages are done.
+
+        The timeout does not apply to the wait for the messages of a queue
+        passed to __init__.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        super(UBXQueue, self).join(timeout)
+        if self.is_alive():
+            return
+        q = self._queue
+        if not isinstance(q, MessageQueue):
+            q.join()
+            return
+        with q.all_tasks_done:
+            q.all_tasks_done.wait_for(
+                lambda: not q.unfinished_tasks,
+                None if deadline is None else max(0, deadline - time.monotonic()))
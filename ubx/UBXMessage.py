@@ -2,11 +2,12 @@
 """TODO."""
 
 import struct
-import inspect
 from enum import Enum
-import sys
 
 import ubx.UBX
+from ubx.Codec import Codec, RepeatedBlocks
+from ubx.UBXNumpy import DtypeAttribute
+from ubx.Checksum import Checksum, checksum
 
 class MessageClass(Enum):
     """UBX Class IDs."""
@@ -26,11 +27,6 @@ class MessageClass(Enum):
     HNR = b'\x28'  # High Rate Navigation Results Messages: High rate time, position, speed, heading
 
 
-def _byte(i):
-    """Helper function: convert int 0..255 to bytestring byte."""
-    return bytes([i])
-
-
 class UBXMessage(object):
     """Base class for UBX messages."""
 
@@ -49,12 +45,25 @@ class UBXMessage(object):
     @staticmethod
     def make(msgClass, msgId, payload):
         """Return a proper UBX message from the given class, id and payload."""
-        msg = struct.pack('cc', UBXMessage.sync_char_1, UBXMessage.sync_char_2)
-        msg += struct.pack('cc', _byte(msgClass), _byte(msgId))
-        msg += struct.pack('<h', len(payload))
-        msg += payload
-        msg += struct.pack('>H', UBXMessage.Checksum(msg[2:]).get())
-        return msg
+        msg = bytearray(len(payload) + 8)
+        UBXMessage.makeInto(msg, 0, msgClass, msgId, payload)
+        return bytes(msg)
+
+    @staticmethod
+    def makeInto(buf, offset, msgClass, msgId, payload):
+        """Write the UBX message with the given class, id and payload into buf.
+
+        buf is a writable buffer with room for len(payload) + 8 bytes at
+        offset. Returns the offset after the message.
+        """
+        end = offset + 6 + len(payload)
+        if len(buf) < end + 2:
+            raise Exception(
+                "Buffer too short for a UBX message with {} payload bytes at "
+                "offset {}.".format(len(payload), offset))
+        _header.pack_into(buf, offset, _sync, msgClass, msgId, len(payload))
+        buf[offset+6:end] = payload
+        return _packChecksum(buf, offset, end)
 
     @staticmethod
     def extract(msg):
@@ -66,7 +75,7 @@ class UBXMessage(object):
         if sync1 != UBXMessage.sync_char_1 or sync2 != UBXMessage.sync_char_2:
             raise Exception("Sync chars not correct.")
         msgClass, msgId = struct.unpack('cc', msg[2:4])
-        lenPayload = struct.unpack('<h', msg[4:6])[0]
+        lenPayload = struct.unpack('<H', msg[4:6])[0]
         payload = msg[6:(6+lenPayload)]
         trueCksum = UBXMessage.Checksum(msg[2:(len(msg)-2)]).get()
         msgCksum = struct.unpack('>H', msg[6+lenPayload:])[0]
@@ -81,35 +90,30 @@ class UBXMessage(object):
         """Serialize the UBXMessage."""
         return UBXMessage.make(self._class, self._id, self._payload)
 
-    class Checksum:
-        """Incrementally calculate UBX message checksums."""
+    def serializeInto(self, buf, offset=0):
+        """Serialize the UBXMessage into buf at offset, see makeInto."""
+        return UBXMessage.makeInto(buf, offset, self._class, self._id,
+                                   self._payload)
 
-        def __init__(self, msg=None):
-            """Instantiate object.
+    def serializedSize(self):
+        """Return the length of the serialized UBXMessage."""
+        return len(self._payload) + 8
 
-            If msg is not None calculate the checksum of the message, otherwise
-            instantiate the checksums to zero.
-            """
-            self.reset()
-            if msg is not None:
-                for i in msg:
-                    self.update(bytes([i]))
+    Checksum = Checksum
 
-        def reset(self):
-            """Reset the checksums to zero."""
-            self.a, self.b = 0x00, 0x00
 
-        def update(self, byte):
-            """Update checksums with byte."""
-            i = ord(byte)
-            self.a += i
-            self.a &= 0xff
-            self.b += self.a
-            self.b &= 0xff
+_sync = UBXMessage.sync_char_1 + UBXMessage.sync_char_2
+_header = struct.Struct('<2sBBH')       # sync chars, class, id, length
+_ckStruct = struct.Struct('>H')
 
-        def get(self):
-            """Return the checksum (a 16-bit integer, ck_a is the MSB)."""
-            return self.a * 256 + self.b
+
+def _packChecksum(buf, offset, end):
+    """Write the checksum of the frame in buf[offset:end] at end.
+
+    Returns the offset after the checksum.
+    """
+    _ckStruct.pack_into(buf, end, checksum(buf, offset + 2, end))
+    return end + 2
 
 
 def _mkFieldInfo(Fields):
@@ -130,154 +134,440 @@ def _mkFieldInfo(Fields):
         }
 
 
-def _mkNamesAndTypes(fieldInfo, msgLength):
-    """Make list of variable names and list of variable types.
-
-    Input is the fieldInfo as returned by _mkFieldInfo.
-    The number of repeated objects is deduced from the message length and
-    the types of variables in the 'once' and 'repeat' block of the input."""
-    varTypes, varNames = fieldInfo['once']
-    repeat = fieldInfo['repeat']
-    if repeat:
-        varTypesRepeat, varNamesRepeat = repeat['once']     # nest level 1 only
-        sizeOnce = sum([t._size for t in varTypes])
-        sizeRepeat = sum([t._size for t in varTypesRepeat])
-        N = (msgLength - sizeOnce) // sizeRepeat
-        sizeTotal = sizeOnce + N * sizeRepeat
-        if sizeTotal != msgLength:
-            errmsg = "message length {} does not match {}"\
-                     .format(msgLength, sizeTotal)
-            raise Exception(errmsg)
-        varTypes += N * varTypesRepeat
-        varNames += _flatten(list(
-            map(lambda i: list(map(lambda s: s+"_"+str(i),
-                                   varNamesRepeat)
-                              ),
-                range(1, N+1))
-            )
-        )
-    return varNames, varTypes
-
-
-def _flatten(l):
-    return [item for sublist in l for item in sublist]
-
-
-def initMessageClass(cls):
+def initMessageClass(cls=None, slots=False):
     """Decorator for the python class representing a UBX message class.
 
     It does the following in cls:
     - add a dict with name _lookup that maps UBX message ID to python subclass.
+    - register cls, so that its messages can be found with lookupMessage.
     In each subclass it does this:
+    - add a Codec with name _codec, compiled from the Fields
     - add an __init__ if it doesn't exist
     - add a __str__ if it doesn't exist
     Function __init__ instantiates the object from a message.
     Function __str__ creates a human readable string from the object.
+    Function serialize creates the UBX message from the object.
+
+    With @initMessageClass(slots=True) the subclasses without a Repeated
+    block are recreated with __slots__ for their fields. Their objects have
+    no __dict__, which saves a lot of memory when many of them are kept.
     """
-    cls_name = cls.__name__
+    if cls is None:
+        return lambda cls: initMessageClass(cls, slots=slots)
     subClasses = [c for c in cls.__dict__.values() if type(c) == type]
+    if slots:
+        subClasses = [_withSlots(cls, sc) for sc in subClasses]
 
     lookup = dict([(getattr(subcls, '_id'), subcls) for subcls in subClasses])
     setattr(cls, "_lookup", lookup)
 
     for sc in subClasses:
-        if sc.__dict__.get('Fields') is None:       # 'Fields' must be present
-            raise Exception(
-                "Class {}.{} has no Fields"
-                .format(cls.__name__, sc.__name__)
-            )
-        # add __init__ to subclass if necessary
-        if sc.__dict__.get('__init__') is None:
-            def __init__(self, msg):
-                """Instantiate object from message bytestring."""
-                fieldInfo = _mkFieldInfo(self.Fields)
-                varNames, varTypes = _mkNamesAndTypes(fieldInfo, len(msg))
-                if not varNames:
-                    errmsg = 'No variables found in UBX.{}.{}.'\
-                             .format(cls_name, sc.__name__)
-                    errmsg += ' Is the \'Fields\' class empty?'
-                    raise Exception(errmsg)
-                _len = len(msg)     # msg will be consumed in the loop
-                for (varName, varType) in zip(varNames, varTypes):
-                    val, msg = varType.parse(msg)
-                    setattr(self, varName, val)
-                if len(msg) != 0:
-                    clsName = "UBX.{}.{}".format(cls_name, sc.__name__)
-                    raise Exception(
-                        "Message not fully consumed while parsing a {}!"
-                        .format(clsName)
-                    )
-                self._len = _len
-                self._payload = msg
-            setattr(sc, "__init__", __init__)
-        # add __str__ to subclass if necessary
-        if sc.__dict__.get('__str__') is None:
-            def __str__(self):
-                """Return human readable string."""
-                fieldInfo = _mkFieldInfo(self.Fields)
-                varNames, varTypes = _mkNamesAndTypes(fieldInfo, self._len)
-                s = "{}-{}:".format(cls_name, type(self).__name__)
-                for (varName, varType) in zip(varNames, varTypes):
-                    s += "\n  {}={}".format(
-                        varName,
-                        varType.toString(getattr(self, varName))    # prettify
-                        )
-                return s
-            setattr(sc, "__str__", __str__)
-        # add serialize to subclass if necessary
-        if sc.__dict__.get('serialize') is None:
-            def serialize(self):
-                """UBX-serialize this object."""
-                fieldInfo = _mkFieldInfo(self.Fields)
-                varNames, varTypes = _mkNamesAndTypes(fieldInfo, self._len)
-                payload = b''
-                for name, typ in zip(varNames, varTypes):
-                    val = getattr(self, name)
-                    payload += typ.serialize(val)
-                return UBXMessage.make(
-                    self._class, self._id, payload
+        _initMessage(cls, sc)
+    registerMessageClass(cls)
+    return cls
+
+
+def _withSlots(cls, sc):
+    """Return a copy of message sc that stores its fields in __slots__.
+
+    Messages with a Repeated block or without Fields are returned unchanged,
+    as are messages that define class attributes with the name of a field.
+    """
+    Fields = sc.__dict__.get('Fields')
+    if Fields is None or '__slots__' in sc.__dict__ \
+            or Fields.__dict__.get('Repeated') is not None:
+        return sc
+    names = _mkFieldInfo(Fields)['once'][1]
+    if any(name in sc.__dict__ for name in names):
+        return sc
+    ns = dict((k, v) for (k, v) in sc.__dict__.items()
+              if k not in ('__dict__', '__weakref__'))
+    ns['__slots__'] = tuple(names) + ('_len', '_payload')
+    new = type(sc)(sc.__name__, sc.__bases__, ns)
+    new.__qualname__ = sc.__qualname__
+    setattr(cls, sc.__name__, new)
+    return new
+
+
+_slotsMessages = {}
+
+
+def slotsMessage(Msg):
+    """Return the subclass of message Msg that stores its fields in __slots__.
+
+    Its objects only get a __dict__ when other attributes are added to them,
+    and take less memory. The subclass is made once and is not registered,
+    lookupMessage still returns Msg. Messages with a Repeated block or their
+    own __init__ are returned unchanged. See parseUBXPayload(slots=True).
+    """
+    new = _slotsMessages.get(Msg)
+    if new is None:
+        new = Msg
+        codec = Msg._codec
+        names = tuple(codec.onceNames) + ('_len', '_payload')
+        if not codec.repeatNames and codec.onceNames and \
+                Msg._lazy is not None and '__slots__' not in Msg.__dict__ \
+                and not any(hasattr(Msg, name) for name in names):
+            new = type(Msg)(Msg.__name__, (Msg,), {
+                '__slots__': names, '__module__': Msg.__module__,
+                '__doc__': Msg.__doc__, '__reduce__': _slotsReduce})
+            new.__qualname__ = Msg.__qualname__
+            setters = tuple(new.__dict__[name].__set__
+                            for name in codec.onceNames)
+            new.__init__ = _mkInit(Msg.__qualname__.partition('.')[0], setters)
+        _slotsMessages[Msg] = new
+    return new
+
+
+def _slotsReduce(self):
+    """Pickle an object of a slotsMessage subclass by its field values."""
+    Msg = type(self).__bases__[0]
+    vals = tuple(getattr(self, name) for name in self._codec.onceNames)
+    return (_slotsObject, (Msg, vals, self._len), self.__dict__ or None)
+
+
+def _slotsObject(Msg, vals, _len):
+    """Return the slotsMessage(Msg) object with the given field values."""
+    cls = slotsMessage(Msg)
+    obj = cls.__new__(cls)
+    for (name, val) in zip(Msg._codec.onceNames, vals):
+        setattr(obj, name, val)
+    obj._len = _len
+    obj._payload = b''
+    return obj
+
+
+def _initMessage(cls, sc):
+    """Add the generated functions to the message sc of message class cls."""
+    cls_name = cls.__name__
+    if sc.__dict__.get('Fields') is None:       # 'Fields' must be present
+        raise Exception(
+            "Class {}.{} has no Fields"
+            .format(cls.__name__, sc.__name__)
+        )
+    # compile the Fields once, the functions below only use the codec
+    setattr(sc, "_codec", Codec(_mkFieldInfo(sc.Fields)))
+    sc._codec.Message = sc
+    # slot descriptors of the fields if sc has __slots__, see _withSlots
+    setters = None
+    if set(sc._codec.onceNames) <= set(sc.__dict__.get('__slots__', ())):
+        setters = tuple(sc.__dict__[name].__set__ for name in sc._codec.onceNames)
+    # add __init__ to subclass if necessary
+    if sc.__dict__.get('__init__') is None:
+        setattr(sc, "__init__", _mkInit(cls_name, setters))
+        # lazily decoding twin, see parseUBXPayload
+        setattr(sc, "_lazy", _mkLazyClass(cls_name, sc))
+    elif sc.__dict__.get('_lazy') is None:
+        setattr(sc, "_lazy", None)
+    # the repeated fields as name_n attributes, see RepeatedBlocks
+    if sc._codec.repeatNames:
+        if sc.__dict__.get('__getattr__') is None:
+            setattr(sc, "__getattr__", _repeatedGetattr)
+        if sc.__dict__.get('__setattr__') is None:
+            setattr(sc, "__setattr__", _repeatedSetattr)
+    # NumPy dtype, see UBXNumpy
+    if 'dtype' not in sc.__dict__:
+        setattr(sc, "dtype", DtypeAttribute())
+    # add __str__ to subclass if necessary
+    if sc.__dict__.get('__str__') is None:
+        def __str__(self):
+            """Return human readable string."""
+            N, varNames, varTypes = self._codec.layout(self._len)
+            s = "{}-{}:".format(cls_name, type(self).__name__)
+            for (varName, varType) in zip(varNames, varTypes):
+                s += "\n  {}={}".format(
+                    varName,
+                    varType.toString(getattr(self, varName))    # prettify
                     )
-            setattr(sc, "serialize", serialize)
-        # set the '_class' class variable in subclass
-        setattr(sc, '_class', cls._class)
+            return s
+        setattr(sc, "__str__", __str__)
+    # add serialize, serializeInto and serializedSize to subclass if necessary
+    if sc.__dict__.get('serialize') is not None:
+        # a custom serialize, copy its result
+        if sc.__dict__.get('serializeInto') is None:
+            def serializeInto(self, buf, offset=0):
+                """UBX-serialize this object into buf at offset."""
+                msg = self.serialize()
+                buf[offset:offset+len(msg)] = msg
+                return offset + len(msg)
+            setattr(sc, "serializeInto", serializeInto)
+        if sc.__dict__.get('serializedSize') is None:
+            def serializedSize(self):
+                """Return the length of the serialized object."""
+                return len(self.serialize())
+            setattr(sc, "serializedSize", serializedSize)
+    if sc.__dict__.get('serializeInto') is None:
+        def serializeInto(self, buf, offset=0):
+            """UBX-serialize this object into buf at offset.
+
+            buf is a writable buffer with room for serializedSize() bytes
+            at offset. Returns the offset after the message.
+            """
+            codec = self._codec
+            N = codec.layout(self._len)[0]
+            getter = codec.packer(N)[2]
+            _header.pack_into(buf, offset, _sync, self._class, self._id,
+                              self._len)
+            end = codec.encodeInto(buf, offset + 6, getter(self), N)
+            return _packChecksum(buf, offset, end)
+        setattr(sc, "serializeInto", serializeInto)
+    if sc.__dict__.get('serializedSize') is None:
+        def serializedSize(self):
+            """Return the length of the serialized object."""
+            return self._len + 8
+        setattr(sc, "serializedSize", serializedSize)
+    if sc.__dict__.get('serialize') is None:
+        def serialize(self):
+            """UBX-serialize this object."""
+            buf = bytearray(self.serializedSize())
+            self.serializeInto(buf)
+            return bytes(buf)
+        setattr(sc, "serialize", serialize)
+    # set the '_class' class variable in subclass
+    setattr(sc, '_class', cls._class)
+
+
+def _mkInit(cls_name, setters):
+    """Return the __init__ of a message, setters are the __set__ of its slot
+    descriptors or None."""
+    def __init__(self, msg):
+        """Instantiate object from message bytestring."""
+        codec = self._codec
+        _len = len(msg)
+        N, varNames, varTypes = _checkLayout(self, cls_name, _len)
+        if codec.repeatNames:
+            d = self.__dict__
+            d.update(zip(codec.onceNames, codec.decodeOnce(msg)))
+            d['repeated'] = RepeatedBlocks(codec, codec.decodeRepeated(msg, N))
+        elif setters is None:
+            self.__dict__.update(zip(varNames, codec.decode(msg, N)))
+        else:
+            for (setter, val) in zip(setters, codec.decode(msg, N)):
+                setter(self, val)
+        self._len = _len
+        self._payload = b''
+    return __init__
+
+
+def _checkLayout(self, cls_name, _len):
+    """Return the (N, names, types) layout of a message of length _len.
+
+    Raises an exception if there are no fields or if the length does not
+    match the Fields.
+    """
+    codec = self._codec
+    if not codec.onceNames and not codec.repeatNames:
+        errmsg = 'No variables found in UBX.{}.{}.'\
+                 .format(cls_name, type(self).__name__)
+        errmsg += ' Is the \'Fields\' class empty?'
+        raise Exception(errmsg)
+    N, varNames, varTypes = codec.layout(_len)
+    if N == 0 and _len != codec.sizeOnce:
+        clsName = "UBX.{}.{}".format(cls_name, type(self).__name__)
+        raise Exception(
+            "Message not fully consumed while parsing a {}!"
+            .format(clsName)
+        )
+    return N, varNames, varTypes
+
+
+class _LazyField(object):
+    """Descriptor that decodes a field of a lazy message on first access.
+
+    The value is then stored in the instance __dict__, which takes precedence
+    over this (non-data) descriptor on subsequent accesses.
+    """
+
+    __slots__ = ('name', 'offset', 'unpack_from', 'fromRaw')
+
+    def __init__(self, name, offset, struct, fromRaw):
+        self.name = name
+        self.offset = offset
+        self.unpack_from = struct.unpack_from
+        self.fromRaw = fromRaw
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        val = self.unpack_from(obj._payload, self.offset)[0]
+        if self.fromRaw is not None:
+            val = self.fromRaw(val)
+        obj.__dict__[self.name] = val
+        return val
+
+
+class _LazyRepeated(object):
+    """Descriptor that decodes the repeated blocks of a lazy message."""
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        codec = obj._codec
+        val = RepeatedBlocks(
+            codec, codec.decodeRepeated(obj._payload, codec.count(obj._len)))
+        obj.__dict__['repeated'] = val
+        return val
+
+
+def _repeatedGetattr(self, name):
+    """Return the repeated field name (e.g. cno_3) from self.repeated."""
+    pos = None if name.startswith('_') else self._codec.splitName(name)
+    if pos is None:
+        raise AttributeError(name)
+    (field, k) = pos
+    repeated = self.repeated
+    if k >= len(repeated):
+        raise AttributeError(name)
+    return repeated._rows[k][self._codec.repeatIndex[field]]
+
+
+def _repeatedSetattr(self, name, val):
+    """Set the repeated field name (e.g. cno_3) in self.repeated."""
+    pos = None if name.startswith('_') else self._codec.splitName(name)
+    if pos is None or pos[1] >= len(self.repeated):
+        object.__setattr__(self, name, val)
+    else:
+        self.repeated._set(pos[1], pos[0], val)
+
+
+def _lazyGetattr(self, name):
+    """Decode the repeated field name (e.g. cno_3) of a lazy message.
+
+    Only the field is decoded, unless the repeated blocks are decoded
+    already.
+    """
+    if name.startswith('_') or 'repeated' in self.__dict__:
+        return _repeatedGetattr(self, name)
+    return self._codec.decodeField(self._payload, name)
+
+
+def _mkLazyClass(cls_name, sc):
+    """Return the lazily decoding subclass of message sc.
+
+    Its objects keep the payload in _payload and decode the fields only when
+    they are accessed.
+    """
+    codec = sc._codec
+    ns = dict((name, _LazyField(name, *info))
+              for (name, info) in codec.fieldOffsets.items())
+    if codec.repeatNames:
+        ns['__getattr__'] = _lazyGetattr
+        ns['repeated'] = _LazyRepeated()
+    ns['__doc__'] = sc.__doc__
+    ns['__module__'] = sc.__module__
+    ns['_clsName'] = cls_name
+    Lazy = type(sc)(sc.__name__, (sc,), ns)
+    Lazy.__qualname__ = sc.__qualname__ + '._lazy'
+    return Lazy
+
+
+def _parseLazy(Subcls, payload):
+    """Return a lazy object of message Subcls for payload."""
+    Lazy = Subcls._lazy
+    if Lazy is None:    # the message has its own __init__
+        return Subcls(payload)
+    obj = Lazy.__new__(Lazy)
+    _checkLayout(obj, Lazy._clsName, len(payload))
+    obj._len = len(payload)
+    obj._payload = bytes(payload)
+    return obj
+
+
+# The message registry: UBX class ID -> UBX message ID -> python class.
+# It is filled once at import time by initMessageClass.
+_messageRegistry = {}
+_messageClasses = {}    # UBX class ID -> python class, e.g. 5: ubx.UBX.ACK.ACK
+_noMessages = {}
+
+
+def registerMessageClass(cls):
+    """Register a message class decorated with initMessageClass.
+
+    All messages in cls._lookup become parseable by parseUBXPayload. This is
+    done automatically by initMessageClass. Messages of a class ID that is
+    already registered are added to (or replace) the existing ones.
+    """
+    _messageClasses[cls._class] = cls
+    _messageRegistry.setdefault(cls._class, {}).update(cls._lookup)
     return cls
 
 
+def registerMessage(cls, Subcls):
+    """Add the message Subcls to the message class cls at runtime.
+
+    Subcls is prepared like the messages defined in the class body of a class
+    decorated with initMessageClass, i.e. it needs _id and Fields.
+    """
+    _initMessage(cls, Subcls)
+    setattr(cls, Subcls.__name__, Subcls)
+    cls._lookup[Subcls._id] = Subcls
+    registerMessageClass(cls)
+    return Subcls
+
+
+def lookupMessage(msgClass, msgId):
+    """Return the python class of a UBX message, or None if it is unknown."""
+    return _messageRegistry.get(msgClass, _noMessages).get(msgId)
+
+
+def lookupMessageName(name):
+    """Return the python class of a message given by name, e.g. "NAV-PVT".
+
+    The name can also be written as "NAV.PVT". Returns None if it is
+    unknown.
+    """
+    clsName, _, msgName = name.replace('.', '-').partition('-')
+    for cls in _messageClasses.values():
+        if cls.__name__ == clsName:
+            Subcls = cls.__dict__.get(msgName)
+            if Subcls is not None and getattr(Subcls, '_codec', None):
+                return Subcls
+    return None
+
+
+def messageRegistry():
+    """Return the registry as a dict {class ID: {message ID: python class}}."""
+    return dict((k, dict(v)) for (k, v) in _messageRegistry.items())
+
+
 def classFromMessageClass():
     """Look up the python class corresponding to a UBX message class.
 
     The result is something like
     {5: ubx.UBX.ACK.ACK, 6: ubx.UBX.CFG.CFG, 10: ubx.UBX.MON.MON}
     """
-    return dict([
-        (getattr(v, '_class'), v)
-        for (k, v) in inspect.getmembers(sys.modules["ubx.UBX"], inspect.isclass)
-        if v.__name__ not in [
-            "UBXMessage", "U1", "I1", "X1", "U2", "I2", "X2",
-            "U4", "I4", "X4", "R4", "R8", "CH", "U"
-            ]
-    ])
-
-
-def parseUBXPayload(msgClass, msgId, payload):
-    """Parse a UBX payload from message class, message ID and payload."""
-    Cls = classFromMessageClass().get(msgClass)
-    if Cls is None:
-        err = "Cannot parse message class {}.\n Available: {}"\
-              .format(msgClass, classFromMessageClass())
-        raise Exception(err)
-    Subcls = Cls._lookup.get(msgId)
+    return dict(_messageClasses)
+
+
+def _unknownMessageError(msgClass, msgId):
+    if msgClass not in _messageRegistry:
+        return "Cannot parse message class {}.".format(msgClass)
+    return "Cannot parse message ID {} of message class {}."\
+           .format(msgId, msgClass)
+
+
+def parseUBXPayload(msgClass, msgId, payload, lazy=False, slots=False):
+    """Parse a UBX payload from message class, message ID and payload.
+
+    If lazy is True the returned object keeps a copy of the payload and
+    decodes each field only when it is first accessed. Otherwise, if slots
+    is True, the object is made from the slotsMessage subclass of its
+    message.
+    """
+    Subcls = _messageRegistry.get(msgClass, _noMessages).get(msgId)
     if Subcls is None:
-        raise Exception(
-            "Cannot parse message ID {} of message class {}.\n Available: {}"
-            .format(msgId, msgClass, Cls._lookup))
+        raise Exception(_unknownMessageError(msgClass, msgId))
+    if lazy:
+        return _parseLazy(Subcls, payload)
+    if slots:
+        Subcls = slotsMessage(Subcls)
     return Subcls(payload)
 
 
-def parseUBXMessage(msg):
+def parseUBXMessage(msg, lazy=False, slots=False):
     """Parse a UBX message."""
     msgClass, msgId, payload = UBXMessage.extract(msg)
-    return parseUBXPayload(msgClass, msgId, payload)
+    return parseUBXPayload(msgClass, msgId, payload, lazy=lazy, slots=slots)
 
 
 def formatByteString(s):
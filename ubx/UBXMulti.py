@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""One thread that reads many receivers.
+
+UBXMultiManager waits on all its sources (serial ports, TCP and UDP
+sockets, pipes, file descriptors) in one selector and frames each source
+separately, so dozens of receivers cost one thread:
+
+    manager = UBXMultiManager()
+    manager.add(serial.Serial('/dev/ttyACM0'), 'rover')
+    manager.add(socket.create_connection(('base', 5000)), 'base')
+    manager.start()
+
+Messages go to onUBX(sourceId, obj) and the other handlers with the id of
+their source, or to the handlers of the handler object passed to add (e.g.
+a UBXHandler subclass). UBXMultiQueue puts (sourceId, obj) on one queue.
+
+Sources are not closed by the manager. When a stream source reaches its
+end it is removed and onClose(sourceId) is called. A source that cannot be
+waited on or whose handler raises an exception is removed as well, after
+onSourceError(sourceId, error). Regular files are always readable and
+cannot be added, use a UBXManager for them.
+"""
+
+import os
+import stat
+import socket
+import selectors
+import threading
+from collections import deque
+from functools import partial
+from queue import Queue
+from ubx.UBXFramer import UBXFramer
+from ubx.UBXManager import UBXHandler, _readAvailable
+
+
+def _sourceFd(source):
+    """Return the file descriptor of source to wait on.
+
+    Raises an exception if there is none or if it is a regular file, see
+    UBXManager._fileno.
+    """
+    try:
+        fd = source if isinstance(source, int) else source.fileno()
+        mode = os.fstat(fd).st_mode
+    except (AttributeError, OSError, ValueError) as e:
+        raise Exception("Source has no file descriptor: {}".format(e))
+    if stat.S_ISREG(mode):
+        raise Exception("Source is a regular file, it cannot be waited on")
+    return fd
+
+
+class _Source(UBXHandler):
+    """Framing state of one source, dispatching with its id."""
+
+    def __init__(self, source, sourceId, lazy, target):
+        self.source = source
+        self.sourceId = sourceId
+        self.lazy = lazy
+        self._framer = UBXFramer()
+        self.fd = _sourceFd(source)
+        self.datagram = getattr(source, 'type', None) == socket.SOCK_DGRAM
+        # handlers of the target, with the source id if it is the manager
+        for name in ('onUBX', 'onUBXError', 'onNMEA', 'onNMEAError'):
+            handler = getattr(target, name)
+            if isinstance(target, UBXMultiManager):
+                handler = partial(handler, sourceId)
+            setattr(self, name, handler)
+
+    def read(self, n):
+        if isinstance(self.source, int):
+            return os.read(self.source, n)
+        return _readAvailable(self.source, n)
+
+    def write(self, data):
+        source = self.source
+        if isinstance(source, int):
+            with memoryview(data) as view:
+                while view:
+                    view = view[os.write(source, view):]
+        elif hasattr(source, 'sendall'):
+            source.sendall(data)
+        else:
+            source.write(data)
+
+
+class UBXMultiManager(threading.Thread):
+    """The NMEA/UBX reader thread of many sources."""
+
+    readSize = 65536    # max. number of bytes per read and source
+
+    def __init__(self, lazy=False, stopWhenEmpty=False):
+        """
+        :param lazy: pass lazily decoded messages, see parseUBXPayload
+        :param stopWhenEmpty: end the thread when the last source is removed
+        """
+        threading.Thread.__init__(self)
+        self.lazy = lazy
+        self.stopWhenEmpty = stopWhenEmpty
+        self._sources = {}          # sourceId -> _Source
+        self._changes = deque()     # (add, source) for the reader thread
+        self._lock = threading.Lock()
+        self._nextId = 0
+        self._shutDown = False
+        self._wakeup = None     # write end of the wake-up pipe while running
+
+    def add(self, source, sourceId=None, handler=None):
+        """Add a source and return its id.
+
+        :param source: serial port, socket, pipe or other object with
+            fileno() and read(n) or recv(n), or a file descriptor, but no
+            regular file
+        :param sourceId: id passed to the handlers, default 0, 1, ...
+        :param handler: object whose onUBX(obj), onUBXError, onNMEA and
+            onNMEAError get the messages of this source instead of the
+            handlers of the manager
+        """
+        target = self if handler is None else handler
+        with self._lock:
+            if sourceId is None:
+                while self._nextId in self._sources:
+                    self._nextId += 1
+                sourceId = self._nextId
+            if sourceId in self._sources:
+                raise Exception("Duplicate source id {!r}".format(sourceId))
+            src = _Source(source, sourceId, self.lazy, target)
+            self._sources[sourceId] = src
+            self._changes.append((True, src))
+        self._wake()
+        return sourceId
+
+    def remove(self, sourceId):
+        """Stop reading from the source with id sourceId."""
+        with self._lock:
+            src = self._sources.pop(sourceId)
+            self._changes.append((False, src))
+        self._wake()
+
+    def sources(self):
+        """Return the ids of the sources."""
+        with self._lock:
+            return list(self._sources)
+
+    def send(self, sourceId, msg):
+        """Send msg (bytes or a message object with serialize) to a source."""
+        if hasattr(msg, 'serialize'):
+            msg = msg.serialize()
+        self._sources[sourceId].write(msg)
+
+    def shutdown(self):
+        """Stop the manager."""
+        self._shutDown = True
+        self._wake()
+
+    def _wake(self):
+        with self._lock:
+            if self._wakeup is not None:
+                os.write(self._wakeup, b'\0')
+
+    def run(self):
+        """Run the reader loop."""
+        wakeup, w = os.pipe()
+        with self._lock:
+            self._wakeup = w
+        selector = selectors.DefaultSelector()
+        selector.register(wakeup, selectors.EVENT_READ)
+        removed = False
+        try:
+            while not self._shutDown:
+                with self._lock:
+                    changes = list(self._changes)
+                    self._changes.clear()
+                for (add, src) in changes:
+                    if add:
+                        try:
+                            selector.register(src.fd, selectors.EVENT_READ, src)
+                        except (KeyError, OSError, ValueError) as e:
+                            self._drop(selector, src, e)
+                            removed = True
+                    elif self._registered(selector, src):
+                        selector.unregister(src.fd)
+                        removed = True
+                if self.stopWhenEmpty and removed and \
+                        len(selector.get_map()) == 1:
+                    break
+                for (key, _) in selector.select():
+                    src = key.data
+                    if src is None:
+                        os.read(wakeup, 4096)
+                        continue
+                    try:
+                        alive = self._readSource(src)
+                    except Exception as e:
+                        self._drop(selector, src, e)
+                        removed = True
+                    else:
+                        if not alive:
+                            self._drop(selector, src)
+                            removed = True
+        finally:
+            selector.close()
+            with self._lock:
+                os.close(self._wakeup)
+                self._wakeup = None
+            os.close(wakeup)
+
+    @staticmethod
+    def _registered(selector, src):
+        key = selector.get_map().get(src.fd)
+        return key is not None and key.data is src
+
+    def _drop(self, selector, src, error=None):
+        """Remove the source src after its end or an error."""
+        if self._registered(selector, src):
+            selector.unregister(src.fd)
+        with self._lock:
+            if self._sources.get(src.sourceId) is src:
+                del self._sources[src.sourceId]
+        if error is not None:
+            self.onSourceError(src.sourceId, error)
+        self.onClose(src.sourceId)
+
+    def _readSource(self, src):
+        """Read and parse the available bytes of src, False at its end."""
+        try:
+            data = src.read(self.readSize)
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError:
+            return False
+        if len(data) == 0 and not src.datagram:
+            return False
+        src._parse(data)
+        return True
+
+    def onUBX(self, sourceId, obj):
+        """Default handler for good UBX message."""
+        print("{}: {}".format(sourceId, obj))
+
+    def onUBXError(self, sourceId, msgClass, msgId, errMsg):
+        """Default handler for faulty or not yet defined UBX message."""
+        print("{}: UBX ERR {:02X}:{:02X} {}"
+              .format(sourceId, msgClass, msgId, errMsg))
+
+    def onNMEA(self, sourceId, buffer):
+        """Default handler for good NMEA message."""
+        print("{}: NMEA: {}".format(sourceId, buffer))
+
+    def onNMEAError(self, sourceId, errMsg):
+        """Default handler for faulty NMEA message."""
+        print("{}: NMEA ERR: {}".format(sourceId, errMsg))
+
+    def onSourceError(self, sourceId, error):
+        """Called when a source is removed because of an exception."""
+        print("{}: ERR {!r}".format(sourceId, error))
+
+    def onClose(self, sourceId):
+        """Called when a source reached its end and was removed."""
+
+
+class UBXMultiQueue(UBXMultiManager):
+    """UBXMultiManager that puts (sourceId, obj) of good UBX messages on
+    a queue.
+
+    Use .empty() and .get() as for a queue.Queue
+    """
+
+    def __init__(self, lazy=False, stopWhenEmpty=False, queue=None):
+        """
+        :param queue: Optional queue to use, otherwise uses own
+        """
+        self._queue = queue if queue else Queue()
+        self.empty = self._queue.empty
+        self.get = self._queue.get
+        super(UBXMultiQueue, self).__init__(lazy=lazy,
+                                            stopWhenEmpty=stopWhenEmpty)
+
+    def onUBX(self, sourceId, obj):
+        self._queue.put((sourceId, obj))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""NumPy structured dtypes of the UBX messages and batch decoding.
+
+The dtype of a message follows its Fields (U4 -> '<u4', I2 -> '<i2',
+CH(N) -> 'S<N>', U(N) -> 'V<N>', ...) and has the layout of the payload,
+so payloads of the same length decode with a single np.frombuffer:
+
+    pvt = decodeBatch(UBX.NAV.PVT, payloads)
+    pvt['lat'], pvt['lon']
+
+The repeated blocks of a message are the subarray field 'repeated' with the
+dtype of the Repeated fields. Message classes have the dtype of their
+fixed block as the class attribute dtype.
+"""
+
+try:
+    import numpy as np
+except ImportError:     # NumPy is optional
+    np = None
+
+_dtypes = {}    # (codec, N) -> np.dtype
+
+
+def _requireNumpy():
+    if np is None:
+        raise Exception("NumPy is required for ubx.UBXNumpy")
+
+
+def messageDtype(Msg, N=0):
+    """Return the structured dtype of message Msg with N repeated blocks."""
+    _requireNumpy()
+    codec = Msg._codec
+    dtype = _dtypes.get((codec, N))
+    if dtype is None:
+        descr = list(codec.onceDtype)
+        if codec.repeatNames:
+            descr.append(('repeated', np.dtype(codec.repeatDtype), (N,)))
+        elif N:
+            raise Exception("{} has no repeated blocks"
+                            .format(Msg.__qualname__))
+        dtype = np.dtype(descr)
+        assert dtype.itemsize == codec.size(N)
+        _dtypes[(codec, N)] = dtype
+    return dtype
+
+
+def decodeBatch(Msg, payloads, N=None):
+    """Decode payloads of message Msg into one structured array.
+
+    payloads is a sequence of payloads of the same length, or a buffer with
+    the payloads one after the other (then N, the number of repeated
+    blocks, must be given for messages with a Repeated block). The values
+    are not converted: CH fields are bytes with trailing nulls removed.
+    """
+    _requireNumpy()
+    codec = Msg._codec
+    if isinstance(payloads, (list, tuple)):
+        lengths = set(map(len, payloads))
+        if len(lengths) > 1:
+            raise Exception("Payloads of different lengths: {}"
+                            .format(sorted(lengths)))
+        if N is None and lengths:
+            N = codec.count(lengths.pop())
+        payloads = b''.join(payloads)
+    if N is None:
+        if codec.repeatNames:
+            raise Exception("N is required for a buffer of {} payloads"
+                            .format(Msg.__qualname__))
+        N = 0
+    dtype = messageDtype(Msg, N)
+    if len(payloads) % dtype.itemsize:
+        raise Exception("Buffer length {} is not a multiple of {}"
+                        .format(len(payloads), dtype.itemsize))
+    return np.frombuffer(payloads, dtype)
+
+
+class DtypeAttribute(object):
+    """The dtype attribute of the message classes.
+
+    Msg.dtype is the dtype of the fixed block, msg.dtype the dtype of the
+    payload of msg, including its repeated blocks. Without NumPy there is
+    no such attribute.
+    """
+
+    def __get__(self, obj, objtype=None):
+        if np is None:
+            raise AttributeError("dtype requires NumPy")
+        if obj is None:
+            return messageDtype(objtype)
+        return messageDtype(objtype, objtype._codec.count(obj._len))
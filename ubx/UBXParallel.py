@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""Parallel decoding of large UBX logs.
+
+The file is split into chunks that are scanned in a ProcessPoolExecutor.
+Each worker starts at the first UBX frame with a good checksum at or after
+the start of its chunk and decodes the frames that start before the first
+such frame its scan reaches at or after the end of the chunk. In the rare
+case where that frame is not where the next worker started (e.g. the
+boundary falls into a bad frame), the next chunk is decoded again from
+there, so the result is always the same as a sequential scan.
+
+For parallelMessages the workers only find and check the frames and
+return their offsets, which the calling process parses: message objects
+cost more to pickle and unpickle than to parse. For parallelColumns the
+workers decode the fixed blocks into NumPy arrays:
+
+    for msg in parallelMessages("recording.ubx", UBX.NAV.PVT):
+        ...
+    columns = parallelColumns("recording.ubx", UBX.NAV.PVT, UBX.NAV.DOP)
+    columns[UBX.NAV.PVT]['lat']
+
+The command line tool UBXdecode uses these functions.
+"""
+
+import os
+import sys
+import argparse
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from ubx.UBXFramer import scanFrames, ubxChecksum, UBX, END
+from ubx.UBXLog import UBXLog
+from ubx.UBXMessage import lookupMessage, lookupMessageName, _parseLazy
+from ubx import UBXNumpy
+
+MESSAGES, COLUMNS = range(2)    # what the workers return
+
+
+def resync(buf, pos, end):
+    """Return the offset of the first complete UBX frame with a good
+    checksum in buf[pos:end], or None if there is none."""
+    find = buf.find
+    while True:
+        start = find(b'\xb5\x62', pos, end)
+        if start < 0 or start + 8 > end:
+            return None
+        stop = start + 8 + (buf[start+4] | buf[start+5] << 8)
+        if stop <= end and buf[stop-2] << 8 | buf[stop-1] == \
+                ubxChecksum(buf, start+2, stop-2):
+            return start
+        pos = start + 1
+
+
+def _decodeChunk(path, begin, end, startAt, mode, keys):
+    """Decode the chunk [begin, end) of the log at path.
+
+    Scanning starts at startAt, or at the first good UBX frame at or after
+    begin if startAt is None. Returns (start, stop, result) where start is
+    where the scan started (None if no frame was found), stop is the
+    offset of the first good UBX frame at or after end reached by the scan
+    (None if the scan ran to the end of the file) and result the frames of
+    registered messages that start before stop: an array of their offsets
+    (MESSAGES) or {key: structured array} (COLUMNS).
+    """
+    with UBXLog(path) as log:
+        mm = log._mm
+        start = startAt if startAt is not None else resync(mm, begin, log.size)
+        stop = None
+        result = {} if mode == COLUMNS else array('Q')
+        if start is None:
+            return (None, None, result)
+        view = memoryview(mm)
+        for (kind, a, b) in scanFrames(mm, start, log.size):
+            if kind == END:
+                break
+            if kind != UBX:
+                continue
+            if a >= end:
+                stop = a
+                break
+            key = (mm[a+2], mm[a+3])
+            if keys and key not in keys:
+                continue
+            Subcls = lookupMessage(*key)
+            if Subcls is None:
+                continue
+            if mode == COLUMNS:
+                result.setdefault(key, []).append(bytes(view[a+6:b-2]))
+            else:
+                result.append(a)
+        del view
+    if mode == COLUMNS:
+        result = dict((key, _columns(key, payloads))
+                      for (key, payloads) in result.items())
+    return (start, stop, result)
+
+
+def _columns(key, payloads):
+    """Return the structured array of the fixed blocks of payloads."""
+    Msg = lookupMessage(*key)
+    size = Msg._codec.sizeOnce
+    if Msg._codec.repeatNames:
+        payloads = [p[:size] for p in payloads]
+    payloads = [p for p in payloads if len(p) == size]
+    return UBXNumpy.decodeBatch(Msg, payloads, N=0)
+
+
+def _chunks(size, chunkSize):
+    return [(begin, min(begin + chunkSize, size))
+            for begin in range(0, size, chunkSize)] or [(0, 0)]
+
+
+def _parallel(path, msgTypes, mode, workers, chunkSize):
+    """Yield the results of the chunks in order."""
+    size = os.path.getsize(path)
+    workers = workers or os.cpu_count() or 1
+    if chunkSize is None:
+        chunkSize = max(1 << 20, size // (4 * workers) + 1)
+    keys = frozenset((Msg._class, Msg._id) for Msg in msgTypes)
+    chunks = _chunks(size, chunkSize)
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        submitted = 0
+        stop = 0        # where the previous chunk ended
+        for k, (begin, end) in enumerate(chunks):
+            # keep a bounded number of chunks in flight
+            while submitted < len(chunks) and len(pending) < 2 * workers:
+                b, e = chunks[submitted]
+                pending.append(pool.submit(
+                    _decodeChunk, path, b, e, 0 if submitted == 0 else None,
+                    mode, keys))
+                submitted += 1
+            (start, nextStop, result) = pending.popleft().result()
+            if stop is None:    # the previous chunk ran to the end
+                continue
+            if start != stop and stop < end:
+                # the sequential scan reaches this chunk elsewhere
+                (start, nextStop, result) = _decodeChunk(
+                    path, begin, end, stop, mode, keys)
+            elif start != stop:
+                # the previous chunk already covered this one
+                nextStop, result = stop, None
+            stop = nextStop
+            if result:
+                yield result
+
+
+def parallelMessages(path, *msgTypes, workers=None, chunkSize=None,
+                     lazy=False):
+    """Yield the parsed UBX messages of the log at path in file order.
+
+    If message classes are given (e.g. UBX.NAV.PVT) only those messages
+    are decoded. workers is the number of processes (default: number of
+    CPUs) and chunkSize the number of bytes per chunk. The workers find the
+    frames, they are parsed in the calling process.
+    """
+    with UBXLog(path) as log:
+        mm = log._mm
+        view = memoryview(mm)
+        try:
+            for offsets in _parallel(path, msgTypes, MESSAGES, workers,
+                                     chunkSize):
+                for a in offsets:
+                    Subcls = lookupMessage(mm[a+2], mm[a+3])
+                    payload = view[a+6:a+6+(mm[a+4] | mm[a+5] << 8)]
+                    try:
+                        msg = _parseLazy(Subcls, payload) if lazy \
+                            else Subcls(payload)
+                    except Exception:
+                        continue
+                    yield msg
+        finally:
+            view.release()
+
+
+def parallelColumns(path, *msgTypes, workers=None, chunkSize=None):
+    """Return {message class: structured array} for the log at path.
+
+    The arrays (see UBXNumpy) hold the fixed blocks of all messages of
+    each type, in file order. Requires NumPy.
+    """
+    np = UBXNumpy.np
+    UBXNumpy._requireNumpy()
+    parts = {}
+    for result in _parallel(path, msgTypes, COLUMNS, workers, chunkSize):
+        for (key, array) in result.items():
+            parts.setdefault(key, []).append(array)
+    return dict((lookupMessage(*key), np.concatenate(arrays))
+                for (key, arrays) in parts.items())
+
+
+def ubxdecode_main():
+    parser = argparse.ArgumentParser(
+        description='Decode a UBX log file using several processes.'
+        )
+    parser.add_argument('logfile', help='UBX log file')
+    parser.add_argument(
+        '-t', '--type', dest='types', action='append', default=[],
+        help='Message to decode, e.g. NAV-PVT (default all), can be repeated'
+        )
+    parser.add_argument(
+        '-j', '--jobs', dest='jobs', type=int, default=None,
+        help='Number of processes (default: number of CPUs)'
+        )
+    parser.add_argument(
+        '--chunk-size', dest='chunkSize', type=int, default=None,
+        help='Chunk size in MB'
+        )
+    parser.add_argument(
+        '-o', '--npz', dest='npz', default=None,
+        help='Write the columns of the messages to this .npz file '
+             'instead of printing the messages'
+        )
+    args = parser.parse_args()
+    msgTypes = []
+    for name in args.types:
+        Msg = lookupMessageName(name)
+        if Msg is None:
+            parser.error("Unknown message {}".format(name))
+        msgTypes.append(Msg)
+    chunkSize = args.chunkSize << 20 if args.chunkSize else None
+    if args.npz:
+        columns = parallelColumns(args.logfile, *msgTypes, workers=args.jobs,
+                                  chunkSize=chunkSize)
+        UBXNumpy.np.savez(args.npz, **dict(
+            (Msg.__qualname__.replace('.', '-'), array)
+            for (Msg, array) in columns.items()))
+    else:
+        for msg in parallelMessages(args.logfile, *msgTypes,
+                                    workers=args.jobs, chunkSize=chunkSize):
+            print(msg)
+            print()
+
+
+if __name__ == '__main__':
+    ubxdecode_main()
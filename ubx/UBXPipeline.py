@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""Pipelined reading and decoding.
+
+UBXPipeline is a UBXManager whose reader thread only reads and frames the
+bytes (checksums included) and passes the frames through bounded queues to
+decoder threads, which parse the payloads and call the handlers. A slow
+onUBX then no longer holds up reading:
+
+    manager = UBXPipeline(ser, workers=4, ordering='type', queueSize=4096)
+    manager.start()
+    ...
+    manager.depths()    # {'decode': [12, 0, 3, 0]}
+
+Orderings:
+    'none'  the workers share one queue, handlers are called in any order
+    'type'  each message type (NMEA counts as one type) is decoded by one
+            worker, so the handlers see the messages of a type in order
+    'total' the workers share one queue, a dispatcher thread calls the
+            handlers in the order of the frames
+
+With 'none' and 'type' the handlers run concurrently on the decoder
+threads, so they must be thread-safe. With 'total' they run on the
+dispatcher thread only.
+
+When the queue of a worker is full the reader waits. With 'total' at most
+queueSize frames are between the reader and the dispatcher (decoding,
+decoded or waiting for their turn), so a slow handler makes the reader
+wait as well. The workers finish
+the queued frames before the reader thread ends, so join() returns after
+the last handler call. An exception in a handler shuts the manager down,
+as it ends the reader thread of UBXManager.
+"""
+
+import heapq
+import threading
+from queue import Queue
+from ubx.UBXFramer import UBXFrame, UBXErrorFrame
+from ubx.UBXManager import UBXManager
+
+ORDERINGS = ('none', 'type', 'total')
+
+_STOP = None        # end of a queue
+_NMEA = 'NMEA'      # ordering key of NMEA sentences and errors
+
+
+class UBXPipeline(UBXManager):
+    """UBXManager with decoder threads."""
+
+    def __init__(self, ser, workers=2, ordering='type', queueSize=1024,
+                 debug=False, eofTimeout=None, lazy=False, capture=None):
+        """
+        :param ser, debug, eofTimeout, lazy, capture: Passed to UBXManager
+        :param workers: number of decoder threads
+        :param ordering: 'none', 'type' or 'total', see the module
+            documentation
+        :param queueSize: max. number of frames queued per decoder queue,
+            and for 'total' also after the decoders
+        """
+        if ordering not in ORDERINGS:
+            raise Exception("Unknown ordering {}".format(ordering))
+        super(UBXPipeline, self).__init__(ser=ser, debug=debug,
+                                          eofTimeout=eofTimeout, lazy=lazy,
+                                          capture=capture)
+        self.workers = workers
+        self.ordering = ordering
+        self.queueSize = queueSize
+        nQueues = workers if ordering == 'type' else 1
+        self._queues = [Queue(queueSize) for _ in range(nQueues)]
+        self._assigned = {}     # ordering key -> queue, for 'type'
+        self._seq = 0           # next frame number, for 'total'
+        self._results = Queue(queueSize)    # (seq, handler, args), for 'total'
+        self._reorder = []          # heap of results waiting for their turn
+        # frames read and not yet dispatched, for 'total'
+        self._inFlight = threading.Semaphore(queueSize)
+        self._threads = []
+
+    def depths(self):
+        """Return the number of frames waiting in each stage.
+
+        'decode' is the list of the depths of the decoder queues (one per
+        worker for 'type'); for 'total', 'dispatch' is the number of decoded
+        frames waiting for the dispatcher.
+        """
+        depths = {'decode': [q.qsize() for q in self._queues]}
+        if self.ordering == 'total':
+            depths['dispatch'] = self._results.qsize() + len(self._reorder)
+        return depths
+
+    # reader thread
+
+    def run(self):
+        """Run the reader and the decoder threads."""
+        for i in range(self.workers):
+            q = self._queues[i if self.ordering == 'type' else 0]
+            target = self._decodeOrdered if self.ordering == 'total' \
+                else self._decodeLoop
+            self._threads.append(threading.Thread(
+                target=target, args=(q,), name='UBXPipeline-{}'.format(i)))
+        dispatcher = threading.Thread(target=self._dispatchLoop,
+                                      name='UBXPipeline-dispatch')
+        for t in self._threads:
+            t.start()
+        if self.ordering == 'total':
+            dispatcher.start()
+        try:
+            super(UBXPipeline, self).run()
+        finally:
+            for i in range(self.workers):
+                self._queues[i % len(self._queues)].put(_STOP)
+            for t in self._threads:
+                t.join()
+            if self.ordering == 'total':
+                self._results.put((self._seq, _STOP, None))
+                dispatcher.join()
+
+    def _parse(self, data):
+        """Frame data and queue the frames for the decoders."""
+        for frame in self._framer.feed(data):
+            if self.ordering == 'type':
+                t = type(frame)
+                key = frame[:2] if t is UBXFrame or t is UBXErrorFrame \
+                    else _NMEA
+                q = self._assigned.get(key)
+                if q is None:
+                    q = self._queues[len(self._assigned) % self.workers]
+                    self._assigned[key] = q
+                q.put(frame)
+            elif self.ordering == 'total':
+                while not self._inFlight.acquire(timeout=0.1):
+                    if self._shutDown:
+                        return
+                self._queues[0].put((self._seq, frame))
+                self._seq += 1
+            else:
+                self._queues[0].put(frame)
+
+    # decoder threads
+
+    def _decodeLoop(self, q):
+        decode = self._decode
+        try:
+            while True:
+                frame = q.get()
+                if frame is _STOP:
+                    return
+                (handler, args) = decode(frame)
+                handler(*args)
+        except BaseException:
+            self._fail(q)
+            raise
+
+    def _decodeOrdered(self, q):
+        decode = self._decode
+        results = self._results
+        try:
+            while True:
+                item = q.get()
+                if item is _STOP:
+                    return
+                (seq, frame) = item
+                results.put((seq,) + decode(frame))
+        except BaseException:
+            self._fail(q)
+            raise
+
+    def _fail(self, q):
+        """Stop the manager after an exception in a decoder thread.
+
+        The rest of its queue is dropped, so the reader does not wait for
+        it.
+        """
+        self.shutdown()
+        while q.get() is not _STOP:
+            pass
+
+    def _dispatchLoop(self):
+        """Call the handlers of the decoded frames in frame order."""
+        heap = self._reorder
+        nextSeq = 0
+        try:
+            while True:
+                item = self._results.get()
+                heapq.heappush(heap, item)
+                while heap and heap[0][0] == nextSeq:
+                    (_, handler, args) = heapq.heappop(heap)
+                    if handler is _STOP:
+                        return
+                    handler(*args)
+                    nextSeq += 1
+                    self._inFlight.release()
+                if item[1] is _STOP:
+                    return      # a failed decoder dropped frames
+        except BaseException:
+            # drop the rest, so that the reader and the decoders do not wait
+            self.shutdown()
+            item = None
+            while item is None or item[1] is not _STOP:
+                item = self._results.get()
+                self._inFlight.release()
+            raise
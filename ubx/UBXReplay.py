@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Timed replay of recorded UBX/NMEA streams.
+
+UBXReplay sends the frames of a recording to a sink with the original
+timing, scaled by rate:
+
+    replay = UBXReplay.fromFile("recording.ubxa", sock, rate=2.0)
+    stats = replay.run()
+    print(stats.framesPerSecond, stats.latenessP99)
+
+Each frame is due at start + (t - t_first) / rate on the monotonic clock,
+so waiting errors do not accumulate. Frames that are already due are sent
+with one write. rate=None sends as fast as possible.
+
+Recordings are archives (UBXArchive), which have receive times, or raw
+logs, for which the time of a frame is the last iTOW seen.
+
+The sink can be a socket, a file descriptor (e.g. the master of a pty),
+a file object, a UBXManager (the bytes are passed to its parser) or a
+function that is called with the bytes.
+"""
+
+import os
+import time
+import socket
+import argparse
+import threading
+from array import array
+from collections import namedtuple
+from struct import Struct
+from ubx.UBXFramer import UBX
+from ubx.UBXLog import UBXLog
+from ubx.UBXIndex import _iTOWOffsets
+from ubx.UBXArchive import UBXArchiveReader, _frameType, _MAGIC
+from ubx.UBXMessage import lookupMessageName
+
+ReplayStats = namedtuple(
+    'ReplayStats',
+    'frames bytes seconds framesPerSecond bytesPerSecond '
+    'latenessMean latenessP50 latenessP99 latenessMax')
+
+_U4 = Struct('<I')
+_WEEK_MS = 7 * 24 * 3600 * 1000
+
+
+def archiveFrames(path):
+    """Yield (receive time, frame) of the archive at path."""
+    with UBXArchiveReader(path) as archive:
+        for (t, frame) in archive.frames():
+            yield (t, frame)
+
+
+def logFrames(path):
+    """Yield (time, frame) of the raw log at path.
+
+    The time of a frame is the iTOW (in seconds, continued over week
+    rollovers) of the last message with an iTOW, frames before the first
+    such message get the time of the first one. Times never decrease.
+    """
+    iTOWOffsets = _iTOWOffsets()
+    with UBXLog(path) as log:
+        mm = log._mm
+        t = None
+        week = 0
+        last = None
+        waiting = []    # frames before the first iTOW
+        for (kind, start, stop) in log.scan():
+            frame = mm[start:stop]
+            if kind == UBX:
+                pos = iTOWOffsets.get((mm[start+2], mm[start+3]))
+                if pos is not None and pos + 4 <= stop - start - 8:
+                    iTOW = _U4.unpack_from(mm, start + 6 + pos)[0]
+                    if last is not None and iTOW < last - _WEEK_MS // 2:
+                        week += _WEEK_MS
+                    last = iTOW
+                    t = max(t or 0, (week + iTOW) / 1000.)
+            if t is None:
+                waiting.append(frame)
+                continue
+            for w in waiting:
+                yield (t, w)
+            waiting = []
+            yield (t, frame)
+        for w in waiting:
+            yield (0., w)
+
+
+def _isArchive(path):
+    with open(path, 'rb') as f:
+        return f.read(len(_MAGIC)) == _MAGIC
+
+
+def _writer(sink):
+    """Return a function that writes bytes to sink."""
+    if hasattr(sink, 'sendall'):
+        return sink.sendall
+    if isinstance(sink, int):
+        def writeFd(data):
+            with memoryview(data) as view:
+                while view:
+                    view = view[os.write(sink, view):]
+        return writeFd
+    if hasattr(sink, '_parse'):     # UBXManager or UBXAsyncManager
+        return lambda data: sink._parse(bytes(data))
+    if hasattr(sink, 'write'):
+        def writeFile(data):
+            sink.write(data)
+            if hasattr(sink, 'flush'):
+                sink.flush()
+        return writeFile
+    if callable(sink):
+        return sink
+    raise Exception("Cannot write to {!r}".format(sink))
+
+
+def _percentile(sortedValues, p):
+    if not sortedValues:
+        return 0.
+    return sortedValues[min(len(sortedValues) - 1,
+                            int(p * len(sortedValues)))]
+
+
+class UBXReplay(object):
+    """Replays timed frames to a sink."""
+
+    def __init__(self, frames, sink, rate=1.0, loop=False, msgTypes=(),
+                 batchSize=65536, spin=0.):
+        """
+        :param frames: iterable of (time in seconds, frame bytes), or a
+            function that returns one (needed for loop with iterators)
+        :param sink: see the module documentation
+        :param rate: speed factor, None for as fast as possible
+        :param loop: start again at the end of the frames
+        :param msgTypes: only replay these message classes (e.g.
+            UBX.NAV.PVT), all frames if empty
+        :param batchSize: max. number of bytes of due frames per write
+        :param spin: busy-wait the last spin seconds before a deadline
+            for better precision
+        """
+        self.frames = frames
+        self.write = _writer(sink)
+        self.rate = rate
+        self.loop = loop
+        self.keys = frozenset((Msg._class, Msg._id) for Msg in msgTypes)
+        self.batchSize = batchSize
+        self.spin = spin
+        self._stop = threading.Event()
+
+    @classmethod
+    def fromFile(cls, path, sink, **kwargs):
+        """Return a replay of the archive or raw log at path."""
+        source = archiveFrames if _isArchive(path) else logFrames
+        return cls(lambda: source(path), sink, **kwargs)
+
+    def stop(self):
+        """Stop run() (from another thread or a signal handler)."""
+        self._stop.set()
+
+    def _passes(self):
+        """Yield the (time, frame) of all passes with continuous times."""
+        offset = 0.
+        while True:
+            frames = self.frames() if callable(self.frames) else self.frames
+            first = last = None
+            n = 0
+            for (t, frame) in frames:
+                if self.keys and _frameType(frame) not in self.keys:
+                    continue
+                if first is None:
+                    first = t
+                last = t
+                n += 1
+                yield (offset + t - first, frame)
+            if not self.loop or first is None:
+                return
+            # the next pass starts one mean frame interval later
+            offset += (last - first) * (n / (n - 1) if n > 1 else 1)
+
+    def _waitUntil(self, deadline):
+        """Wait until the monotonic clock reaches deadline, return it."""
+        delay = deadline - time.monotonic() - self.spin
+        if delay > 0 and self._stop.wait(delay):
+            return time.monotonic()
+        now = time.monotonic()
+        while now < deadline and not self._stop.is_set():
+            now = time.monotonic()
+        return now
+
+    def run(self, maxFrames=None, duration=None):
+        """Replay the frames and return the ReplayStats.
+
+        Stops after maxFrames frames, after duration seconds or when stop()
+        is called. A frame is written when its deadline is reached; frames
+        that are overdue already are written together. Lateness is the time
+        between the deadline and the end of the write of a frame, in
+        seconds (0 if rate is None).
+        """
+        self._stop.clear()
+        write = self.write
+        rate = self.rate
+        lateness = array('d')
+        pending = bytearray()
+        deadlines = []      # of the overdue frames in pending
+        frames = nbytes = 0
+        start = time.monotonic()
+        end = None if duration is None else start + duration
+
+        def flush(pending):
+            write(pending)
+            now = time.monotonic()
+            lateness.extend(now - deadline for deadline in deadlines)
+            del deadlines[:]
+            return bytearray()
+
+        for (t, frame) in self._passes():
+            if self._stop.is_set() or frames == maxFrames:
+                break
+            if rate:
+                deadline = start + t / rate
+                if end is not None and deadline > end:
+                    break
+                if deadline > time.monotonic():
+                    if pending:
+                        pending = flush(pending)
+                    self._waitUntil(deadline)
+                    if self._stop.is_set():
+                        break
+                    write(frame)
+                    lateness.append(time.monotonic() - deadline)
+                    frames += 1
+                    nbytes += len(frame)
+                    continue
+                # overdue: coalesce with the other overdue frames
+                deadlines.append(deadline)
+            elif end is not None and time.monotonic() > end:
+                break
+            pending += frame
+            frames += 1
+            nbytes += len(frame)
+            if len(pending) >= self.batchSize:
+                pending = flush(pending)
+        if pending:
+            flush(pending)
+        seconds = time.monotonic() - start
+        lateness = sorted(lateness)
+        return ReplayStats(
+            frames, nbytes, seconds,
+            frames / seconds if seconds else 0.,
+            nbytes / seconds if seconds else 0.,
+            sum(lateness) / len(lateness) if lateness else 0.,
+            _percentile(lateness, 0.5), _percentile(lateness, 0.99),
+            lateness[-1] if lateness else 0.)
+
+
+def openPty():
+    """Return (master fd, slave name) of a new pty in raw mode."""
+    import pty      # Unix only
+    import tty
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    name = os.ttyname(slave)
+    return master, name
+
+
+def ubxreplay_main():
+    parser = argparse.ArgumentParser(
+        description='Replay a UBX archive or raw log with its original timing.'
+        )
+    parser.add_argument('path', help='UBX archive (.ubxa) or raw log')
+    parser.add_argument(
+        '-r', '--rate', dest='rate', type=float, default=1.0,
+        help='Speed factor, 0 for as fast as possible (default 1)'
+        )
+    parser.add_argument(
+        '-l', '--loop', dest='loop', action='store_true',
+        help='Start again at the end'
+        )
+    parser.add_argument(
+        '-t', '--type', dest='types', action='append', default=[],
+        help='Message to replay, e.g. NAV-PVT (default all), can be repeated'
+        )
+    parser.add_argument(
+        '-n', '--frames', dest='frames', type=int, default=None,
+        help='Stop after this many frames'
+        )
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument(
+        '--pty', dest='pty', action='store_true',
+        help='Write to a new pty (default), its name is printed'
+        )
+    target.add_argument(
+        '--connect', dest='connect', default=None, metavar='HOST:PORT',
+        help='Write to a TCP connection'
+        )
+    args = parser.parse_args()
+    msgTypes = []
+    for name in args.types:
+        Msg = lookupMessageName(name)
+        if Msg is None:
+            parser.error("Unknown message {}".format(name))
+        msgTypes.append(Msg)
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        sink = socket.create_connection((host, int(port)))
+    else:
+        sink, name = openPty()
+        print(name, flush=True)
+    replay = UBXReplay.fromFile(args.path, sink, rate=args.rate or None,
+                                loop=args.loop, msgTypes=msgTypes)
+    try:
+        stats = replay.run(maxFrames=args.frames)
+    except KeyboardInterrupt:
+        return
+    print("{frames} frames, {bytes} bytes in {seconds:.2f} s: "
+          "{framesPerSecond:.0f} frames/s, {bytesPerSecond:.0f} B/s, "
+          "lateness mean {latenessMean:.6f} s, p99 {latenessP99:.6f} s, "
+          "max {latenessMax:.6f} s".format(**stats._asdict()))
+
+
+if __name__ == '__main__':
+    ubxreplay_main()
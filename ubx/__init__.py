@@ -4,7 +4,11 @@ from .introspect import getClassName, getClassMembers, getClassesInModule, getMe
 from .parse_NMEA_log import NMEAChkSum, parse_NMEA_log_main
 from .Tables import GNSS_Identifiers
 from .UBXESFSensor import SensorDataType, SensorMeasurement, SensorTransform
-from .UBXMessage import UBXMessage, parseUBXMessage, parseUBXPayload, addGet
+from .UBXMessage import UBXMessage, parseUBXMessage, parseUBXPayload, addGet, slotsMessage
+from .UBXMessage import lookupMessage, lookupMessageName, messageRegistry, registerMessage, registerMessageClass
 from .UBXManager import UBXManager, UBXQueue
+from .UBXAsync import UBXAsyncManager
+from .UBXMulti import UBXMultiManager, UBXMultiQueue
+from .UBXPipeline import UBXPipeline
 from .UBXtool import ubxtool_main
 from . import UBX
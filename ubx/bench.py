@@ -0,0 +1,958 @@
+#!/usr/bin/env python3
+"""Benchmarks for the hot paths of pyUBX.
+
+Run with
+
+    python -m ubx.bench [--only parse,stream] [--json results.json]
+                        [--compare old.json]
+
+The corpora are generated from the message definitions with a fixed seed,
+so results of different versions can be compared with --compare.
+"""
+
+import time
+import random
+import struct
+import tracemalloc
+import io
+import os
+import tempfile
+import shutil
+import sys
+import json
+import math
+import argparse
+import platform
+import socket
+from ubx import UBX
+from ubx.UBXMessage import UBXMessage, parseUBXPayload, slotsMessage
+from ubx.UBXManager import UBXManager, UBXQueue
+from ubx.UBXFramer import UBXFramer
+from ubx import Checksum
+from ubx import UBXNumpy
+from ubx.UBXGenerator import messagePayload, ackFrame, GGA
+
+
+def _bestOf(f, number, repeat=3):
+    """Return the best time in seconds of a single call of f."""
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            f()
+        dt = (time.perf_counter() - t0) / number
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def _svinfoPayload(numCh, rnd=random):
+    """Return a NAV-SVINFO payload with numCh channels."""
+    payload = struct.pack('<IBBH', rnd.getrandbits(32), numCh & 0xff, 4, 0)
+    for ch in range(numCh):
+        payload += struct.pack(
+            '<BBBBBbhi', ch & 0xff, rnd.randint(1, 200), rnd.getrandbits(8),
+            rnd.getrandbits(8), rnd.randint(0, 55), rnd.randint(-90, 90),
+            rnd.randint(0, 359), rnd.randint(-100000, 100000))
+    return payload
+
+
+def _parseWithTypes(Cls, payload):
+    """Parse payload field by field with Type.parse, the pre-codec way."""
+    N, names, types = Cls._codec.layout(len(payload))
+    vals = []
+    for typ in types:
+        val, payload = typ.parse(payload)
+        vals.append(val)
+    return vals
+
+
+def benchRepeatedScaling(channels=(16, 64, 256, 1024), number=200):
+    """Time the decoding of NAV-SVINFO as a function of the channel count.
+
+    Both the offset based decoder used by parseUBXPayload and the old
+    tail-slicing Type.parse chain are timed. The time per block of the
+    former is constant (linear scaling), the latter grows with N.
+    """
+    results = []
+    for numCh in channels:
+        payload = _svinfoPayload(numCh)
+        tOffset = _bestOf(
+            lambda: parseUBXPayload(UBX.NAV._class, UBX.NAV.SVINFO._id,
+                                    payload),
+            number)
+        tSlice = _bestOf(
+            lambda: _parseWithTypes(UBX.NAV.SVINFO, payload),
+            max(1, number // 10))
+        results.append({
+            'numCh': numCh,
+            'bytes': len(payload),
+            'offset_us': tOffset * 1e6,
+            'offset_ns_per_block': tOffset * 1e9 / numCh,
+            'slice_us': tSlice * 1e6,
+            'slice_ns_per_block': tSlice * 1e9 / numCh,
+        })
+    return results
+
+
+def _bytesPerObject(Cls, payload, number):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objs = [Cls(payload) for _ in range(number)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del objs
+    return (after - before) / number
+
+
+def benchMemory(messages=(UBX.NAV.PVT, UBX.NAV.RELPOSNED, UBX.NAV.DOP),
+                number=10000):
+    """Measure the memory per parsed object, __slots__ vs __dict__ classes.
+
+    The __slots__ classes are the slotsMessage subclasses of the messages.
+    """
+    results = []
+    for Msg in messages:
+        payload = bytes(random.getrandbits(8)
+                        for _ in range(Msg._codec.sizeOnce))
+        results.append({
+            'message': Msg.__qualname__,
+            'payload_bytes': len(payload),
+            'slots_bytes': _bytesPerObject(slotsMessage(Msg), payload, number),
+            'dict_bytes': _bytesPerObject(Msg, payload, number),
+        })
+    return results
+
+
+def _framingCorpus(numFrames, rnd=random):
+    """Return a stream of NAV-PVT, NAV-RELPOSNED, NAV-SVINFO and NMEA frames."""
+    frames = []
+    for i in range(numFrames):
+        k = i % 4
+        if k == 0:
+            frames.append(UBXMessage.make(
+                UBX.NAV._class, UBX.NAV.PVT._id,
+                bytes(rnd.getrandbits(8) for _ in range(92))))
+        elif k == 1:
+            frames.append(UBXMessage.make(
+                UBX.NAV._class, UBX.NAV.RELPOSNED._id,
+                bytes(rnd.getrandbits(8) for _ in range(64))))
+        elif k == 2:
+            frames.append(UBXMessage.make(
+                UBX.NAV._class, UBX.NAV.SVINFO._id, _svinfoPayload(24, rnd)))
+        else:
+            frames.append(GGA)
+    return b''.join(frames)
+
+
+class _CountingManager(UBXManager):
+    def __init__(self, ser):
+        UBXManager.__init__(self, ser, eofTimeout=0)
+        self.count = 0
+    def onUBX(self, obj):
+        self.count += 1
+    def onUBXError(self, msgClass, msgId, errMsg):
+        self.count += 1
+    def onNMEA(self, buffer):
+        self.count += 1
+    def onNMEAError(self, errMsg):
+        self.count += 1
+
+
+def benchFraming(numFrames=4000):
+    """Time UBXManager reading a mixed UBX/NMEA stream from memory."""
+    data = _framingCorpus(numFrames)
+    manager = _CountingManager(io.BytesIO(data))
+    t0 = time.perf_counter()
+    manager.run()
+    dt = time.perf_counter() - t0
+    return {
+        'frames': manager.count,
+        'bytes': len(data),
+        'msgs_per_s': manager.count / dt,
+        'MB_per_s': len(data) / dt / 1e6,
+    }
+
+
+def benchFramer(numFrames=20000, chunkSizes=(None, 65536, 4096)):
+    """Time UBXFramer.feed on a mixed stream, in one go and in chunks."""
+    data = _framingCorpus(numFrames)
+    results = []
+    for chunkSize in chunkSizes:
+        step = chunkSize or len(data)
+        framer = UBXFramer()
+        count = 0
+        t0 = time.perf_counter()
+        for i in range(0, len(data), step):
+            count += len(framer.feed(data[i:i+step]))
+        dt = time.perf_counter() - t0
+        results.append({
+            'chunk': 'all' if chunkSize is None else str(chunkSize),
+            'frames': count,
+            'msgs_per_s': count / dt,
+            'MB_per_s': len(data) / dt / 1e6,
+        })
+    return results
+
+
+def _checksumPerByte(buf):
+    a, b = 0, 0
+    for i in buf:
+        a = (a + i) & 0xff
+        b = (b + a) & 0xff
+    return a * 256 + b
+
+
+def benchChecksum(sizes=(100, 1000, 10000, 100000)):
+    """Time the per-byte, pure Python and NumPy UBX checksums."""
+    results = []
+    for n in sizes:
+        buf = bytes(random.getrandbits(8) for _ in range(n))
+        number = max(1, 100000 // n)
+        r = {
+            'bytes': n,
+            'per_byte_us': _bestOf(lambda: _checksumPerByte(buf), number) * 1e6,
+            'python_us': _bestOf(lambda: Checksum._sumsPython(buf), number) * 1e6,
+            'numpy_us': float('nan'),
+        }
+        if Checksum.np is not None:
+            r['numpy_us'] = _bestOf(lambda: Checksum._sumsNumpy(buf),
+                                    number) * 1e6
+        results.append(r)
+    return results
+
+
+def _serializeWithTypes(obj):
+    """Serialize obj field by field with concatenation, the pre-codec way."""
+    N, names, types = obj._codec.layout(obj._len)
+    payload = b''
+    for (name, typ) in zip(names, types):
+        payload += typ.serialize(getattr(obj, name))
+    msg = struct.pack('<BBBBH', 0xb5, 0x62, obj._class, obj._id, len(payload))
+    msg += payload
+    msg += struct.pack('>H', _checksumPerByte(msg[2:]))
+    return msg
+
+
+def benchSerialize(numMeas=(4, 16), batch=1000):
+    """Time serializing ESF-MEAS messages.
+
+    Compares the old concatenating serialize, serialize() and
+    serializeInto writing a batch of messages into one bytearray.
+    """
+    results = []
+    for n in numMeas:
+        payload = struct.pack('<IHH', 1234, n << 11, 0) + bytes(4 * n)
+        obj = UBX.ESF.MEAS(payload)
+        assert _serializeWithTypes(obj) == obj.serialize()
+        buf = bytearray(batch * obj.serializedSize())
+        def batchInto():
+            offset = 0
+            for _ in range(batch):
+                offset = obj.serializeInto(buf, offset)
+        results.append({
+            'numMeas': n,
+            'concat_us': _bestOf(lambda: _serializeWithTypes(obj), 1000) * 1e6,
+            'serialize_us': _bestOf(obj.serialize, 1000) * 1e6,
+            'into_us': _bestOf(batchInto, 3) * 1e6 / batch,
+        })
+    return results
+
+
+def benchBatchDecode(number=100000):
+    """Time decoding NAV-PVT payloads to objects and with decodeBatch."""
+    payloads = [bytes(random.getrandbits(8) for _ in range(92))
+                for _ in range(1000)] * (number // 1000)
+    Msg = UBX.NAV.PVT
+    t0 = time.perf_counter()
+    objs = [Msg(p) for p in payloads]
+    tObjects = time.perf_counter() - t0
+    del objs
+    tBatch = float('nan')
+    if UBXNumpy.np is not None:
+        t0 = time.perf_counter()
+        UBXNumpy.decodeBatch(Msg, payloads)
+        tBatch = time.perf_counter() - t0
+    return {
+        'messages': len(payloads),
+        'objects_per_s': len(payloads) / tObjects,
+        'batch_per_s': len(payloads) / tBatch,
+    }
+
+
+def benchLog(numFrames=20000):
+    """Time reading a recorded file with UBXManager and with UBXLog."""
+    from ubx.UBXLog import UBXLog
+    data = _framingCorpus(numFrames)
+    fd, path = tempfile.mkstemp(suffix='.ubx')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        with open(path, 'rb') as f:
+            manager = _CountingManager(f)
+            t0 = time.perf_counter()
+            manager.run()
+            tManager = time.perf_counter() - t0
+        with UBXLog(path) as log:
+            t0 = time.perf_counter()
+            count = sum(1 for _ in log.messages())
+            tLog = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            frames = sum(1 for _ in log.scan())
+            tScan = time.perf_counter() - t0
+    finally:
+        os.remove(path)
+    return {
+        'bytes': len(data),
+        'manager_MB_per_s': len(data) / tManager / 1e6,
+        'messages': count,
+        'messages_MB_per_s': len(data) / tLog / 1e6,
+        'frames': frames,
+        'scan_MB_per_s': len(data) / tScan / 1e6,
+    }
+
+
+def benchIndex(numFrames=20000):
+    """Time building a frame index and a query vs. rescanning the log."""
+    from ubx.UBXLog import UBXLog
+    from ubx.UBXIndex import UBXIndex
+    data = _framingCorpus(numFrames)
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'bench.ubx')
+    try:
+        with open(path, 'wb') as f:
+            f.write(data)
+        t0 = time.perf_counter()
+        UBXIndex(path).close()
+        tBuild = time.perf_counter() - t0
+        with UBXIndex(path) as index:
+            t0 = time.perf_counter()
+            n = sum(1 for _ in index.messages(UBX.NAV.PVT, iTOW=(0, 1 << 30)))
+            tQuery = time.perf_counter() - t0
+        with UBXLog(path) as log:
+            t0 = time.perf_counter()
+            sum(1 for m in log.messages(UBX.NAV.PVT) if m.iTOW < 1 << 30)
+            tScan = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(tmpdir)
+    return {
+        'frames': numFrames,
+        'build_ms': tBuild * 1e3,
+        'matches': n,
+        'query_ms': tQuery * 1e3,
+        'rescan_ms': tScan * 1e3,
+    }
+
+
+def benchParallel(numFrames=100000, workers=(1, 2, 4)):
+    """Time parallelMessages vs. UBXLog.messages on a recorded file."""
+    from ubx.UBXLog import UBXLog
+    from ubx.UBXParallel import parallelMessages
+    data = _framingCorpus(numFrames)
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'bench.ubx')
+    results = []
+    try:
+        with open(path, 'wb') as f:
+            f.write(data)
+        with UBXLog(path) as log:
+            t0 = time.perf_counter()
+            n = sum(1 for _ in log.messages())
+            t = time.perf_counter() - t0
+        results.append({'workers': 0, 'messages': n,
+                        'MB_per_s': len(data) / t / 1e6})
+        for w in workers:
+            t0 = time.perf_counter()
+            n = sum(1 for _ in parallelMessages(
+                path, workers=w, chunkSize=len(data) // (4 * w) + 1))
+            t = time.perf_counter() - t0
+            results.append({'workers': w, 'messages': n,
+                            'MB_per_s': len(data) / t / 1e6})
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+
+def benchExport(numFrames=20000, formats=('csv', 'npz')):
+    """Time exporting a recorded file to tables."""
+    from ubx.UBXExport import exportLog
+    data = _framingCorpus(numFrames)
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'bench.ubx')
+    results = []
+    try:
+        with open(path, 'wb') as f:
+            f.write(data)
+        for fmt in formats:
+            if fmt == 'npz' and UBXNumpy.np is None:
+                continue
+            t0 = time.perf_counter()
+            exporter = exportLog(path, os.path.join(tmpdir, fmt), format=fmt)
+            t = time.perf_counter() - t0
+            rows = sum(exporter.tables().values())
+            results.append({'format': fmt, 'rows': rows,
+                            'rows_per_s': rows / t,
+                            'MB_per_s': len(data) / t / 1e6})
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+
+def benchArchive(numFrames=20000, compressions=('zlib', 'lzma'),
+                 chunkSize=4096):
+    """Time writing and reading a compressed archive."""
+    from ubx.UBXArchive import UBXArchiveWriter, UBXArchiveReader
+    data = _framingCorpus(numFrames)
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'bench.ubxa')
+    results = []
+    try:
+        for compression in compressions:
+            t0 = time.perf_counter()
+            with UBXArchiveWriter(path, compression=compression) as writer:
+                for i in range(0, len(data), chunkSize):
+                    writer.feed(data[i:i+chunkSize], i / 92160.)
+            tWrite = time.perf_counter() - t0
+            with UBXArchiveReader(path) as archive:
+                t0 = time.perf_counter()
+                sum(1 for _ in archive.frames())
+                tRead = time.perf_counter() - t0
+            results.append({'compression': compression,
+                            'ratio': len(data) / os.path.getsize(path),
+                            'write_MB_per_s': len(data) / tWrite / 1e6,
+                            'read_MB_per_s': len(data) / tRead / 1e6})
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+
+def benchReplay(numFrames=500, interval=0.002, spins=(0., 0.001)):
+    """Measure the replay lateness at 1x and the throughput at full speed."""
+    from ubx.UBXReplay import UBXReplay
+    frame = ackFrame()
+    frames = [(i * interval, frame) for i in range(numFrames)]
+    results = []
+    for spin in spins:
+        stats = UBXReplay(frames, lambda data: None, spin=spin).run()
+        results.append({'rate': '1x', 'spin_ms': spin * 1e3,
+                        'frames_per_s': stats.framesPerSecond,
+                        'p50_us': stats.latenessP50 * 1e6,
+                        'p99_us': stats.latenessP99 * 1e6})
+    stats = UBXReplay(frames * 200, lambda data: None, rate=None).run()
+    results.append({'rate': 'max', 'spin_ms': 0.,
+                    'frames_per_s': stats.framesPerSecond,
+                    'p50_us': 0., 'p99_us': 0.})
+    return results
+
+
+def benchCapture(numBytes=1 << 24, chunkSizes=(64, 4096)):
+    """Compare the reader time per chunk of capture and of write + flush."""
+    from ubx.UBXCapture import UBXCapture
+    chunk = bytes(max(chunkSizes))
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'capture.ubx')
+    results = []
+    try:
+        for size in chunkSizes:
+            data = chunk[:size]
+            n = numBytes // size
+            with open(path, 'wb') as f:
+                t0 = time.perf_counter()
+                for _ in range(n):
+                    f.write(data)
+                    f.flush()
+                tFlush = time.perf_counter() - t0
+            capture = UBXCapture(path, maxPending=numBytes)
+            t0 = time.perf_counter()
+            for _ in range(n):
+                capture.write(data)
+            tCapture = time.perf_counter() - t0
+            capture.close()
+            tTotal = time.perf_counter() - t0
+            results.append({'chunk': size,
+                            'flush_us': tFlush / n * 1e6,
+                            'capture_us': tCapture / n * 1e6,
+                            'capture_MB_per_s': numBytes / tTotal / 1e6,
+                            'dropped': capture.dropped})
+    finally:
+        shutil.rmtree(tmpdir)
+    return results
+
+
+# (message class, number of repeated blocks) of the generated corpora
+CORPORA = ((UBX.NAV.PVT, 0), (UBX.NAV.RELPOSNED, 0), (UBX.NAV.SVINFO, 8),
+           (UBX.NAV.SVINFO, 32), (UBX.NAV.SVINFO, 128), (UBX.ESF.MEAS, 8),
+           (UBX.MON.VER, 4))
+
+def corpusName(Msg, N=0):
+    name = Msg.__qualname__.replace('.', '-')
+    return "{}({})".format(name, N) if Msg._codec.repeatNames else name
+
+
+def _mixedCorpus(numFrames, corruption=0.02, seed=0):
+    """Return a stream of the CORPORA messages and NMEA sentences.
+
+    A fraction corruption of the frames has a flipped byte, and junk is
+    inserted before half as many frames.
+    """
+    rnd = random.Random(seed)
+    payloads = [(Msg, [messagePayload(Msg, N, rnd) for _ in range(20)])
+                for (Msg, N) in CORPORA]
+    frames = []
+    for i in range(numFrames):
+        k = i % (len(payloads) + 1)
+        if k == len(payloads):
+            frame = bytearray(GGA)
+        else:
+            (Msg, ps) = payloads[k]
+            frame = bytearray(UBXMessage.make(Msg._class, Msg._id,
+                                              rnd.choice(ps)))
+        if rnd.random() < corruption:
+            frame[rnd.randrange(len(frame))] ^= 1 << rnd.randrange(8)
+        if rnd.random() < corruption / 2:
+            frames.append(bytes(rnd.getrandbits(8)
+                                for _ in range(rnd.randint(1, 20))))
+        frames.append(bytes(frame))
+    return b''.join(frames)
+
+
+def _timeAll(f, items, repeat=3):
+    """Return the best time in seconds of calling f on all items."""
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            f(item)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def benchParse(corpora=CORPORA, number=2000):
+    """parseUBXPayload of generated payloads, eager and lazy."""
+    results = []
+    rnd = random.Random(1)
+    for (Msg, N) in corpora:
+        payloads = [messagePayload(Msg, N, rnd) for _ in range(100)] \
+            * (number // 100)
+        nbytes = sum(map(len, payloads))
+        cls, id = Msg._class, Msg._id
+        t = _timeAll(lambda p: parseUBXPayload(cls, id, p), payloads)
+        tLazy = _timeAll(lambda p: parseUBXPayload(cls, id, p, lazy=True),
+                         payloads)
+        results.append({
+            'message': corpusName(Msg, N),
+            'bytes': len(payloads[0]),
+            'msgs_per_s': len(payloads) / t,
+            'MB_per_s': nbytes / t / 1e6,
+            'lazy_msgs_per_s': len(payloads) / tLazy,
+        })
+    return results
+
+
+def benchSerializeMessages(corpora=CORPORA, number=2000):
+    """serialize() and UBXMessage.Checksum of generated messages."""
+    results = []
+    rnd = random.Random(2)
+    for (Msg, N) in corpora:
+        objs = [parseUBXPayload(Msg._class, Msg._id,
+                                messagePayload(Msg, N, rnd))
+                for _ in range(100)] * (number // 100)
+        frames = [obj.serialize() for obj in objs]
+        nbytes = sum(map(len, frames))
+        t = _timeAll(lambda obj: obj.serialize(), objs)
+        tChecksum = _timeAll(
+            lambda frame: UBXMessage.Checksum(frame[2:-2]).get(), frames)
+        results.append({
+            'message': corpusName(Msg, N),
+            'bytes': len(frames[0]),
+            'msgs_per_s': len(objs) / t,
+            'MB_per_s': nbytes / t / 1e6,
+            'checksum_msgs_per_s': len(frames) / tChecksum,
+            'checksum_MB_per_s': nbytes / tChecksum / 1e6,
+        })
+    return results
+
+
+class _GoodCounter(UBXManager):
+    def __init__(self, ser):
+        UBXManager.__init__(self, ser, eofTimeout=0)
+        self.good = self.errors = 0
+    def onUBX(self, obj):
+        self.good += 1
+    def onUBXError(self, msgClass, msgId, errMsg):
+        self.errors += 1
+    def onNMEA(self, buffer):
+        pass
+    def onNMEAError(self, errMsg):
+        self.errors += 1
+
+
+def benchStream(numFrames=20000, corruptions=(0., 0.02, 0.1)):
+    """UBXManager framing and parsing of mixed streams with corruption."""
+    results = []
+    for corruption in corruptions:
+        data = _mixedCorpus(numFrames, corruption)
+        manager = _GoodCounter(io.BytesIO(data))
+        t0 = time.perf_counter()
+        manager.run()
+        dt = time.perf_counter() - t0
+        results.append({
+            'corruption': corruption,
+            'frames': numFrames,
+            'good': manager.good,
+            'errors': manager.errors,
+            'msgs_per_s': numFrames / dt,
+            'MB_per_s': len(data) / dt / 1e6,
+        })
+    return results
+
+
+class _QuietQueue(UBXQueue):
+    def onUBXError(self, msgClass, msgId, errMsg):
+        pass
+    def onNMEA(self, buffer):
+        pass
+    def onNMEAError(self, errMsg):
+        pass
+
+
+def benchQueue(numFrames=20000, corruption=0.02, batch=256):
+    """UBXQueue end to end: reader thread, parsing and a consumer."""
+    data = _mixedCorpus(numFrames, corruption)
+    counter = _GoodCounter(io.BytesIO(data))
+    counter.run()
+    results = []
+    for consumer in ('get', 'get_many'):
+        t0 = time.perf_counter()
+        ubxq = _QuietQueue(io.BytesIO(data), eofTimeout=0, start=True)
+        n = 0
+        while n < counter.good:
+            if consumer == 'get':
+                ubxq.get(timeout=10)
+                n += 1
+            else:
+                n += len(ubxq.get_many(batch, timeout=10))
+        dt = time.perf_counter() - t0
+        ubxq.join()
+        results.append({
+            'consumer': consumer,
+            'frames': numFrames,
+            'messages': counter.good,
+            'high_water': ubxq.highWater,
+            'msgs_per_s': counter.good / dt,
+            'MB_per_s': len(data) / dt / 1e6,
+        })
+    return results
+
+
+class _LatencyManager(UBXManager):
+    def __init__(self, ser):
+        UBXManager.__init__(self, ser)
+        self.times = []
+    def onUBX(self, obj):
+        self.times.append(time.perf_counter())
+
+
+class _NonBlockingSocket(object):
+    """Socket without fileno, for the polling read loop."""
+    def __init__(self, sock):
+        self.sock = sock
+    def recv(self, n):
+        try:
+            return self.sock.recv(n, socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return b''
+
+
+def benchLatency(numFrames=200, interval=0.005):
+    """Time from the end of a frame to onUBX, selector vs. polling loop."""
+    frame = ackFrame()
+    results = []
+    for mode in ('select', 'poll'):
+        a, b = socket.socketpair()
+        manager = _LatencyManager(b if mode == 'select' else
+                                  _NonBlockingSocket(b))
+        manager.start()
+        sent = []
+        for _ in range(numFrames):
+            time.sleep(interval)
+            sent.append(time.perf_counter())
+            a.sendall(frame)
+        deadline = time.monotonic() + 5
+        while len(manager.times) < numFrames and time.monotonic() < deadline:
+            time.sleep(0.01)
+        t0 = time.perf_counter()
+        manager.shutdown()
+        manager.join()
+        tShutdown = time.perf_counter() - t0
+        a.close()
+        b.close()
+        latency = sorted(t - s for (s, t) in zip(sent, manager.times))
+        results.append({'mode': mode,
+                        'p50_us': latency[len(latency) // 2] * 1e6,
+                        'p99_us': latency[int(len(latency) * 0.99)] * 1e6,
+                        'max_us': latency[-1] * 1e6,
+                        'shutdown_ms': tShutdown * 1e3})
+    return results
+
+
+class _MultiCounter(object):
+    """Handlers of a UBXMultiManager that count the good messages."""
+    def __init__(self):
+        super(_MultiCounter, self).__init__(stopWhenEmpty=True)
+        self.good = 0
+    def onUBX(self, sourceId, obj):
+        self.good += 1
+    def onUBXError(self, sourceId, msgClass, msgId, errMsg):
+        pass
+    def onNMEA(self, sourceId, buffer):
+        pass
+    def onNMEAError(self, sourceId, errMsg):
+        pass
+
+
+def _feed(sockets, data, chunkSize=4096):
+    """Send data to each socket in round-robin chunks, then close them."""
+    for i in range(0, len(data), chunkSize):
+        for sock in sockets:
+            sock.sendall(data[i:i+chunkSize])
+    for sock in sockets:
+        sock.close()
+
+
+def benchMulti(numFrames=2000, receivers=(1, 8, 32)):
+    """Many receivers: one UBXMultiManager vs. a UBXManager thread each."""
+    from ubx.UBXMulti import UBXMultiManager
+    class Counter(_MultiCounter, UBXMultiManager):
+        pass
+    data = _mixedCorpus(numFrames)
+    results = []
+    for n in receivers:
+        for mode in ('multi', 'threads'):
+            pairs = [socket.socketpair() for _ in range(n)]
+            if mode == 'multi':
+                manager = Counter()
+                for (_, b) in pairs:
+                    manager.add(b)
+                readers = [manager]
+            else:
+                readers = [_GoodCounter(b) for (_, b) in pairs]
+            t0 = time.perf_counter()
+            cpu0 = time.process_time()
+            for reader in readers:
+                reader.start()
+            _feed([a for (a, _) in pairs], data)
+            for reader in readers:
+                reader.join()
+            dt = time.perf_counter() - t0
+            cpu = time.process_time() - cpu0
+            for (_, b) in pairs:
+                b.close()
+            results.append({
+                'receivers': n,
+                'mode': mode,
+                'messages': sum(reader.good for reader in readers),
+                'MB_per_s': n * len(data) / dt / 1e6,
+                'cpu_ns_per_byte': cpu / (n * len(data)) * 1e9,
+            })
+    return results
+
+
+class _SlowHandler(object):
+    """Handlers that count, with a 1 ms blocking call every ioEvery
+    messages (0 for none)."""
+    def __init__(self, *args, ioEvery=0, **kwargs):
+        super(_SlowHandler, self).__init__(*args, **kwargs)
+        self.ioEvery = ioEvery
+        self.count = 0
+    def onUBX(self, obj):
+        self.count += 1
+        if self.ioEvery and self.count % self.ioEvery == 0:
+            time.sleep(0.001)
+    def onUBXError(self, msgClass, msgId, errMsg):
+        pass
+    def onNMEA(self, buffer):
+        pass
+    def onNMEAError(self, errMsg):
+        pass
+
+
+class _SlowManager(_SlowHandler, UBXManager):
+    pass
+
+
+def benchPipeline(numFrames=20000, workers=4, ioEvery=(0, 20)):
+    """UBXManager vs. UBXPipeline, with and without blocking handlers."""
+    from ubx.UBXPipeline import UBXPipeline
+    class SlowPipeline(_SlowHandler, UBXPipeline):
+        pass
+    data = _mixedCorpus(numFrames)
+    results = []
+    for every in ioEvery:
+        for ordering in (None, 'none', 'type', 'total'):
+            ser = io.BufferedReader(io.BytesIO(data))
+            if ordering is None:
+                manager = _SlowManager(ser, eofTimeout=0, ioEvery=every)
+            else:
+                manager = SlowPipeline(ser, workers=workers,
+                                        ordering=ordering, eofTimeout=0,
+                                        ioEvery=every)
+            t0 = time.perf_counter()
+            manager.start()
+            manager.join()
+            dt = time.perf_counter() - t0
+            results.append({
+                'io_every': every,
+                'ordering': ordering or 'manager',
+                'msgs_per_s': numFrames / dt,
+                'MB_per_s': len(data) / dt / 1e6,
+            })
+    return results
+
+
+def _unixOnly():
+    """Why the benchmarks of sockets, pipes and the wake-up pipe of the
+    managers cannot run on this platform, or None."""
+    if os.name != 'posix':
+        return 'selectors cannot wait on pipes on {}'.format(sys.platform)
+    if not hasattr(socket, 'MSG_DONTWAIT'):
+        return 'socket.MSG_DONTWAIT is missing'
+    return None
+
+
+# name: function returning why the benchmark cannot run here, or None
+REQUIRES = {
+    'latency': _unixOnly,
+    'multi': _unixOnly,
+    'replay': _unixOnly,
+}
+
+
+# name, function of the benchmarks run by main
+BENCHMARKS = (
+    ('parse', benchParse),
+    ('serialize', benchSerializeMessages),
+    ('stream', benchStream),
+    ('queue', benchQueue),
+    ('latency', benchLatency),
+    ('multi', benchMulti),
+    ('pipeline', benchPipeline),
+    ('checksum', benchChecksum),
+    ('repeated', benchRepeatedScaling),
+    ('memory', benchMemory),
+    ('esf_serialize', benchSerialize),
+    ('batch_decode', benchBatchDecode),
+    ('framing', benchFraming),
+    ('framer', benchFramer),
+    ('log', benchLog),
+    ('index', benchIndex),
+    ('parallel', benchParallel),
+    ('export', benchExport),
+    ('archive', benchArchive),
+    ('replay', benchReplay),
+    ('capture', benchCapture),
+)
+
+
+def _format(val):
+    if isinstance(val, float):
+        return "{:.0f}".format(val) if abs(val) >= 100 else "{:.2f}".format(val)
+    return str(val)
+
+
+def printResult(title, result):
+    """Print the result of a benchmark (a dict or a list of dicts) as a table."""
+    rows = result if isinstance(result, list) else [result]
+    print(title)
+    if not rows:
+        return
+    keys = list(rows[0])
+    cells = [[_format(row.get(k)) for k in keys] for row in rows]
+    widths = [max(len(k), *(len(c[i]) for c in cells))
+              for (i, k) in enumerate(keys)]
+    print("  ".join(k.rjust(w) for (k, w) in zip(keys, widths)))
+    for c in cells:
+        print("  ".join(v.rjust(w) for (v, w) in zip(c, widths)))
+
+
+def _jsonable(val):
+    """Replace NaN (not valid JSON) with None."""
+    if isinstance(val, float) and math.isnan(val):
+        return None
+    if isinstance(val, dict):
+        return dict((k, _jsonable(v)) for (k, v) in val.items())
+    if isinstance(val, list):
+        return [_jsonable(v) for v in val]
+    return val
+
+
+def _metadata():
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'numpy': UBXNumpy.np.__version__ if UBXNumpy.np is not None else None,
+    }
+
+
+def compare(results, old):
+    """Print the rates (keys ending in per_s) of results relative to old."""
+    print("Rates relative to the old results (new / old)")
+    for (name, result) in results.items():
+        if name not in old:
+            continue
+        rows = result if isinstance(result, list) else [result]
+        oldRows = old[name] if isinstance(old[name], list) else [old[name]]
+        for (row, oldRow) in zip(rows, oldRows):
+            label = next(iter(row.values()))
+            for (key, val) in row.items():
+                oldVal = oldRow.get(key)
+                if key.endswith('per_s') and val and oldVal:
+                    print("{:>14} {:>16} {:>22} {:8.2f}".format(
+                        name, str(label), key, val / oldVal))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='pyUBX benchmarks.')
+    parser.add_argument(
+        '--only', default=None,
+        help='Comma separated names of the benchmarks to run: ' +
+             ', '.join(name for (name, _) in BENCHMARKS)
+        )
+    parser.add_argument('--json', default=None,
+                        help='Write the results to this JSON file')
+    parser.add_argument('--compare', default=None,
+                        help='JSON file of earlier results to compare with')
+    args = parser.parse_args(argv)
+    names = args.only.split(',') if args.only else None
+    unknown = set(names or ()) - set(name for (name, _) in BENCHMARKS)
+    if unknown:
+        parser.error("Unknown benchmarks: {}".format(', '.join(sorted(unknown))))
+    results = {}
+    for (name, f) in BENCHMARKS:
+        if names and name not in names:
+            continue
+        missing = REQUIRES[name]() if name in REQUIRES else None
+        if missing:
+            print("{}: skipped, {}".format(name, missing))
+            print()
+            continue
+        results[name] = _jsonable(f())
+        printResult("{}: {}".format(name, f.__doc__.strip().splitlines()[0]),
+                    results[name])
+        print()
+        sys.stdout.flush()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'meta': _metadata(), 'results': results}, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)['results'])
+
+
+if __name__ == '__main__':
+    main()